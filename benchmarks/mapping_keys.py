@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Microbenchmark comparing the per-call dir() based key discovery that
+tinman.mapping.Mapping used to perform with the compiled per-class schema.
+
+Usage: python benchmarks/mapping_keys.py [iterations]
+
+"""
+import inspect
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tinman import model
+from tinman import session
+
+
+class ExampleModel(model.Model):
+    name = None
+    age = None
+    location = None
+    email = None
+    phone = None
+
+
+def legacy_keys(obj):
+    """The key discovery that Mapping.keys() ran on every call before the
+    schema was compiled per class.
+
+    """
+    return sorted([k for k in dir(obj) if
+                   k[0:1] != '_' and k != 'keys' and not k.isupper() and
+                   not inspect.ismethod(getattr(obj, k)) and
+                   not (hasattr(obj.__class__, k) and
+                        isinstance(getattr(obj.__class__, k), property)) and
+                   not isinstance(getattr(obj, k), property)])
+
+
+def legacy_as_dict(obj):
+    return dict([(k, getattr(obj, k)) for k in legacy_keys(obj)])
+
+
+def report(label, legacy, compiled, iterations):
+    before = min(timeit.repeat(legacy, number=iterations, repeat=3))
+    after = min(timeit.repeat(compiled, number=iterations, repeat=3))
+    print('%-24s %10.2f us %10.2f us %8.1fx' %
+          (label, before / iterations * 1e6, after / iterations * 1e6,
+           before / after))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    obj = ExampleModel(name='foo', age=42, location='here')
+    sess = session.Session(settings={})
+    sess.username = 'foo'
+    assert legacy_keys(obj) == obj.keys()
+    assert legacy_keys(sess) == sess.keys()
+
+    print('%-24s %13s %13s %9s' % ('operation', 'before', 'after', 'speedup'))
+    report('Model.keys()', lambda: legacy_keys(obj), obj.keys, iterations)
+    report('Model.as_dict()', lambda: legacy_as_dict(obj), obj.as_dict,
+           iterations)
+    report("'name' in Model", lambda: 'name' in legacy_keys(obj),
+           lambda: 'name' in obj, iterations)
+    report('Session.keys()', lambda: legacy_keys(sess), sess.keys, iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Benchmark the stored payload size and the encode/decode round trip cost of
+the AsyncRedisModel storage formats: the default base64 encoded JSON and the
+raw values written when a tinman.serializers serializer is set as the codec.
+
+Usage: python benchmarks/model_codecs.py [iterations]
+
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tinman import model
+from tinman import serializers
+
+
+class ExampleModel(model.AsyncRedisModel):
+    name = None
+    email = None
+    tags = None
+    scores = None
+    profile = None
+
+
+def new_model(codec):
+    cls = type('ExampleModel', (ExampleModel,), {'_codec': codec})
+    value = cls('8d5b1c2e-7b9f-4f36-9a7c-0a4f1d8e2b6c', redis_client=object())
+    value.name = 'Example User'
+    value.email = 'user@example.com'
+    value.tags = ['alpha', 'beta', 'gamma', 'delta']
+    value.scores = list(range(50))
+    value.profile = {'bio': 'x' * 400, 'location': 'Somewhere',
+                     'links': ['http://example.com/%i' % i for i in range(5)]}
+    return value
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    codecs = [('base64 JSON (default)', None),
+              ('raw JSON', serializers.JSON())]
+    if serializers.msgpack:
+        codecs.append(('raw msgpack', serializers.MsgPack()))
+    print('%-24s %10s %16s' % ('format', 'bytes', 'round trip (us)'))
+    for label, codec in codecs:
+        value = new_model(codec)
+        payload = value._encode()
+
+        def round_trip():
+            value._load(value._encode())
+
+        elapsed = min(timeit.repeat(round_trip, number=iterations, repeat=3))
+        print('%-24s %10i %16.2f' % (label, len(payload),
+                                     elapsed / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Memory benchmark comparing the per-instance size of dict backed models
+and sessions with the compact __slots__ backed representation.
+
+Usage: python benchmarks/model_memory.py [instances]
+
+"""
+import gc
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tinman import model
+from tinman import session
+
+
+class DictModel(model.Model):
+    name = None
+    age = None
+    location = None
+
+
+class CompactModel(model.Model):
+    FIELDS = ('name', 'age', 'location')
+
+
+class CompactSession(session.Session):
+    FIELDS = ('username',)
+
+
+def factories():
+    return {'Model': lambda i: DictModel(str(i), name='foo', age=i),
+            'Model (compact)': lambda i: CompactModel(str(i), name='foo',
+                                                      age=i),
+            'Session': lambda i: new_session(session.Session, i),
+            'Session (compact)': lambda i: new_session(CompactSession, i)}
+
+
+def new_session(cls, offset):
+    value = cls(str(offset), settings={})
+    value.username = 'foo'
+    return value
+
+
+def instance_size(obj):
+    """Return the size of the instance and of its __dict__, if one has been
+    allocated, without forcing the allocation of one.
+
+    """
+    values = [id(getattr(obj, key)) for key in getattr(obj, '_slotted', ())]
+    size = sys.getsizeof(obj)
+    for referent in gc.get_referents(obj):
+        if isinstance(referent, dict) and id(referent) not in values:
+            size += sys.getsizeof(referent)
+    return size
+
+
+def rss_per_instance(label, count):
+    """Build count instances in a fresh interpreter and return the growth of
+    the max resident set size per instance in bytes.
+
+    """
+    output = subprocess.check_output([sys.executable, __file__, '--rss',
+                                      label, str(count)])
+    return float(output.strip())
+
+
+def measure_rss(label, count):
+    factory = factories()[label]
+    gc.collect()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    instances = [factory(offset) for offset in xrange(count)]
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print((after - before) * 1024.0 / len(instances))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--rss':
+        return measure_rss(sys.argv[2], int(sys.argv[3]))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('%-20s %16s %20s' % ('class', 'instance bytes',
+                               'rss bytes/instance'))
+    for label in sorted(factories()):
+        size = instance_size(factories()[label](0))
+        print('%-20s %16i %20.1f' % (label, size,
+                                     rss_per_instance(label, count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Benchmark the throughput of the file and SQLite session adapters, saving
+and then fetching a batch of sessions concurrently in the IOLoop, as a web
+process does when many requests use their sessions at once.
+
+Usage: python benchmarks/session_adapters.py [sessions] [concurrency]
+
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from tornado import gen
+from tornado import ioloop
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tinman import session
+
+
+def new_session(cls, settings):
+    value = cls(None, 3600, settings)
+    value.ip_address = '203.0.113.42'
+    value.last_request_at = time.time()
+    value.last_request_uri = '/account/settings?tab=notifications'
+    value.user_id = 1048576
+    value.username = 'example.user'
+    value.roles = ['member', 'editor']
+    value.preferences = {'locale': 'en_US', 'theme': 'dark'}
+    return value
+
+
+@gen.coroutine
+def run(cls, settings, count, concurrency):
+    sessions = [new_session(cls, settings) for _offset in range(count)]
+    start = time.time()
+    for offset in range(0, count, concurrency):
+        yield [value.save() for value in sessions[offset:offset + concurrency]]
+    saved = time.time() - start
+    start = time.time()
+    for offset in range(0, count, concurrency):
+        yield [cls(value.id, 3600, settings).fetch()
+               for value in sessions[offset:offset + concurrency]]
+    raise gen.Return((saved, time.time() - start))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    directory = tempfile.mkdtemp()
+    os.mkdir(os.path.join(directory, 'files'))
+    adapters = [('file', session.FileSession,
+                 {'directory': os.path.join(directory, 'files'),
+                  'cleanup': False}),
+                ('sqlite', session.SQLiteSession,
+                 {'filename': os.path.join(directory, 'sessions.db'),
+                  'cleanup': False})]
+    print('%-8s %16s %16s' % ('adapter', 'saves/sec', 'fetches/sec'))
+    try:
+        for label, cls, settings in adapters:
+            saved, fetched = ioloop.IOLoop.current().run_sync(
+                lambda: run(cls, settings, count, concurrency))
+            print('%-8s %16.0f %16.0f' % (label, count / saved,
+                                          count / fetched))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
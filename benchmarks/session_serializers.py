@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Benchmark the stored size and the dumps/loads round trip cost of a typical
+session payload with each of the serializers that may be configured for a
+session adapter, uncompressed and compressed as the cookie adapter stores it.
+
+Usage: python benchmarks/session_serializers.py [iterations]
+
+"""
+import os
+import sys
+import time
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tinman import serializers
+from tinman import session
+
+
+def new_session(codec):
+    value = session.Session('8d5b1c2e-7b9f-4f36-9a7c-0a4f1d8e2b6c')
+    value._codec = codec
+    value.ip_address = '203.0.113.42'
+    value.last_request_at = time.time()
+    value.last_request_uri = '/account/settings?tab=notifications'
+    value.user_id = 1048576
+    value.username = 'example.user'
+    value.roles = ['member', 'editor']
+    value.csrf_token = 'f3a9c2d1e8b74a6f9d0c5b2e1a7f4c3d'
+    value.flash = [{'level': 'info', 'message': 'Your settings were saved'}]
+    value.preferences = {'locale': 'en_US', 'timezone': 'America/New_York',
+                         'theme': 'dark', 'items_per_page': 25}
+    value.cart = [{'sku': 'SKU-%05i' % offset, 'quantity': offset % 3 + 1}
+                  for offset in range(5)]
+    return value
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    codecs = [('json (default)', None),
+              ('pickle', serializers.get('pickle'))]
+    if serializers.msgpack:
+        codecs.insert(1, ('msgpack', serializers.get('msgpack')))
+    print('%-16s %8s %12s %16s' % ('serializer', 'bytes', 'zlib bytes',
+                                   'round trip (us)'))
+    for label, codec in codecs:
+        value = new_session(codec)
+        payload = value.dumps()
+
+        def round_trip():
+            value.loads(value.dumps())
+
+        elapsed = min(timeit.repeat(round_trip, number=iterations, repeat=3))
+        print('%-16s %8i %12i %16.2f' % (label, len(payload),
+                                         len(zlib.compress(payload)),
+                                         elapsed / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ from platform import python_version_tuple
 from setuptools import setup
 import sys
 
-requirements = ['helper', 'pyyaml', 'tornado>=3.1']
+requirements = ['helper', 'pyyaml', 'tornado>=4.0']
 test_requirements = ['mock', 'nose']
 (major, minor, rev) = python_version_tuple()
 if float('%s.%s' % (major, minor)) < 2.7:
@@ -50,7 +50,8 @@ setup(name='tinman',
                 'tinman.loaders',
                 'tinman.utilities'],
       install_requires=requirements,
-      extras_require={'Heapy': 'guppy',
+      extras_require={'File Sessions': 'futures',
+                      'Heapy': 'guppy',
                       'LDAP': 'python-ldap',
                       'MsgPack': 'msgpack',
                       'NewRelic': 'newrelic',
@@ -58,6 +59,7 @@ setup(name='tinman',
                       'RabbitMQ': 'pika',
                       'Redis': 'tornado-redis',
                       'Redis Sessions': 'tornado-redis',
+                      'SQLite Storage': 'futures',
                       'Whitelist': 'ipaddr'},
       test_suite='nose.collector',
       tests_require=test_requirements,
@@ -66,5 +68,7 @@ setup(name='tinman',
                                          'tinman-init=tinman.utilities.'
                                          'initialize:main',
                                          'tinman-heap-report=tinman.utilities.'
-                                         'heapy_report:main']),
+                                         'heapy_report:main',
+                                         'tinman-session-report=tinman.'
+                                         'utilities.session_report:main']),
       zip_safe=True)
@@ -0,0 +1,60 @@
+import mock
+import sys
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman import cache
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_hit_and_miss(self):
+        obj = cache.LRUCache()
+        obj.set('a', 1)
+        self.assertEqual(obj.get('a'), 1)
+        self.assertIsNone(obj.get('b'))
+        self.assertEqual((obj.hits, obj.misses), (1, 1))
+
+    def test_evicts_least_recently_used_entry(self):
+        obj = cache.LRUCache(max_entries=2)
+        obj.set('a', 1)
+        obj.set('b', 2)
+        obj.get('a')
+        obj.set('c', 3)
+        self.assertIn('a', obj)
+        self.assertNotIn('b', obj)
+        self.assertEqual(obj.evictions, 1)
+
+    def test_evicts_to_max_bytes(self):
+        obj = cache.LRUCache(max_bytes=10)
+        obj.set('a', 'x', 6)
+        obj.set('b', 'y', 6)
+        self.assertEqual(len(obj), 1)
+        self.assertEqual(obj.bytes, 6)
+
+    def test_oversized_value_not_cached(self):
+        obj = cache.LRUCache(max_bytes=10)
+        self.assertFalse(obj.set('a', 'x', 11))
+        self.assertEqual(len(obj), 0)
+
+    def test_expired_entry_is_a_miss(self):
+        obj = cache.LRUCache()
+        with mock.patch('time.time', return_value=100):
+            obj.set('a', 1, ttl=10)
+        with mock.patch('time.time', return_value=111):
+            self.assertIsNone(obj.get('a'))
+        self.assertEqual(obj.expirations, 1)
+        self.assertEqual(obj.bytes, 0)
+
+    def test_delete_and_clear(self):
+        obj = cache.LRUCache()
+        obj.set('a', 1, 5)
+        obj.set('b', 2, 5)
+        self.assertTrue(obj.delete('a'))
+        self.assertFalse(obj.delete('a'))
+        self.assertEqual(obj.bytes, 5)
+        obj.clear()
+        self.assertEqual((len(obj), obj.bytes), (0, 0))
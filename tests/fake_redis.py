@@ -0,0 +1,199 @@
+"""
+An in-memory stand-in for tornadoredis.Client that invokes callbacks
+synchronously so coroutines using it complete without an IOLoop. Replies are
+converted the way tornadoredis converts them: DEL, EXPIRE and HDEL reply with
+a bool and TTL replies None for keys without a TTL.
+
+"""
+import fnmatch
+import time
+
+
+class Client(object):
+
+    def __init__(self):
+        self.data = dict()
+        self.expires = dict()
+        self.commands = list()
+
+    def _reply(self, callback, value):
+        if callback:
+            callback(value)
+        return value
+
+    def _expired(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.data.pop(key, None)
+            del self.expires[key]
+
+    def connect(self):
+        self.commands.append(('connect',))
+
+    def disconnect(self):
+        self.commands.append(('disconnect',))
+
+    def delete(self, *keys, **kwargs):
+        self.commands.append(('delete', keys))
+        count = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None:
+                count += 1
+            self.expires.pop(key, None)
+        return self._reply(kwargs.get('callback'), bool(count))
+
+    def expire(self, key, ttl, callback=None):
+        self.commands.append(('expire', key, ttl))
+        if key not in self.data:
+            return self._reply(callback, False)
+        self.expires[key] = time.time() + ttl
+        return self._reply(callback, True)
+
+    def get(self, key, callback=None):
+        self.commands.append(('get', key))
+        self._expired(key)
+        return self._reply(callback, self.data.get(key))
+
+    def hdel(self, key, *fields, **kwargs):
+        self.commands.append(('hdel', key, fields))
+        value = self.data.get(key, {})
+        count = len([value.pop(field) for field in fields if field in value])
+        return self._reply(kwargs.get('callback'), bool(count))
+
+    def hgetall(self, key, callback=None):
+        self.commands.append(('hgetall', key))
+        self._expired(key)
+        return self._reply(callback, dict(self.data.get(key, {})))
+
+    def hmget(self, key, fields, callback=None):
+        self.commands.append(('hmget', key, fields))
+        self._expired(key)
+        value = self.data.get(key, {})
+        return self._reply(callback,
+                           dict([(field, value.get(field))
+                                 for field in fields]))
+
+    def hmset(self, key, mapping, callback=None):
+        self.commands.append(('hmset', key, mapping))
+        self.data.setdefault(key, {}).update(mapping)
+        return self._reply(callback, True)
+
+    def mget(self, keys, callback=None):
+        self.commands.append(('mget', keys))
+        for key in keys:
+            self._expired(key)
+        return self._reply(callback, [self.data.get(key) for key in keys])
+
+    def set(self, key, value, expire=None, pexpire=None,
+            only_if_not_exists=False, only_if_exists=False, callback=None):
+        self.commands.append(('set', key))
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if expire:
+            self.expires[key] = time.time() + expire
+        return self._reply(callback, True)
+
+    def setex(self, key, ttl, value, callback=None):
+        return self.set(key, value, expire=ttl, callback=callback)
+
+    def scan(self, cursor, count=None, match=None, callback=None):
+        self.commands.append(('scan', cursor, count, match))
+        keys = sorted([key for key in self.data
+                       if not match or fnmatch.fnmatch(key, match)])
+        cursor = int(cursor)
+        batch = keys[cursor:cursor + (count or 10)]
+        next_cursor = cursor + len(batch)
+        if next_cursor >= len(keys):
+            next_cursor = 0
+        return self._reply(callback, [next_cursor, batch])
+
+    def strlen(self, key, callback=None):
+        self.commands.append(('strlen', key))
+        self._expired(key)
+        return self._reply(callback, len(self.data.get(key) or ''))
+
+    def ttl(self, key, callback=None):
+        self.commands.append(('ttl', key))
+        if key not in self.data:
+            return self._reply(callback, -2)
+        if key not in self.expires:
+            return self._reply(callback, None)
+        return self._reply(callback, int(self.expires[key] - time.time()))
+
+    def ping(self, callback=None):
+        self.commands.append(('ping',))
+        return self._reply(callback, True)
+
+    def publish(self, channel, message, callback=None):
+        self.commands.append(('publish', channel, message))
+        return self._reply(callback, 0)
+
+    def zadd(self, key, *score_value, **kwargs):
+        self.commands.append(('zadd', key) + score_value)
+        value = self.data.setdefault(key, {})
+        added = 0
+        for offset in range(0, len(score_value), 2):
+            member = score_value[offset + 1]
+            added += member not in value
+            value[member] = float(score_value[offset])
+        return self._reply(kwargs.get('callback'), added)
+
+    def zrem(self, key, *values, **kwargs):
+        self.commands.append(('zrem', key) + values)
+        value = self.data.get(key, {})
+        count = len([value.pop(member) for member in values
+                     if member in value])
+        if key in self.data and not value:
+            del self.data[key]
+        return self._reply(kwargs.get('callback'), count)
+
+    def zrangebyscore(self, key, start, end, offset=None, limit=None,
+                      with_scores=False, callback=None):
+        self.commands.append(('zrangebyscore', key, start, end, offset,
+                              limit))
+
+        def bound(value, compare):
+            value = str(value)
+            if value.startswith('('):
+                return lambda score: compare(score, float(value[1:]), False)
+            return lambda score: compare(score, float(value), True)
+
+        lower = bound(start, lambda a, b, inclusive: a >= b if inclusive
+                      else a > b)
+        upper = bound(end, lambda a, b, inclusive: a <= b if inclusive
+                      else a < b)
+        members = sorted([(score, member) for member, score
+                          in self.data.get(key, {}).items()
+                          if lower(score) and upper(score)])
+        if offset is not None:
+            members = members[offset:offset + limit]
+        if with_scores:
+            result = [(member, score) for score, member in members]
+        else:
+            result = [member for score, member in members]
+        return self._reply(callback, result)
+
+    def pipeline(self, transactional=False):
+        return Pipeline(self)
+
+
+class Pipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.queued = list()
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.queued.append((method, args, kwargs))
+        return queue
+
+    def execute(self, callback=None):
+        self.client.commands.append(('execute', len(self.queued)))
+        results = [method(*args, **kwargs)
+                   for method, args, kwargs in self.queued]
+        self.queued = list()
+        if callback:
+            callback(results)
+        return results
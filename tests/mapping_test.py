@@ -0,0 +1,199 @@
+import sys
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman import mapping
+from tinman import serializers
+
+
+class Example(mapping.Mapping):
+    CONSTANT = 1
+    name = None
+    age = None
+
+    def method(self):
+        return True
+
+    @property
+    def computed(self):
+        return 'computed'
+
+
+class ExtendedExample(Example):
+    location = None
+
+
+class SchemaTests(unittest.TestCase):
+
+    def test_schema_is_compiled_for_class(self):
+        self.assertEqual(Example._schema, ('age', 'name'))
+
+    def test_schema_is_inherited(self):
+        self.assertEqual(ExtendedExample._schema, ('age', 'location', 'name'))
+
+    def test_keys_exclude_methods_properties_and_constants(self):
+        self.assertEqual(Example().keys(), ['age', 'name'])
+
+    def test_dynamic_attribute_added_to_keys(self):
+        obj = Example()
+        self.assertEqual(obj.keys(), ['age', 'name'])
+        obj.color = 'blue'
+        self.assertEqual(obj.keys(), ['age', 'color', 'name'])
+        self.assertTrue('color' in obj)
+
+    def test_dynamic_attribute_removed_from_keys(self):
+        obj = Example()
+        obj.color = 'blue'
+        self.assertTrue('color' in obj)
+        del obj.color
+        self.assertFalse('color' in obj)
+        self.assertEqual(len(obj), 2)
+
+    def test_kwargs_become_keys(self):
+        obj = mapping.Mapping(foo=1, bar=2)
+        self.assertEqual(obj.keys(), ['bar', 'foo'])
+        self.assertEqual(obj.as_dict(), {'foo': 1, 'bar': 2})
+
+    def test_class_attribute_added_after_definition(self):
+        class Late(mapping.Mapping):
+            first = None
+
+        class LateChild(Late):
+            pass
+
+        obj = LateChild()
+        self.assertEqual(obj.keys(), ['first'])
+        Late.second = None
+        self.assertEqual(LateChild._schema, ('first', 'second'))
+        self.assertEqual(obj.keys(), ['first', 'second'])
+        del Late.second
+        self.assertEqual(obj.keys(), ['first'])
+
+    def test_getitem_raises_key_error(self):
+        self.assertRaises(KeyError, Example().__getitem__, 'method')
+
+    def test_dirty_keys_tracked(self):
+        obj = Example()
+        self.assertFalse(obj.dirty)
+        obj.name = 'foo'
+        obj.color = 'blue'
+        self.assertEqual(obj.dirty_keys, frozenset(['name', 'color']))
+        obj._mark_clean(['name'])
+        self.assertEqual(obj.dirty_keys, frozenset(['color']))
+        obj._mark_clean()
+        self.assertFalse(obj.dirty)
+
+    def test_items_and_values_ordering(self):
+        obj = Example(name='foo', age=10)
+        self.assertEqual(obj.items(), [('age', 10), ('name', 'foo')])
+        self.assertEqual(obj.values(), [10, 'foo'])
+
+
+class CompactExample(mapping.Mapping):
+    FIELDS = ('name', 'age')
+    age = 0
+
+
+class CompactChild(CompactExample):
+    location = None
+
+
+class CompactTests(unittest.TestCase):
+
+    def test_values_are_stored_in_slots(self):
+        self.assertEqual(CompactExample.__slots__,
+                         ('_dirty_keys', '_key_cache', 'age', 'name'))
+
+    def test_defaults_assigned(self):
+        obj = CompactExample()
+        self.assertEqual(obj.as_dict(), {'age': 0, 'name': None})
+        self.assertFalse(obj.dirty)
+
+    def test_kwargs_assigned(self):
+        obj = CompactExample(name='foo', age=1)
+        self.assertEqual(obj.as_dict(), {'age': 1, 'name': 'foo'})
+        self.assertTrue(obj.dirty)
+
+    def test_undeclared_field_raises(self):
+        obj = CompactExample()
+        self.assertRaises(AttributeError, setattr, obj, 'color', 'blue')
+
+    def test_instances_have_no_dict(self):
+        self.assertFalse(hasattr(CompactExample(), '__dict__'))
+
+    def test_class_assignment_to_slotted_field_raises(self):
+        self.assertRaises(AttributeError, setattr, CompactExample, 'age', 5)
+        self.assertEqual(CompactExample(age=1).age, 1)
+
+    def test_class_deletion_of_slotted_field_raises(self):
+        self.assertRaises(AttributeError, delattr, CompactExample, 'name')
+
+    def test_subclass_is_compact(self):
+        obj = CompactChild(name='foo', location='here')
+        self.assertEqual(CompactChild.__slots__, ('location',))
+        self.assertEqual(obj.keys(), ['age', 'location', 'name'])
+        self.assertEqual(obj.location, 'here')
+
+    def test_clear_resets_defaults(self):
+        obj = CompactChild(name='foo', age=1, location='here')
+        obj.clear()
+        self.assertEqual(obj.as_dict(),
+                         {'age': 0, 'location': None, 'name': None})
+
+    def test_dumps_and_loads(self):
+        obj = CompactExample(name='foo', age=1)
+        other = CompactExample()
+        other.loads(obj.dumps())
+        self.assertEqual(obj, other)
+
+    def test_equality_and_hash(self):
+        obj = CompactExample(name='foo', age=1)
+        other = CompactExample(name='foo', age=1)
+        self.assertEqual(obj, other)
+        self.assertEqual(hash(obj), hash(other))
+        other.age = 2
+        self.assertNotEqual(obj, other)
+
+
+class SerializerTests(unittest.TestCase):
+
+    def test_dumps_defaults_to_json(self):
+        obj = Example(name='foo', age=1)
+        self.assertEqual(serializers.detect(obj.dumps()), 'json')
+
+    def test_dumps_uses_codec(self):
+        obj = Example(name='foo', age=1)
+        obj._codec = serializers.get('msgpack')
+        self.assertEqual(serializers.detect(obj.dumps()), 'msgpack')
+
+    def test_loads_detects_msgpack_without_codec(self):
+        obj = Example(name='foo', age=1)
+        obj._codec = serializers.get('msgpack')
+        other = Example()
+        other.loads(obj.dumps())
+        self.assertEqual(other.as_dict(), {'age': 1, 'name': 'foo'})
+
+    def test_loads_detects_json_with_codec(self):
+        other = Example()
+        other._codec = serializers.get('msgpack')
+        other.loads(Example(name='foo', age=1).dumps())
+        self.assertEqual(other.as_dict(), {'age': 1, 'name': 'foo'})
+
+    def test_loads_refuses_pickle_without_codec(self):
+        obj = Example(name='foo', age=1)
+        obj._codec = serializers.get('pickle')
+        self.assertRaises(ValueError, Example().loads, obj.dumps())
+
+    def test_loads_pickle_with_codec(self):
+        obj = Example(name='foo', age=1)
+        obj._codec = serializers.get('pickle')
+        other = Example()
+        other._codec = obj._codec
+        other.loads(obj.dumps())
+        self.assertEqual(other.as_dict(), {'age': 1, 'name': 'foo'})
+
+    def test_unknown_serializer_raises(self):
+        self.assertRaises(ValueError, serializers.get, 'yaml')
@@ -0,0 +1,350 @@
+import sys
+from tornado import gen
+from tornado import testing
+from tornado import web
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman.decorators import memoize
+from tinman.handlers import base
+
+
+class MemoizedHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize
+    def get(self, value):
+        MemoizedHandler.calls += 1
+        if value == 'missing':
+            raise web.HTTPError(404)
+        if value == 'json':
+            self.finish({'value': value})
+            return
+        self.write('Hello ')
+        self.finish(value)
+
+    head = get
+
+
+class TinmanJSONHandler(base.RequestHandler):
+    calls = 0
+
+    @memoize.memoize
+    def get(self):
+        TinmanJSONHandler.calls += 1
+        self.finish({'path': '</script>', 'value': u'\u00e9'})
+
+
+class RedirectHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize(headers=['X-Example'])
+    def get(self):
+        RedirectHandler.calls += 1
+        self.set_header('X-Example', 'example')
+        self.set_header('X-Uncached', 'uncached')
+        self.redirect('/foo', permanent=True)
+
+
+class ExpiringHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize(ttl=60)
+    def get(self):
+        ExpiringHandler.calls += 1
+        self.finish('expiring')
+
+
+class VaryingHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize(vary=['Accept-Language'], cookies=['locale'])
+    def get(self):
+        VaryingHandler.calls += 1
+        self.finish('%s %s' % (self.request.headers.get('Accept-Language'),
+                               self.get_cookie('locale')))
+
+
+class KeyedHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize(key=lambda handler: handler.request.path)
+    def get(self):
+        KeyedHandler.calls += 1
+        self.finish(self.get_argument('value', ''))
+
+
+class SlowHandler(web.RequestHandler):
+    calls = 0
+    delay = 0.05
+    fail = False
+
+    @memoize.memoize(timeout=0.5)
+    @gen.coroutine
+    def get(self):
+        SlowHandler.calls += 1
+        fail, SlowHandler.fail = SlowHandler.fail, False
+        yield gen.sleep(SlowHandler.delay)
+        if fail:
+            raise web.HTTPError(503)
+        self.finish('slow %i' % SlowHandler.calls)
+
+
+class StaleHandler(web.RequestHandler):
+    calls = 0
+    fail = False
+
+    @memoize.memoize(ttl=0.05, stale_ttl=60)
+    def get(self):
+        StaleHandler.calls += 1
+        if StaleHandler.fail:
+            raise web.HTTPError(503)
+        self.finish('stale %i' % StaleHandler.calls)
+
+
+class RefreshAheadHandler(web.RequestHandler):
+    calls = 0
+
+    @memoize.memoize(ttl=60, refresh_ahead=60)
+    def get(self):
+        RefreshAheadHandler.calls += 1
+        self.finish('ahead %i' % RefreshAheadHandler.calls)
+
+
+class LabelledHandler(web.RequestHandler):
+    calls = 0
+
+    def initialize(self, label):
+        self.label = label
+
+    @memoize.memoize(ttl=0.05, stale_ttl=60)
+    def get(self):
+        LabelledHandler.calls += 1
+        self.finish('%s %i' % (self.label, LabelledHandler.calls))
+
+
+class MemoizeTests(testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return web.Application([(r'/expiring', ExpiringHandler),
+                                (r'/keyed', KeyedHandler),
+                                (r'/labelled', LabelledHandler,
+                                 {'label': 'labelled'}),
+                                (r'/redirect', RedirectHandler),
+                                (r'/ahead', RefreshAheadHandler),
+                                (r'/slow', SlowHandler),
+                                (r'/stale', StaleHandler),
+                                (r'/tinman', TinmanJSONHandler),
+                                (r'/varying', VaryingHandler),
+                                (r'/(.*)', MemoizedHandler)])
+
+    def setUp(self):
+        super(MemoizeTests, self).setUp()
+        memoize.flush()
+        MemoizedHandler.calls = 0
+        ExpiringHandler.calls = 0
+        KeyedHandler.calls = 0
+        LabelledHandler.calls = 0
+        RedirectHandler.calls = 0
+        SlowHandler.calls = 0
+        SlowHandler.delay = 0.05
+        SlowHandler.fail = False
+        StaleHandler.calls = 0
+        StaleHandler.fail = False
+        TinmanJSONHandler.calls = 0
+        RefreshAheadHandler.calls = 0
+        VaryingHandler.calls = 0
+        self.addCleanup(memoize.flush)
+
+    def test_response_cached_by_arguments(self):
+        hits = memoize.stats()['hits']
+        for _offset in range(2):
+            self.assertEqual(self.fetch('/foo').body, 'Hello foo')
+        self.assertEqual(self.fetch('/bar').body, 'Hello bar')
+        self.assertEqual(MemoizedHandler.calls, 2)
+        stats = memoize.stats()
+        self.assertEqual((stats['hits'] - hits, stats['entries']), (1, 2))
+
+    def test_content_type_replayed(self):
+        self.fetch('/json')
+        response = self.fetch('/json')
+        self.assertEqual(response.body, '{"value": "json"}')
+        self.assertIn('application/json', response.headers['Content-Type'])
+        self.assertEqual(MemoizedHandler.calls, 1)
+
+    def test_cached_body_matches_handler_output(self):
+        headers = {'User-Agent': 'curl/7.0'}
+        response = self.fetch('/tinman', headers=headers)
+        self.assertIn('<\\/script>', response.body)
+        self.assertEqual(self.fetch('/tinman', headers=headers).body,
+                         response.body)
+        self.assertEqual(TinmanJSONHandler.calls, 1)
+
+    def test_errors_not_cached(self):
+        for _offset in range(2):
+            self.assertEqual(self.fetch('/missing').code, 404)
+        self.assertEqual(MemoizedHandler.calls, 2)
+
+    def test_ttl_assigned(self):
+        self.fetch('/expiring')
+        self.fetch('/expiring')
+        self.assertEqual(ExpiringHandler.calls, 1)
+        entry = memoize.CACHE._entries.values()[0]
+        self.assertIsNotNone(entry[2])
+
+    def test_cache_is_bounded(self):
+        memoize.CACHE.max_entries = 2
+        self.addCleanup(setattr, memoize.CACHE, 'max_entries',
+                        memoize.MAX_ENTRIES)
+        evictions = memoize.stats()['evictions']
+        for value in ('a', 'b', 'c'):
+            self.fetch('/%s' % value)
+        self.assertEqual(len(memoize.CACHE), 2)
+        self.assertEqual(memoize.stats()['evictions'] - evictions, 1)
+
+    def test_flush(self):
+        self.fetch('/foo')
+        memoize.flush()
+        self.fetch('/foo')
+        self.assertEqual(MemoizedHandler.calls, 2)
+
+    def test_query_arguments_normalized(self):
+        self.fetch('/foo?b=2&a=1')
+        self.assertEqual(self.fetch('/foo?a=1&b=2').body, 'Hello foo')
+        self.fetch('/foo?a=2&b=2')
+        self.assertEqual(MemoizedHandler.calls, 2)
+
+    def test_http_method_in_key(self):
+        self.fetch('/foo')
+        self.fetch('/foo', method='HEAD')
+        self.assertEqual(MemoizedHandler.calls, 2)
+
+    def test_vary_headers_and_cookies(self):
+        for headers in [{'Accept-Language': 'en'},
+                        {'Accept-Language': 'en'},
+                        {'Accept-Language': 'fr'},
+                        {'Accept-Language': 'en', 'Cookie': 'locale=en_GB'}]:
+            response = self.fetch('/varying', headers=headers)
+        self.assertEqual(response.body, 'en en_GB')
+        self.assertEqual(response.headers['Vary'], 'Accept-Language')
+        self.assertEqual(VaryingHandler.calls, 3)
+
+    def test_custom_key(self):
+        self.fetch('/keyed?value=foo')
+        self.assertEqual(self.fetch('/keyed?value=bar').body, 'foo')
+        self.assertEqual(KeyedHandler.calls, 1)
+
+    def test_status_and_headers_cached(self):
+        for _offset in range(2):
+            response = self.fetch('/redirect', follow_redirects=False)
+        self.assertEqual(response.code, 301)
+        self.assertEqual(response.headers['Location'], '/foo')
+        self.assertEqual(response.headers['X-Example'], 'example')
+        self.assertNotIn('X-Uncached', response.headers)
+        self.assertEqual(RedirectHandler.calls, 1)
+
+    def test_etag_matches_uncached_response(self):
+        etag = self.fetch('/foo').headers['Etag']
+        self.assertEqual(self.fetch('/foo').headers['Etag'], etag)
+
+    def test_not_modified_served_from_cache(self):
+        etag = self.fetch('/foo').headers['Etag']
+        response = self.fetch('/foo', headers={'If-None-Match': etag})
+        self.assertEqual(response.code, 304)
+        self.assertEqual(response.body, '')
+        self.assertEqual(MemoizedHandler.calls, 1)
+
+    def test_stale_etag_gets_full_response(self):
+        self.fetch('/foo')
+        response = self.fetch('/foo', headers={'If-None-Match': '"stale"'})
+        self.assertEqual((response.code, response.body), (200, 'Hello foo'))
+
+    def fetch_concurrently(self, path, count):
+        return [self.http_client.fetch(self.get_url(path), raise_error=False)
+                for _offset in range(count)]
+
+    @testing.gen_test
+    def test_concurrent_misses_coalesced(self):
+        responses = yield self.fetch_concurrently('/slow', 3)
+        self.assertEqual([response.body for response in responses],
+                         ['slow 1'] * 3)
+        self.assertEqual(SlowHandler.calls, 1)
+        self.assertEqual(memoize.stats()['in_flight'], 0)
+
+    @testing.gen_test
+    def test_failed_leader_falls_back(self):
+        SlowHandler.fail = True
+        responses = yield self.fetch_concurrently('/slow', 2)
+        self.assertEqual([response.code for response in responses],
+                         [503, 200])
+        self.assertEqual(SlowHandler.calls, 2)
+
+    @testing.gen_test
+    def test_timed_out_leader_falls_back(self):
+        SlowHandler.delay = 1
+        leader = self.http_client.fetch(self.get_url('/slow'))
+        yield gen.sleep(0.01)
+        SlowHandler.delay = 0
+        follower = yield self.http_client.fetch(self.get_url('/slow'))
+        self.assertEqual(follower.body, 'slow 2')
+        self.assertEqual(memoize.stats()['in_flight'], 0)
+        yield leader
+
+    @gen.coroutine
+    def wait_for_refresh(self):
+        while memoize.stats()['in_flight']:
+            yield gen.sleep(0.01)
+
+    @testing.gen_test
+    def test_stale_response_served_and_refreshed(self):
+        stats = memoize.stats()
+        yield self.http_client.fetch(self.get_url('/stale'))
+        yield gen.sleep(0.06)
+        responses = yield [self.http_client.fetch(self.get_url('/stale'))
+                           for _offset in range(2)]
+        self.assertEqual([response.body for response in responses],
+                         ['stale 1'] * 2)
+        yield self.wait_for_refresh()
+        response = yield self.http_client.fetch(self.get_url('/stale'))
+        self.assertEqual(response.body, 'stale 2')
+        self.assertEqual(StaleHandler.calls, 2)
+        values = memoize.stats()
+        self.assertEqual(values['stale_served'] - stats['stale_served'], 2)
+        self.assertEqual(values['refreshes'] - stats['refreshes'], 1)
+        self.assertGreater(values['refresh_latency'], 0)
+
+    @testing.gen_test
+    def test_failed_refresh_keeps_stale_response(self):
+        stats = memoize.stats()
+        yield self.http_client.fetch(self.get_url('/stale'))
+        yield gen.sleep(0.06)
+        StaleHandler.fail = True
+        yield self.http_client.fetch(self.get_url('/stale'))
+        yield self.wait_for_refresh()
+        self.assertEqual(memoize.stats()['refresh_failures'] -
+                         stats['refresh_failures'], 1)
+        response = yield self.http_client.fetch(self.get_url('/stale'))
+        self.assertEqual(response.body, 'stale 1')
+
+    @testing.gen_test
+    def test_refresh_ahead(self):
+        yield self.http_client.fetch(self.get_url('/ahead'))
+        response = yield self.http_client.fetch(self.get_url('/ahead'))
+        self.assertEqual(response.body, 'ahead 1')
+        yield self.wait_for_refresh()
+        response = yield self.http_client.fetch(self.get_url('/ahead'))
+        self.assertEqual(response.body, 'ahead 2')
+
+    @testing.gen_test
+    def test_refresh_with_initialize_arguments(self):
+        yield self.http_client.fetch(self.get_url('/labelled'))
+        yield gen.sleep(0.06)
+        response = yield self.http_client.fetch(self.get_url('/labelled'))
+        self.assertEqual(response.body, 'labelled 1')
+        yield self.wait_for_refresh()
+        self.assertEqual(memoize.stats()['in_flight'], 0)
+        response = yield self.http_client.fetch(self.get_url('/labelled'))
+        self.assertEqual(response.body, 'labelled 2')
@@ -0,0 +1,113 @@
+import email.utils
+import json
+import mock
+import sys
+from tornado import testing
+from tornado import web
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman.handlers import mixins
+from tinman import model
+
+import fake_redis
+
+REDIS = fake_redis.Client()
+
+
+class ExampleModel(model.AsyncRedisModel):
+    _indexes = {'name': model.INDEX_VALUE}
+    name = None
+
+
+class Handler(mixins.ModelAPIMixin):
+    MODEL = ExampleModel
+
+    def get_model(self, *args, **kwargs):
+        kwargs['redis_client'] = REDIS
+        return self.MODEL(*args, **kwargs)
+
+    def query_models(self, field, **kwargs):
+        kwargs['redis_client'] = REDIS
+        return self.MODEL.query(field=field, **kwargs)
+
+
+class ModelAPITests(testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        return web.Application([(r'/(?P<id>.*)', Handler)])
+
+    def setUp(self):
+        super(ModelAPITests, self).setUp()
+        REDIS.data.clear()
+        self.model = ExampleModel('1', redis_client=REDIS,
+                                  name='foo')
+        self.model.save().result()
+        REDIS.commands = list()
+
+    def test_get(self):
+        response = self.fetch('/1')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.headers['Etag'], '"%s"' % self.model.sha1())
+        self.assertEqual(int(response.headers['Content-Length']),
+                         len(response.body))
+
+    def test_get_serializes_once(self):
+        with mock.patch.object(ExampleModel, 'as_dict',
+                               autospec=True,
+                               side_effect=model.Model.as_dict) as as_dict:
+            self.assertEqual(self.fetch('/1').code, 200)
+        self.assertEqual(as_dict.call_count, 1)
+
+    def test_get_not_found(self):
+        self.assertEqual(self.fetch('/2').code, 404)
+
+    def test_if_none_match_answered_from_metadata(self):
+        response = self.fetch('/1', headers={'If-None-Match':
+                                             '"%s"' % self.model.sha1()})
+        self.assertEqual(response.code, 304)
+        self.assertEqual(REDIS.commands, [('get', 'ExampleModel:1:meta')])
+
+    def test_if_none_match_mismatch(self):
+        response = self.fetch('/1', headers={'If-None-Match': '"abc"'})
+        self.assertEqual(response.code, 200)
+
+    def test_if_modified_since(self):
+        since = email.utils.formatdate(self.model.last_updated_at + 60,
+                                       usegmt=True)
+        response = self.fetch('/1', headers={'If-Modified-Since': since})
+        self.assertEqual(response.code, 304)
+
+    def test_if_modified_since_stale(self):
+        since = email.utils.formatdate(self.model.last_updated_at - 60,
+                                       usegmt=True)
+        response = self.fetch('/1', headers={'If-Modified-Since': since})
+        self.assertEqual(response.code, 200)
+
+    def test_head_if_none_match(self):
+        response = self.fetch('/1', method='HEAD',
+                              headers={'If-None-Match':
+                                       '"%s"' % self.model.sha1()})
+        self.assertEqual(response.code, 304)
+
+    def test_collection(self):
+        ExampleModel('2', redis_client=REDIS, name='foo').save().result()
+        response = self.fetch('/?index=name&value=foo&limit=1')
+        self.assertEqual(response.code, 200)
+        body = json.loads(response.body)
+        self.assertEqual(len(body['items']), 1)
+        body = json.loads(self.fetch('/?index=name&value=foo&cursor=' +
+                                     body['cursor']).body)
+        self.assertEqual(len(body['items']), 1)
+        self.assertIsNone(body['cursor'])
+
+    def test_collection_invalid_query(self):
+        self.assertEqual(self.fetch('/?index=missing').code, 400)
+        self.assertEqual(self.fetch('/?index=name&value=foo&min=x').code,
+                         400)
+
+    def test_collection_without_index(self):
+        self.assertEqual(self.fetch('/').code, 405)
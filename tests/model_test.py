@@ -0,0 +1,426 @@
+import mock
+import sys
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman import model
+from tinman import serializers
+
+import fake_redis
+
+
+class ExampleModel(model.AsyncRedisModel):
+    name = None
+    age = None
+
+
+class ExpiringModel(ExampleModel):
+    _ttl = 60
+
+
+class BulkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+
+    def new_model(self, item_id, cls=ExampleModel, **kwargs):
+        return cls(item_id, redis_client=self.redis, **kwargs)
+
+    def test_save_many_uses_one_pipeline(self):
+        models = [self.new_model(str(i), name='foo', age=i) for i in range(5)]
+        self.redis.commands = list()
+        result = ExampleModel.save_many(models).result()
+        self.assertEqual(result, [True] * 5)
+        self.assertEqual(self.redis.commands[0], ('execute', 10))
+        self.assertFalse(any([value.dirty for value in models]))
+
+    def test_save_many_applies_ttl(self):
+        models = [self.new_model(str(i), ExpiringModel) for i in range(3)]
+        self.assertEqual(ExpiringModel.save_many(models).result(),
+                         [True] * 3)
+        self.assertEqual(len(self.redis.expires), 6)
+
+    def test_fetch_many_uses_one_mget(self):
+        ExampleModel.save_many([self.new_model(str(i), name='foo', age=i)
+                                for i in range(3)]).result()
+        self.redis.commands = list()
+        result = ExampleModel.fetch_many(['0', '1', '2'], self.redis).result()
+        self.assertEqual(len(self.redis.commands), 1)
+        self.assertEqual(self.redis.commands[0][0], 'mget')
+        self.assertEqual([value.age for value in result], [0, 1, 2])
+        self.assertFalse(any([value.dirty for value in result]))
+        self.assertFalse(any([value.is_new for value in result]))
+
+    def test_fetch_many_missing_items_are_none(self):
+        self.new_model('1', name='foo').save().result()
+        result = ExampleModel.fetch_many(['0', '1'], self.redis).result()
+        self.assertIsNone(result[0])
+        self.assertEqual(result[1].name, 'foo')
+
+    def test_fetch_many_empty(self):
+        self.assertEqual(ExampleModel.fetch_many([], self.redis).result(), [])
+        self.assertEqual(self.redis.commands, [])
+
+
+class LoadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+
+    def test_constructor_does_not_fetch(self):
+        value = ExampleModel('1', redis_client=self.redis)
+        self.assertEqual(self.redis.commands, [])
+        self.assertFalse(value.is_new)
+
+    def test_constructor_without_id_is_new(self):
+        self.assertTrue(ExampleModel(redis_client=self.redis).is_new)
+
+    def test_load(self):
+        ExampleModel('1', redis_client=self.redis, name='foo').save().result()
+        value = ExampleModel.load('1', redis_client=self.redis).result()
+        self.assertEqual(value.name, 'foo')
+        self.assertFalse(value.dirty)
+
+    def test_load_missing(self):
+        self.assertIsNone(ExampleModel.load('1',
+                                            redis_client=self.redis).result())
+
+
+class HashModel(ExampleModel):
+    _storage = model.STORAGE_HASH
+
+
+class HashStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+        self.model = HashModel('1', redis_client=self.redis,
+                               name='foo', age=10)
+        self.model._new = True
+        self.model.save().result()
+
+    def test_new_model_writes_all_fields(self):
+        self.assertEqual(set(self.redis.data['HashModel:1'].keys()),
+                         set(self.model.keys() + [model.META_FIELD]))
+
+    def test_save_writes_only_dirty_fields(self):
+        self.model.age = 11
+        self.redis.commands = list()
+        self.assertTrue(self.model.save().result())
+        self.assertEqual(self.redis.commands[1][:2], ('hmset', 'HashModel:1'))
+        self.assertEqual(set(self.redis.commands[1][2].keys()),
+                         set(['age', 'last_updated_at', model.META_FIELD]))
+        self.assertFalse(self.model.dirty)
+
+    def test_save_removes_deleted_fields(self):
+        self.model.color = 'blue'
+        self.model.save().result()
+        self.assertIn('color', self.redis.data['HashModel:1'])
+        del self.model.color
+        self.assertTrue(self.model.save().result())
+        self.assertNotIn('color', self.redis.data['HashModel:1'])
+
+    def test_save_removes_unstored_field(self):
+        self.model.color = 'blue'
+        del self.model.color
+        self.assertTrue(self.model.save().result())
+        self.assertFalse(self.model.dirty)
+
+    def test_fetch_subset_of_fields(self):
+        value = HashModel('1', redis_client=self.redis)
+        self.assertTrue(value.fetch(['age']).result())
+        self.assertEqual(value.age, 10)
+        self.assertIsNone(value.name)
+        self.assertFalse(value.dirty)
+
+    def test_fetch_all_fields(self):
+        value = HashModel('1', redis_client=self.redis)
+        self.assertTrue(value.fetch().result())
+        self.assertEqual(value.as_dict(), self.model.as_dict())
+
+    def test_fetch_missing(self):
+        value = HashModel('2', redis_client=self.redis)
+        self.assertFalse(value.fetch().result())
+
+    def test_fetch_many(self):
+        result = HashModel.fetch_many(['1', '2'], self.redis).result()
+        self.assertEqual(result[0].name, 'foo')
+        self.assertIsNone(result[1])
+
+
+class IndexedModel(ExampleModel):
+    _indexes = {'age': model.INDEX_RANGE, 'name': model.INDEX_VALUE}
+
+
+class IndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+        IndexedModel.save_many([IndexedModel(str(i), redis_client=self.redis,
+                                             name='foo' if i % 2 else 'bar',
+                                             age=i)
+                                for i in range(10)]).result()
+
+    def query(self, *args, **kwargs):
+        models, cursor = IndexedModel.query(self.redis, *args,
+                                            **kwargs).result()
+        return [value.id for value in models], cursor
+
+    def test_save_adds_to_indexes(self):
+        self.assertEqual(len(self.redis.data['IndexedModel:index:age']), 10)
+        self.assertEqual(len(self.redis.data['IndexedModel:index:name:foo']),
+                         5)
+
+    def test_range_query(self):
+        self.assertEqual(self.query('age', minimum=3, maximum='(6'),
+                         (['3', '4', '5'], None))
+
+    def test_value_query(self):
+        ids, cursor = self.query('name', 'foo')
+        self.assertEqual(sorted(ids), ['1', '3', '5', '7', '9'])
+
+    def test_pagination(self):
+        ids, cursor = self.query('age', limit=4)
+        self.assertEqual(ids, ['0', '1', '2', '3'])
+        ids, cursor = self.query('age', cursor=cursor, limit=4)
+        self.assertEqual(ids, ['4', '5', '6', '7'])
+        ids, cursor = self.query('age', cursor=cursor, limit=4)
+        self.assertEqual((ids, cursor), (['8', '9'], None))
+
+    def test_pagination_with_equal_scores(self):
+        pages, cursor = list(), None
+        while True:
+            ids, cursor = self.query('name', 'foo', cursor=cursor, limit=2)
+            pages += ids
+            if not cursor:
+                break
+        self.assertEqual(sorted(pages), ['1', '3', '5', '7', '9'])
+
+    def test_save_moves_value_index(self):
+        value = IndexedModel.load('1', redis_client=self.redis).result()
+        value.name = 'baz'
+        self.assertTrue(value.save().result())
+        self.assertNotIn('1', self.redis.data['IndexedModel:index:name:foo'])
+        self.assertEqual(self.query('name', 'baz')[0], ['1'])
+
+    def test_save_skips_unchanged_indexes(self):
+        value = IndexedModel.load('1', redis_client=self.redis).result()
+        value.color = 'blue'
+        self.redis.commands = list()
+        value.save().result()
+        self.assertNotIn('zadd', [command[0]
+                                  for command in self.redis.commands])
+
+    def test_delete_removes_from_indexes(self):
+        value = IndexedModel.load('1', redis_client=self.redis).result()
+        self.assertTrue(value.delete().result())
+        self.assertEqual(self.query('age', minimum=1, maximum=1),
+                         ([], None))
+        self.assertNotIn('1', self.redis.data['IndexedModel:index:name:foo'])
+
+    def test_query_prunes_expired_models(self):
+        for item_id in ('1', '2'):
+            del self.redis.data['IndexedModel:%s' % item_id]
+        ids, cursor = self.query('age', limit=4)
+        self.assertEqual(ids, ['0', '3', '4', '5'])
+        self.assertEqual(self.query('age', cursor=cursor, limit=4),
+                         (['6', '7', '8', '9'], None))
+        self.assertNotIn('1', self.redis.data['IndexedModel:index:age'])
+        self.assertNotIn('2', self.redis.data['IndexedModel:index:age'])
+
+    def test_query_unindexed_field(self):
+        self.assertRaises(ValueError,
+                          IndexedModel.query(self.redis, 'color').result)
+
+    def test_query_value_index_requires_value(self):
+        self.assertRaises(ValueError,
+                          IndexedModel.query(self.redis, 'name').result)
+
+
+class CodecModel(ExampleModel):
+    _codec = serializers.MsgPack()
+
+
+class CodecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+
+    def test_raw_value_stored(self):
+        value = CodecModel('1', redis_client=self.redis,
+                           name='foo', age=10)
+        value.save().result()
+        stored = serializers.MsgPack().deserialize(
+            self.redis.data['CodecModel:1'])
+        self.assertEqual(stored['name'], 'foo')
+
+    def test_round_trip(self):
+        CodecModel('1', redis_client=self.redis,
+                   name='foo', age=10).save().result()
+        value = CodecModel('1', redis_client=self.redis)
+        self.assertTrue(value.fetch().result())
+        self.assertEqual((value.name, value.age), ('foo', 10))
+
+    def test_reads_base64_value(self):
+        legacy = ExampleModel('1', redis_client=self.redis,
+                              name='foo', age=10)
+        self.redis.data['CodecModel:1'] = legacy._encode()
+        value = CodecModel('1', redis_client=self.redis)
+        self.assertTrue(value.fetch().result())
+        self.assertEqual((value.name, value.age), ('foo', 10))
+
+    def test_reads_raw_json_value(self):
+        self.redis.data['CodecModel:1'] = serializers.JSON().serialize(
+            {'name': 'foo', 'age': 10})
+        value = CodecModel('1', redis_client=self.redis)
+        self.assertTrue(value.fetch().result())
+        self.assertEqual((value.name, value.age), ('foo', 10))
+
+
+class DigestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+
+    def new_model(self, cls=ExampleModel, **kwargs):
+        return cls('1', redis_client=self.redis, **kwargs)
+
+    def test_digest_cached(self):
+        value = self.new_model(name='foo')
+        digest = value.sha1()
+        self.assertIs(value.sha1(), digest)
+
+    def test_digest_reset_on_set(self):
+        value = self.new_model(name='foo')
+        digest = value.sha1()
+        value.name = 'bar'
+        self.assertNotEqual(value.sha1(), digest)
+
+    def test_save_sets_last_updated_at(self):
+        value = self.new_model(name='foo')
+        value.save().result()
+        self.assertIsNotNone(value.last_updated_at)
+
+    def test_digest_loaded_with_model(self):
+        value = self.new_model(name='foo')
+        value.save().result()
+        other = self.new_model()
+        other.fetch().result()
+        self.assertEqual(other._sha1, value.sha1())
+
+    def test_fetch_metadata(self):
+        value = self.new_model(name='foo')
+        value.save().result()
+        self.redis.commands = list()
+        metadata = self.new_model().fetch_metadata().result()
+        self.assertEqual(metadata, {'sha1': value.sha1(),
+                                    'last_updated_at': value.last_updated_at})
+        self.assertEqual(self.redis.commands, [('get', 'ExampleModel:1:meta')])
+
+    def test_fetch_metadata_hash_storage(self):
+        value = self.new_model(HashModel, name='foo')
+        value._new = True
+        value.save().result()
+        metadata = self.new_model(HashModel).fetch_metadata().result()
+        self.assertEqual(metadata['sha1'], value.sha1())
+
+    def test_partial_fetch_removes_stored_digest(self):
+        value = self.new_model(HashModel, name='foo')
+        value._new = True
+        value.save().result()
+        other = self.new_model(HashModel)
+        other.fetch(['name']).result()
+        other.name = 'bar'
+        other.save().result()
+        self.assertIsNone(self.new_model(HashModel).fetch_metadata().result())
+
+    def test_repeated_partial_saves(self):
+        value = self.new_model(HashModel, name='foo')
+        value._new = True
+        value.save().result()
+        for name in ('bar', 'baz'):
+            other = self.new_model(HashModel)
+            other.fetch(['name']).result()
+            other.name = name
+            self.assertTrue(other.save().result())
+            self.assertFalse(other.dirty)
+        self.assertEqual(self.redis.data['HashModel:1']['name'], '"baz"')
+
+    def test_delete_removes_metadata(self):
+        value = self.new_model(name='foo')
+        value.save().result()
+        self.assertTrue(value.delete().result())
+        self.assertEqual(self.redis.data, {})
+
+
+class CachedModel(ExampleModel):
+    _cache_ttl = 60
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fake_redis.Client()
+        patcher = mock.patch.object(model.MODEL_CACHE, 'subscribe')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model.MODEL_CACHE.clear()
+        CachedModel('1', redis_client=self.redis,
+                    name='foo').save().result()
+        self.redis.commands = list()
+
+    def new_model(self):
+        return CachedModel('1', redis_client=self.redis)
+
+    def test_second_fetch_served_from_cache(self):
+        self.assertTrue(self.new_model().fetch().result())
+        value = self.new_model()
+        self.assertTrue(value.fetch().result())
+        self.assertEqual(value.name, 'foo')
+        self.assertEqual(len(self.redis.commands), 1)
+
+    def test_save_invalidates_and_publishes(self):
+        value = self.new_model()
+        value.fetch().result()
+        value.name = 'bar'
+        value.save().result()
+        self.assertNotIn(value._key, model.MODEL_CACHE)
+        self.assertIn('publish', [command[0]
+                                  for command in self.redis.commands])
+        other = self.new_model()
+        other.fetch().result()
+        self.assertEqual(other.name, 'bar')
+
+    def test_delete_invalidates(self):
+        value = self.new_model()
+        value.fetch().result()
+        value.delete().result()
+        self.assertFalse(self.new_model().fetch().result())
+
+    def test_fetch_many_only_fetches_misses(self):
+        CachedModel('2', redis_client=self.redis,
+                    name='bar').save().result()
+        self.new_model().fetch().result()
+        self.redis.commands = list()
+        result = CachedModel.fetch_many(['1', '2'], self.redis).result()
+        self.assertEqual([value.name for value in result], ['foo', 'bar'])
+        self.assertEqual(self.redis.commands,
+                         [('mget', ['CachedModel:2', 'CachedModel:2:meta'])])
+
+    def test_remote_invalidation(self):
+        self.new_model().fetch().result()
+        count = model.MODEL_CACHE.remote_invalidations
+        message = mock.Mock(kind='message',
+                            body='otherhost:1:CachedModel:1')
+        model.MODEL_CACHE._on_message(message)
+        self.assertNotIn('CachedModel:1', model.MODEL_CACHE)
+        self.assertEqual(model.MODEL_CACHE.remote_invalidations, count + 1)
+
+    def test_own_invalidation_ignored(self):
+        self.new_model().fetch().result()
+        body = model.MODEL_CACHE.invalidation_message('CachedModel:1')
+        model.MODEL_CACHE._on_message(mock.Mock(kind='message', body=body))
+        self.assertIn('CachedModel:1', model.MODEL_CACHE)
@@ -0,0 +1,835 @@
+import errno
+import json
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from tornado import gen
+from tornado import testing
+from tornado import web
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman.handlers import base
+from tinman import exceptions
+from tinman import serializers
+from tinman import session
+from tinman import sqlite
+from tinman.utilities import session_report
+
+import fake_redis
+
+
+class CompactSession(session.Session):
+    FIELDS = ('username',)
+
+
+class CompactSessionTests(unittest.TestCase):
+
+    def test_clear(self):
+        value = CompactSession('a')
+        value.username = 'foo'
+        value.last_request_at = 10
+        value.clear()
+        self.assertEqual(value.as_dict(),
+                         {'id': None, 'ip_address': None,
+                          'last_request_at': None, 'last_request_uri': None,
+                          'username': None})
+        self.assertEqual(value.touched_at(), 0)
+
+
+class SessionSweeperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.sweeper = session.SessionSweeper(self.directory, 60,
+                                              batch_size=2)
+
+    def write(self, name, age=0):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'wb') as handle:
+            handle.write('{}')
+        modified = time.time() - age
+        os.utime(file_path, (modified, modified))
+        return file_path
+
+    def test_removes_expired_files_in_batches(self):
+        for offset in range(3):
+            self.write('expired%i' % offset, 120)
+        fresh = self.write('fresh')
+        self.sweeper.sweep()
+        self.assertLessEqual(self.sweeper.removed, 2)
+        self.sweeper.sweep()
+        self.assertEqual(self.sweeper.removed, 3)
+        self.assertEqual(os.listdir(self.directory), ['fresh'])
+        self.assertIn(fresh, self.sweeper._expires)
+
+    def test_lists_shard_directories_incrementally(self):
+        for shard in ('aa', 'bb', 'cc'):
+            os.mkdir(os.path.join(self.directory, shard))
+            self.write(os.path.join(shard, 'expired'), 120)
+        with mock.patch('os.listdir', side_effect=os.listdir) as listdir:
+            self.sweeper.sweep()
+        self.assertEqual(listdir.call_count, 1)
+        self.assertEqual(self.sweeper.removed, 0)
+        for _offset in range(3):
+            self.sweeper.sweep()
+        self.assertEqual(self.sweeper.removed, 3)
+        for shard in ('aa', 'bb', 'cc'):
+            self.assertEqual(os.listdir(os.path.join(self.directory, shard)),
+                             [])
+
+    def test_added_file_removed_when_expired(self):
+        file_path = self.write('added')
+        self.sweeper.sweep()
+        self.sweeper.add(file_path, time.time() - 1)
+        os.utime(file_path, (time.time() - 120, time.time() - 120))
+        self.sweeper.sweep()
+        self.assertFalse(os.path.exists(file_path))
+
+    def test_resaved_file_not_removed(self):
+        file_path = self.write('resaved')
+        self.sweeper.add(file_path, time.time() - 1)
+        self.sweeper.sweep()
+        self.assertTrue(os.path.exists(file_path))
+        self.assertGreater(self.sweeper._expires[file_path], time.time())
+
+    def test_does_not_relist_within_duration(self):
+        self.sweeper.sweep()
+        with mock.patch('os.listdir') as listdir:
+            self.sweeper.sweep()
+        self.assertFalse(listdir.called)
+
+
+class FileSessionTests(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(FileSessionTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(session.FileSession._sweepers.clear)
+        self.settings = {'directory': self.directory}
+        patcher = mock.patch('tinman.session.SessionSweeper.start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_session(self, session_id=None):
+        return session.FileSession(session_id, 60, self.settings)
+
+    def test_construction_does_not_scan_directory(self):
+        self.new_session()
+        with mock.patch('os.listdir') as listdir:
+            self.new_session()
+        self.assertFalse(listdir.called)
+
+    @testing.gen_test
+    def test_save_adds_to_sweeper(self):
+        value = self.new_session()
+        yield value.save()
+        sweeper = session.FileSession._sweepers[value._storage_dir]
+        self.assertIn(value._filename, sweeper._expires)
+
+    @testing.gen_test
+    def test_sweeper_runs_in_thread_pool(self):
+        value = self.new_session()
+        file_path = os.path.join(self.directory, 'expired')
+        with open(file_path, 'wb') as handle:
+            handle.write('{}')
+        modified = time.time() - 120
+        os.utime(file_path, (modified, modified))
+        sweeper = session.FileSession._sweepers[value._storage_dir]
+        self.assertIs(sweeper._executor, session.FileSession._executor)
+        threads = set()
+
+        def listdir(dir_path):
+            threads.add(threading.current_thread())
+            return os_listdir(dir_path)
+
+        os_listdir = os.listdir
+        with mock.patch('os.listdir', side_effect=listdir):
+            yield sweeper.sweep()
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(sweeper.removed, 1)
+        self.assertFalse(os.path.exists(file_path))
+
+    def test_cleanup_disabled(self):
+        self.settings['cleanup'] = False
+        self.new_session()
+        self.assertEqual(session.FileSession._sweepers, {})
+
+    @testing.gen_test
+    def test_save_writes_to_shard_directory(self):
+        value = self.new_session('3fa2c1')
+        value.username = 'foo'
+        result = yield value.save()
+        self.assertTrue(result)
+        self.assertEqual(os.listdir(os.path.join(self.directory, '3f', 'a2')),
+                         ['3fa2c1'])
+
+    @testing.gen_test
+    def test_fetch(self):
+        value = self.new_session()
+        value.username = 'foo'
+        yield value.save()
+        other = self.new_session(value.id)
+        result = yield other.fetch()
+        self.assertTrue(result)
+        self.assertEqual(other.username, 'foo')
+
+    @testing.gen_test
+    def test_fetch_missing(self):
+        result = yield self.new_session().fetch()
+        self.assertFalse(result)
+
+    @testing.gen_test
+    def test_fetch_unsharded_session(self):
+        value = self.new_session('abcdef')
+        value.username = 'foo'
+        with open(os.path.join(self.directory, 'abcdef'), 'wb') as handle:
+            handle.write(value.dumps())
+        other = self.new_session('abcdef')
+        result = yield other.fetch()
+        self.assertTrue(result)
+        self.assertEqual(other.username, 'foo')
+
+    @testing.gen_test
+    def test_delete(self):
+        value = self.new_session()
+        yield value.save()
+        filename = value._filename
+        result = yield value.delete()
+        self.assertTrue(result)
+        self.assertFalse(os.path.exists(filename))
+
+
+class SessionLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.filename = os.path.join(self.directory, 'sessions.log')
+        self.log = self.new_log()
+
+    def new_log(self):
+        log = session.SessionLog(self.filename)
+        self.addCleanup(log.close)
+        return log
+
+    def test_get(self):
+        self.log.set('a', 'value', time.time() + 60)
+        self.assertEqual(self.log.get('a'), 'value')
+        self.assertIsNone(self.log.get('b'))
+
+    def test_unicode_id_and_value(self):
+        self.log.set(u'a', u'caf\xe9', time.time() + 60)
+        self.assertEqual(self.log.get(u'a'), 'caf\xc3\xa9')
+        self.assertEqual(self.log.get('a'), 'caf\xc3\xa9')
+
+    def test_set_replaces_value(self):
+        self.log.set('a', 'value', time.time() + 60)
+        self.log.set('a', 'other', time.time() + 60)
+        self.assertEqual(self.log.get('a'), 'other')
+        self.assertEqual(len(self.log), 1)
+
+    def test_delete(self):
+        self.log.set('a', 'value', time.time() + 60)
+        self.log.delete('a')
+        self.assertIsNone(self.log.get('a'))
+
+    def test_expired_value_not_returned(self):
+        self.log.set('a', 'value', time.time() - 1)
+        self.assertIsNone(self.log.get('a'))
+
+    def test_replayed_when_opened(self):
+        self.log.set('a', 'value', time.time() + 60)
+        self.log.set('b', 'value', time.time() + 60)
+        self.log.delete('b')
+        log = self.new_log()
+        self.assertEqual(log.get('a'), 'value')
+        self.assertIsNone(log.get('b'))
+
+    def test_incomplete_record_truncated(self):
+        self.log.set('a', 'value', time.time() + 60)
+        size = os.path.getsize(self.filename)
+        with open(self.filename, 'ab') as handle:
+            handle.write(self.log._record('b', 'value',
+                                          time.time() + 60)[:-2])
+        log = self.new_log()
+        self.assertEqual(log.get('a'), 'value')
+        self.assertIsNone(log.get('b'))
+        self.assertEqual(os.path.getsize(self.filename), size)
+
+    def test_append_after_torn_record(self):
+        self.log.set('a', 'value', time.time() + 60)
+        with open(self.filename, 'ab') as handle:
+            handle.write('garbage')
+        self.log.set('w', 'value', time.time() + 60)
+        self.assertEqual(self.log.get('w'), 'value')
+        log = self.new_log()
+        self.assertEqual(log.get('a'), 'value')
+        self.assertEqual(log.get('w'), 'value')
+
+    def test_short_writes_completed(self):
+        write = os.write
+        with mock.patch('os.write',
+                        side_effect=lambda fd, data: write(fd, data[:3])):
+            self.log.set('a', 'value', time.time() + 60)
+        self.assertEqual(self.new_log().get('a'), 'value')
+
+    def test_failed_write_truncated(self):
+        self.log.set('a', 'value', time.time() + 60)
+        size = os.path.getsize(self.filename)
+        write = os.write
+
+        def fail(fd, data):
+            write(fd, data[:3])
+            raise OSError(errno.ENOSPC, 'No space left on device')
+
+        with mock.patch('os.write', side_effect=fail):
+            self.assertRaises(OSError, self.log.set, 'b', 'value',
+                              time.time() + 60)
+        self.assertEqual(os.path.getsize(self.filename), size)
+        self.log.set('c', 'value', time.time() + 60)
+        self.assertEqual(self.new_log().get('c'), 'value')
+
+    def test_sees_records_appended_by_other_log(self):
+        other = self.new_log()
+        other.set('a', 'value', time.time() + 60)
+        self.assertEqual(self.log.get('a'), 'value')
+
+    def test_compact(self):
+        for offset in range(10):
+            self.log.set('a', 'value%i' % offset, time.time() + 60)
+        self.log.set('b', 'value', time.time() - 1)
+        size = os.path.getsize(self.filename)
+        self.log.compact()
+        self.assertLess(os.path.getsize(self.filename), size / 5)
+        self.assertEqual(self.log.get('a'), 'value9')
+        self.assertEqual(len(self.new_log()), 1)
+
+    def test_reopened_after_other_log_compacts(self):
+        other = self.new_log()
+        self.log.set('a', 'value', time.time() + 60)
+        other.compact()
+        self.log.set('b', 'value', time.time() + 60)
+        self.assertEqual(other.get('b'), 'value')
+        self.assertEqual(self.log.get('a'), 'value')
+
+    def test_compact_if_needed(self):
+        with mock.patch.object(self.log, 'COMPACT_MIN_BYTES', 100):
+            self.log.set('a', 'value', time.time() + 60)
+            self.assertFalse(self.log.compact_if_needed())
+            for offset in range(10):
+                self.log.set('a', 'value', time.time() + 60)
+            self.assertTrue(self.log.compact_if_needed())
+
+
+class LogSessionTests(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(LogSessionTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings = {'filename': os.path.join(self.directory, 'log')}
+        self.addCleanup(self.close_logs)
+
+    def close_logs(self):
+        for log in session.LogSession._logs.values():
+            log.close()
+        session.LogSession._logs.clear()
+
+    def new_session(self, session_id=None):
+        return session.LogSession(session_id, 60, self.settings)
+
+    @testing.gen_test
+    def test_save_and_fetch(self):
+        value = self.new_session()
+        value.username = 'foo'
+        result = yield value.save()
+        self.assertTrue(result)
+        other = self.new_session(value.id)
+        result = yield other.fetch()
+        self.assertTrue(result)
+        self.assertEqual(other.username, 'foo')
+
+    @testing.gen_test
+    def test_fetch_missing(self):
+        result = yield self.new_session().fetch()
+        self.assertFalse(result)
+
+    @testing.gen_test
+    def test_fetch_marks_clean(self):
+        value = self.new_session()
+        value.username = u'f\xf6o'
+        yield value.save()
+        other = self.new_session(value.id)
+        yield other.fetch()
+        self.assertEqual(other.username, u'f\xf6o')
+        self.assertFalse(other.dirty)
+
+    @testing.gen_test
+    def test_delete(self):
+        value = self.new_session()
+        yield value.save()
+        session_id = value.id
+        yield value.delete()
+        result = yield self.new_session(session_id).fetch()
+        self.assertFalse(result)
+
+
+class SessionHandler(base.SessionRequestHandler):
+
+    def get(self, *args, **kwargs):
+        if self.get_argument('username', None):
+            self.session.username = self.get_argument('username')
+        self.finish()
+
+
+class LazySessionHandler(base.SessionRequestHandler):
+    SESSION_AUTOLOAD = False
+
+    @gen.coroutine
+    def get(self, *args, **kwargs):
+        if self.get_argument('username', None):
+            value = yield self.load_session()
+            value.username = self.get_argument('username')
+        self.finish()
+
+
+class SessionRequestHandlerTests(testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        adapter = {'name': 'log', 'touch_interval': 60,
+                   'filename': os.path.join(self.directory, 'log')}
+        return web.Application([(r'/', SessionHandler),
+                                (r'/lazy', LazySessionHandler)],
+                               cookie_secret='secret',
+                               session={'adapter': adapter})
+
+    def tearDown(self):
+        for log in session.LogSession._logs.values():
+            log.close()
+        session.LogSession._logs.clear()
+        super(SessionRequestHandlerTests, self).tearDown()
+
+    def request(self, cookie=None, uri='/'):
+        response = self.fetch(uri, headers={'Cookie': cookie} if cookie
+                              else {})
+        self.assertEqual(response.code, 200)
+        return cookie or response.headers['Set-Cookie'].split(';')[0]
+
+    def test_bookkeeping_changes_not_saved_within_interval(self):
+        cookie = self.request()
+        with mock.patch.object(session.LogSession, 'save') as save:
+            with mock.patch.object(session.LogSession, 'touch') as touch:
+                self.request(cookie)
+        self.assertFalse(save.called)
+        self.assertFalse(touch.called)
+
+    def test_session_changes_saved(self):
+        cookie = self.request()
+        self.request(cookie, '/?username=foo')
+        log = session.LogSession._logs.values()[0]
+        self.assertEqual(len(log), 1)
+        self.assertIn('foo', log.get(log._index.keys()[0]))
+
+    def test_lazy_session_not_loaded_or_stored(self):
+        with mock.patch.object(session.LogSession, 'fetch') as fetch:
+            with mock.patch.object(session.LogSession, 'touch') as touch:
+                response = self.fetch('/lazy')
+        self.assertEqual(response.code, 200)
+        self.assertNotIn('Set-Cookie', response.headers)
+        self.assertFalse(fetch.called)
+        self.assertFalse(touch.called)
+
+    def test_lazy_session_loaded_on_demand(self):
+        cookie = self.request()
+        self.request(cookie, '/lazy?username=foo')
+        log = session.LogSession._logs.values()[0]
+        self.assertIn('foo', log.get(log._index.keys()[0]))
+
+    def test_touched_after_interval(self):
+        cookie = self.request()
+        with mock.patch.object(base.SessionRequestHandler, 'current_epoch',
+                               return_value=int(time.time()) + 120):
+            with mock.patch.object(session.LogSession, 'touch') as touch:
+                self.request(cookie)
+        self.assertTrue(touch.called)
+
+
+class RedisSessionTests(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(RedisSessionTests, self).setUp()
+        self.redis = fake_redis.Client()
+        with mock.patch.object(session.RedisPool, '_new_client',
+                               mock.Mock(return_value=self.redis)):
+            pool = session.RedisPool({'pool_size': 1})
+        patcher = mock.patch.object(session.RedisSession, '_redis_pool', pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings = dict()
+
+    def new_session(self, session_id=None):
+        return session.RedisSession(session_id, 60, self.settings)
+
+    @testing.gen_test
+    def test_save_sets_ttl(self):
+        value = self.new_session()
+        yield value.save()
+        ttl = self.redis.ttl(value._key)
+        self.assertTrue(0 < ttl <= 60)
+
+    @testing.gen_test
+    def test_fetch_reads_ttl(self):
+        value = self.new_session()
+        value.username = 'foo'
+        yield value.save()
+        other = self.new_session(value.id)
+        result = yield other.fetch()
+        self.assertTrue(result)
+        self.assertEqual(other.username, 'foo')
+        self.assertAlmostEqual(other.touched_at(), time.time(), delta=2)
+
+    @testing.gen_test
+    def test_fetch_raises_errors(self):
+        value = self.new_session()
+        with mock.patch.object(fake_redis.Pipeline, 'execute',
+                               lambda pipeline, callback: callback(
+                                   [ValueError('WRONGTYPE'), 60])):
+            with self.assertRaises(ValueError):
+                yield value.fetch()
+
+    @testing.gen_test
+    def test_serializer_setting(self):
+        self.settings['serializer'] = 'msgpack'
+        value = self.new_session()
+        value.username = 'foo'
+        yield value.save()
+        self.assertEqual(serializers.detect(self.redis.data[value._key]),
+                         'msgpack')
+        other = self.new_session(value.id)
+        yield other.fetch()
+        self.assertEqual(other.username, 'foo')
+
+    @testing.gen_test
+    def test_serializer_reads_existing_json(self):
+        value = self.new_session()
+        value.username = 'foo'
+        yield value.save()
+        self.settings['serializer'] = 'msgpack'
+        other = self.new_session(value.id)
+        yield other.fetch()
+        self.assertEqual(other.username, 'foo')
+
+    def test_invalid_serializer_raises(self):
+        self.settings['serializer'] = 'yaml'
+        self.assertRaises(exceptions.ConfigurationException,
+                          self.new_session)
+
+    @testing.gen_test
+    def test_touch_resets_ttl(self):
+        value = self.new_session()
+        yield value.save()
+        self.redis.expires[value._key] = time.time() + 5
+        result = yield value.touch()
+        self.assertTrue(result)
+        self.assertGreater(self.redis.ttl(value._key), 5)
+
+    @testing.gen_test
+    def test_touch_without_sliding_expiry(self):
+        self.settings['sliding'] = False
+        value = self.new_session()
+        yield value.save()
+        self.redis.commands = list()
+        yield value.touch()
+        self.assertEqual(self.redis.commands, [])
+
+
+class FailingClient(fake_redis.Client):
+
+    def get(self, key, callback=None):
+        raise IOError('Connection lost')
+
+    def ping(self, callback=None):
+        raise IOError('Connection lost')
+
+
+class HangingClient(fake_redis.Client):
+
+    def get(self, key, callback=None):
+        self.commands.append(('get', key))
+
+    def ping(self, callback=None):
+        self.commands.append(('ping',))
+
+
+class SQLiteSessionTests(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(SQLiteSessionTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(self.close)
+        self.settings = {'filename': os.path.join(self.directory, 'test.db')}
+
+    def close(self):
+        for cleanup in session.SQLiteSession._cleanups.values():
+            cleanup.stop()
+        session.SQLiteSession._cleanups.clear()
+        for database in sqlite._databases.values():
+            database.close()
+        sqlite._databases.clear()
+
+    def new_session(self, session_id=None, duration=60):
+        return session.SQLiteSession(session_id, duration, self.settings)
+
+    def test_adapter_registered(self):
+        self.assertIs(session.ADAPTERS['sqlite'], session.SQLiteSession)
+
+    @testing.gen_test
+    def test_save_and_fetch(self):
+        value = self.new_session()
+        value.username = 'foo'
+        self.assertTrue((yield value.save()))
+        other = self.new_session(value.id)
+        self.assertTrue((yield other.fetch()))
+        self.assertEqual(other.username, 'foo')
+        self.assertAlmostEqual(other.touched_at(), time.time(), delta=2)
+
+    @testing.gen_test
+    def test_expired_session_not_fetched(self):
+        value = self.new_session()
+        yield value.save()
+        yield value._database.write('UPDATE sessions SET expires_at = ?',
+                                    (time.time() - 1,))
+        self.assertFalse((yield self.new_session(value.id).fetch()))
+
+    @testing.gen_test
+    def test_touch_extends_expiry(self):
+        value = self.new_session()
+        yield value.save()
+        value._expires_at = None
+        self.assertTrue((yield value.touch()))
+        rows = yield value._database.read('SELECT expires_at FROM sessions')
+        self.assertAlmostEqual(rows[0][0], time.time() + 60, delta=2)
+
+    @testing.gen_test
+    def test_delete(self):
+        value = self.new_session()
+        yield value.save()
+        session_id = value.id
+        self.assertTrue((yield value.delete()))
+        self.assertFalse((yield self.new_session(session_id).fetch()))
+
+    @testing.gen_test
+    def test_cleanup_removes_expired_sessions(self):
+        value = self.new_session()
+        yield value.save()
+        yield value._database.write('UPDATE sessions SET expires_at = ?',
+                                    (time.time() - 1,))
+        self.new_session().save()
+        session.SQLiteSession._cleanups.values()[0].callback()
+        yield value._database.write('SELECT 1')
+        rows = yield value._database.read('SELECT COUNT(*) FROM sessions')
+        self.assertEqual(rows, [(1,)])
+
+
+class RedisPoolTests(testing.AsyncTestCase):
+
+    def new_pool(self, *clients, **settings):
+        settings.setdefault('pool_size', len(clients))
+        with mock.patch.object(session.RedisPool, '_new_client',
+                               mock.Mock(side_effect=clients)):
+            return session.RedisPool(settings)
+
+    @testing.gen_test
+    def test_execute_uses_least_busy_client(self):
+        clients = fake_redis.Client(), fake_redis.Client()
+        pool = self.new_pool(*clients)
+        pool._in_flight[0] = 1
+        yield pool.execute('set', 'foo', 'bar')
+        self.assertEqual(clients[1].data, {'foo': 'bar'})
+        self.assertEqual(clients[0].data, {})
+
+    @testing.gen_test
+    def test_pipelining_coalesces_concurrent_commands(self):
+        client = fake_redis.Client()
+        pool = self.new_pool(client, pipeline=True)
+        results = yield [pool.execute('set', 'foo', 'bar'),
+                         pool.execute('get', 'foo')]
+        self.assertEqual(results, [True, 'bar'])
+        self.assertIn(('execute', 2), client.commands)
+
+    @testing.gen_test
+    def test_pipeline(self):
+        client = fake_redis.Client()
+        pool = self.new_pool(client)
+        client.set('foo', 'bar')
+        result = yield pool.pipeline([('get', 'foo'), ('ttl', 'foo')])
+        self.assertEqual(result, ['bar', None])
+
+    @testing.gen_test
+    def test_failed_command_is_retried_and_client_reconnected(self):
+        failing, client = FailingClient(), fake_redis.Client()
+        client.set('foo', 'bar')
+        pool = self.new_pool(failing, client)
+        pool._in_flight[1] = 1
+        with mock.patch.object(self.io_loop, 'call_later') as call_later:
+            result = yield pool.execute('get', 'foo')
+        self.assertEqual(result, 'bar')
+        self.assertFalse(pool._healthy[0])
+        call_later.assert_called_once_with(0.5, pool._connect, 0)
+        with mock.patch.object(session.RedisPool, '_new_client',
+                               mock.Mock(return_value=fake_redis.Client())):
+            self.assertTrue(pool._connect(0))
+        self.assertEqual(pool.stats()['connected'], 2)
+        self.assertEqual(pool.reconnects, 1)
+
+    def test_reconnect_backoff_doubles(self):
+        pool = self.new_pool(fake_redis.Client())
+        with mock.patch.object(self.io_loop, 'call_later') as call_later:
+            for _attempt in range(8):
+                pool._schedule_reconnect(0)
+        delays = [call[0][0] for call in call_later.call_args_list]
+        self.assertEqual(delays, [0.5, 1, 2, 4, 8, 16, 30, 30])
+
+    @testing.gen_test
+    def test_no_connected_clients_raises(self):
+        pool = self.new_pool(FailingClient())
+        with mock.patch.object(self.io_loop, 'call_later'):
+            with self.assertRaises(IOError):
+                yield pool.execute('get', 'foo')
+            with self.assertRaises(exceptions.ConnectionException):
+                yield pool.execute('get', 'foo')
+
+    @testing.gen_test
+    def test_health_check_disconnects_failed_clients(self):
+        pool = self.new_pool(FailingClient(), fake_redis.Client())
+        with mock.patch.object(self.io_loop, 'call_later'):
+            yield pool.check_health()
+        self.assertEqual(pool._healthy, [False, True])
+
+    @testing.gen_test
+    def test_health_check_times_out(self):
+        client = HangingClient()
+        pool = self.new_pool(client, command_timeout=0.05)
+        with mock.patch.object(self.io_loop, 'call_later'):
+            yield pool.check_health()
+        self.assertEqual(pool._healthy, [False])
+        self.assertIn(('disconnect',), client.commands)
+        self.assertEqual(pool._clients, [None])
+
+    @testing.gen_test
+    def test_timed_out_command_is_retried(self):
+        hanging, client = HangingClient(), fake_redis.Client()
+        client.set('foo', 'bar')
+        pool = self.new_pool(hanging, client, command_timeout=0.05)
+        pool._in_flight[1] = 1
+        with mock.patch.object(self.io_loop, 'call_later'):
+            result = yield pool.execute('get', 'foo')
+        self.assertEqual(result, 'bar')
+        self.assertEqual(pool._healthy, [False, True])
+
+    @testing.gen_test
+    def test_pipeline_raises_errors(self):
+        pool = self.new_pool(fake_redis.Client())
+        with mock.patch.object(fake_redis.Pipeline, 'execute',
+                               lambda pipeline, callback: callback(
+                                   [ValueError('WRONGTYPE'), None])):
+            with self.assertRaises(ValueError):
+                yield pool.pipeline([('get', 'foo'), ('ttl', 'foo')])
+
+
+class SessionReportTests(testing.AsyncTestCase):
+
+    @testing.gen_test
+    def test_collect(self):
+        redis = fake_redis.Client()
+        redis.set('s:1', 'abc', expire=30)
+        redis.set('s:2', 'abcd', expire=7200)
+        redis.set('s:3', 'ab')
+        redis.set('other', 'value')
+        stats = yield session_report.collect(redis, 's:*', 2)
+        self.assertEqual(stats['keys'], 3)
+        self.assertEqual(stats['bytes'], 9)
+        self.assertEqual(stats['persistent'], 1)
+        self.assertEqual(stats['buckets'], [1, 0, 0, 0, 1, 0, 0])
+        self.assertIn('Sessions', session_report.report(stats))
+
+
+class CookieSessionHandler(base.SessionRequestHandler):
+
+    def get(self, *args, **kwargs):
+        if self.get_argument('username', None):
+            self.session.username = self.get_argument('username')
+        self.finish({'username': self.session.get('username')})
+
+
+class CookieSessionTests(testing.AsyncHTTPTestCase):
+
+    def get_app(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        adapter = {'name': 'cookie', 'max_size': 1024,
+                   'fallback': {'name': 'log',
+                                'filename': os.path.join(self.directory,
+                                                         'log')}}
+        return web.Application([(r'/', CookieSessionHandler)],
+                               cookie_secret='secret',
+                               session={'adapter': adapter})
+
+    def tearDown(self):
+        for log in session.LogSession._logs.values():
+            log.close()
+        session.LogSession._logs.clear()
+        super(CookieSessionTests, self).tearDown()
+
+    def request(self, uri='/', cookies=None):
+        headers = {}
+        if cookies:
+            headers['Cookie'] = '; '.join(['%s=%s' % item
+                                           for item in cookies.items()])
+        response = self.fetch(uri, headers=headers)
+        self.assertEqual(response.code, 200)
+        values = dict(cookies or {})
+        for header in response.headers.get_list('Set-Cookie'):
+            name, value = header.split(';')[0].split('=', 1)
+            values[name] = value
+        return json.loads(response.body), values
+
+    def test_session_kept_in_cookie(self):
+        body, cookies = self.request('/?username=foo')
+        self.assertIn('session_data', cookies)
+        body, cookies = self.request(cookies=cookies)
+        self.assertEqual(body['username'], 'foo')
+        self.assertEqual(session.LogSession._logs, {})
+
+    def test_large_session_stored_server_side(self):
+        username = os.urandom(1024).encode('hex')
+        body, cookies = self.request('/?username=' + username,)
+        self.assertLess(len(cookies['session_data']), 200)
+        self.assertEqual(len(session.LogSession._logs.values()[0]), 1)
+        body, cookies = self.request(cookies=cookies)
+        self.assertEqual(body['username'], username)
+
+    def test_invalid_cookie_ignored(self):
+        body, cookies = self.request('/?username=foo')
+        cookies['session_data'] = cookies['session_data'][:-4] + 'abcd'
+        body, cookies = self.request(cookies=cookies)
+        self.assertIsNone(body['username'])
+
+    def test_compressed(self):
+        value = session.CookieSession(settings={},
+                                      handler=mock.Mock())
+        value.username = 'foo' * 200
+        self.assertEqual(value._payload()[:1], session.CookieSession.COMPRESSED)
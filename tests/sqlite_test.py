@@ -0,0 +1,162 @@
+import mock
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from tornado import testing
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+sys.path.insert(0, '..')
+
+from tinman import model
+from tinman import serializers
+from tinman import sqlite
+
+
+class SQLiteTestCase(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(SQLiteTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.db')
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(self.close)
+
+    def close(self):
+        for database in sqlite._databases.values():
+            database.close()
+        sqlite._databases.clear()
+
+
+class DatabaseTests(SQLiteTestCase):
+
+    def setUp(self):
+        super(DatabaseTests, self).setUp()
+        self.database = sqlite.get(self.filename)
+        self.database.schema(['CREATE TABLE IF NOT EXISTS items '
+                              '(id TEXT PRIMARY KEY, value TEXT)'])
+
+    def test_get_returns_shared_database(self):
+        self.assertIs(sqlite.get(self.filename), self.database)
+
+    def test_wal_mode(self):
+        connection = sqlite3.connect(self.filename)
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+        connection.close()
+        self.assertEqual(mode, 'wal')
+
+    @testing.gen_test
+    def test_write_and_read(self):
+        result = yield self.database.write(
+            'INSERT INTO items (id, value) VALUES (?, ?)', ('1', 'foo'))
+        self.assertEqual(result, 1)
+        rows = yield self.database.read(
+            'SELECT value FROM items WHERE id = ?', ('1',))
+        self.assertEqual(rows, [('foo',)])
+
+    @testing.gen_test
+    def test_concurrent_writes_batched(self):
+        yield [self.database.write('INSERT INTO items (id, value) '
+                                   'VALUES (?, ?)', (str(offset), 'foo'))
+               for offset in range(50)]
+        self.assertEqual(self.database.writes, 50)
+        self.assertLess(self.database.commits, 50)
+        rows = yield self.database.read('SELECT COUNT(*) FROM items')
+        self.assertEqual(rows, [(50,)])
+
+    @testing.gen_test
+    def test_failed_write_does_not_fail_batch(self):
+        yield self.database.write('INSERT INTO items (id, value) '
+                                  'VALUES (?, ?)', ('1', 'foo'))
+        futures = [self.database.write('INSERT INTO items (id, value) '
+                                       'VALUES (?, ?)', (item_id, 'bar'))
+                   for item_id in ('2', '1', '3')]
+        with self.assertRaises(sqlite3.IntegrityError):
+            yield futures[1]
+        yield [futures[0], futures[2]]
+        rows = yield self.database.read('SELECT id FROM items ORDER BY id')
+        self.assertEqual(rows, [('1',), ('2',), ('3',)])
+
+    @testing.gen_test
+    def test_unexpected_error_fails_batch(self):
+        with mock.patch.object(self.database, '_commit',
+                               side_effect=RuntimeError('failed')):
+            with self.assertRaises(RuntimeError):
+                yield self.database.write('INSERT INTO items (id, value) '
+                                          'VALUES (?, ?)', ('1', 'foo'))
+        result = yield self.database.write('INSERT INTO items (id, value) '
+                                           'VALUES (?, ?)', ('2', 'bar'))
+        self.assertEqual(result, 1)
+
+    @testing.gen_test
+    def test_close_closes_connections(self):
+        yield self.database.write('INSERT INTO items (id, value) '
+                                  'VALUES (?, ?)', ('1', 'foo'))
+        yield self.database.read('SELECT value FROM items')
+        connections = list(self.database._connections)
+        self.assertEqual(len(connections), 2)
+        self.database.close()
+        self.assertNotIn(self.filename, sqlite._databases)
+        for connection in connections:
+            self.assertRaises(sqlite3.ProgrammingError, connection.execute,
+                              'SELECT 1')
+
+
+class ExampleModel(model.SQLiteModel):
+    name = None
+    age = None
+
+
+class CodecModel(ExampleModel):
+    _codec = serializers.MsgPack()
+
+
+class SQLiteModelTests(SQLiteTestCase):
+
+    def new_model(self, item_id=None, cls=ExampleModel, **kwargs):
+        return cls(item_id, database=self.filename, **kwargs)
+
+    def test_database_required(self):
+        self.assertRaises(ValueError, ExampleModel)
+
+    @testing.gen_test
+    def test_save_and_load(self):
+        value = self.new_model(name='foo', age=10)
+        self.assertTrue((yield value.save()))
+        self.assertFalse(value.is_new)
+        self.assertFalse(value.dirty)
+        other = yield ExampleModel.load(value.id, database=self.filename)
+        self.assertEqual((other.name, other.age), ('foo', 10))
+
+    @testing.gen_test
+    def test_load_missing_returns_none(self):
+        result = yield ExampleModel.load('missing', database=self.filename)
+        self.assertIsNone(result)
+
+    @testing.gen_test
+    def test_save_sets_last_updated_at(self):
+        value = self.new_model(name='foo')
+        yield value.save()
+        self.assertIsNone(value.last_updated_at)
+        value.name = 'bar'
+        yield value.save()
+        self.assertIsNotNone(value.last_updated_at)
+
+    @testing.gen_test
+    def test_delete(self):
+        value = self.new_model(name='foo')
+        yield value.save()
+        self.assertTrue((yield value.delete()))
+        self.assertFalse((yield self.new_model(value.id).fetch()))
+
+    @testing.gen_test
+    def test_codec(self):
+        value = self.new_model(cls=CodecModel, name='foo')
+        yield value.save()
+        rows = yield value._store.read('SELECT value FROM models')
+        self.assertEqual(serializers.detect(str(rows[0][0])), 'msgpack')
+        other = yield CodecModel.load(value.id, database=self.filename)
+        self.assertEqual(other.name, 'foo')
@@ -8,6 +8,7 @@ from tornado import web
 
 from tinman import config
 from tinman import exceptions
+from tinman import serializers
 from tinman import utils
 from tinman import __version__
 
@@ -37,6 +38,7 @@ class Application(web.Application):
         self._config = settings or dict()
         self._insert_base_path()
         self._prepare_paths()
+        self._prepare_models()
         self._prepare_static_path()
         self._prepare_template_path()
         self._prepare_transforms()
@@ -140,6 +142,38 @@ class Application(web.Application):
         if config.BASE in self.paths:
             sys.path.insert(0, self.paths[config.BASE])
 
+    def _prepare_models(self):
+        """Assign the serializers and databases configured for model classes
+        in the models section of the configuration, a mapping of the class
+        path to the model settings:
+
+            models:
+              myapp.models.Widget:
+                database: /var/lib/myapp/models.db
+                serializer: msgpack
+
+        :raises: tinman.exceptions.ConfigurationException
+
+        """
+        for class_path, settings in (self._config.get(config.MODELS) or
+                                     dict()).items():
+            cls = self._import_class(class_path)
+            if not cls or not settings:
+                continue
+            if settings.get(config.DATABASE):
+                cls._database = settings[config.DATABASE]
+            if not settings.get(config.SERIALIZER):
+                continue
+            try:
+                cls._codec = serializers.get(settings[config.SERIALIZER])
+            except ValueError as error:
+                LOGGER.critical('Invalid serializer for %s: %s',
+                                class_path, error)
+                raise exceptions.ConfigurationException(class_path,
+                                                        config.SERIALIZER)
+            LOGGER.info('Serializing %s with %s', class_path,
+                        settings[config.SERIALIZER])
+
     def _prepare_paths(self):
         """Set the value of {{base}} in paths if the base path is set in the
         configuration.
@@ -0,0 +1,166 @@
+"""
+A bounded, in-process LRU cache with per-entry TTLs and usage counters.
+
+"""
+import collections
+import logging
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LRUCache(object):
+    """A least recently used cache bounded by the number of entries and the
+    total size in bytes of the cached values. Entries may be assigned a time
+    to live, after which they are treated as a miss and removed. Lookups,
+    assignments and evictions are O(1).
+
+    Example use::
+
+        cache = LRUCache(max_entries=1000, max_bytes=1048576)
+        cache.set('key', value, len(value), ttl=60)
+        value = cache.get('key')
+
+    :param int max_entries: The maximum number of entries to keep
+    :param int max_bytes: The maximum total size of the entries in bytes
+
+    """
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __contains__(self, key):
+        """Return True if there is an unexpired entry for the key without
+        updating its position or the counters.
+
+        :param str key: The cache key
+        :rtype: bool
+
+        """
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def __len__(self):
+        """Return the number of entries in the cache.
+
+        :rtype: int
+
+        """
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        """Return the total size of the cached values in bytes.
+
+        :rtype: int
+
+        """
+        return self._bytes
+
+    def clear(self):
+        """Remove all of the entries from the cache."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def delete(self, key):
+        """Remove the entry for the key, returning True if there was one.
+
+        :param str key: The cache key
+        :rtype: bool
+
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def get(self, key, default=None):
+        """Return the cached value for the key, marking it as the most
+        recently used entry, or the default value if it is not cached or has
+        expired.
+
+        :param str key: The cache key
+        :param mixed default: The value to return on a miss
+        :rtype: mixed
+
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return default
+        if self._expired(entry):
+            self._bytes -= entry[1]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, size=0, ttl=None):
+        """Add or replace the cached value for the key, evicting the least
+        recently used entries if the cache is over its limits. Values larger
+        than max_bytes are not cached.
+
+        :param str key: The cache key
+        :param mixed value: The value to cache
+        :param int size: The size of the value in bytes
+        :param int|float ttl: The number of seconds to keep the value
+        :rtype: bool
+
+        """
+        self.delete(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            LOGGER.debug('Not caching %s, %i bytes is larger than %i',
+                         key, size, self.max_bytes)
+            return False
+        self._entries[key] = (value, size,
+                              time.time() + ttl if ttl else None)
+        self._bytes += size
+        self._evict()
+        return True
+
+    def stats(self):
+        """Return the cache counters and current usage.
+
+        :rtype: dict
+
+        """
+        return {'bytes': self._bytes,
+                'entries': len(self._entries),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hits': self.hits,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'misses': self.misses}
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is within its
+        entry and byte limits.
+
+        """
+        while self._entries and (
+                (self.max_entries is not None and
+                 len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[1]
+            self.evictions += 1
+
+    @staticmethod
+    def _expired(entry):
+        """Return True if the cache entry has expired.
+
+        :param tuple entry: The cache entry
+        :rtype: bool
+
+        """
+        return entry[2] is not None and entry[2] <= time.time()
@@ -6,21 +6,37 @@ APPLICATION = 'Application'
 DAEMON = 'Daemon'
 HTTP_SERVER = 'HTTPServer'
 LOGGING = 'Logging'
+MODELS = 'models'
 ROUTES = 'Routes'
 
 ADAPTER = 'adapter'
 AUTOMATIC = 'automatic'
 BASE = 'base'
 BASE_VARIABLE = '{{base}}'
+BATCH_SIZE = 'batch_size'
 CERT_REQS = 'cert_reqs'
+CLEANUP = 'cleanup'
+CLEANUP_INTERVAL = 'cleanup_interval'
+COMMAND_TIMEOUT = 'command_timeout'
+COMPACT_INTERVAL = 'compact_interval'
+COMPRESS = 'compress'
+COOKIE = 'cookie'
+COOKIE_NAME = 'cookie_name'
 DEBUG = 'debug'
 DEFAULT_LOCALE = 'default_locale'
+DATABASE = 'database'
 DB = 'db'
 DIRECTORY = 'directory'
 DURATION = 'duration'
+FALLBACK = 'fallback'
 FILE = 'file'
+FILENAME = 'filename'
+HEALTH_CHECK_INTERVAL = 'health_check_interval'
 HOST = 'host'
+IO_THREADS = 'io_threads'
+LOG = 'log'
 LOG_FUNCTION = 'log_function'
+MAX_SIZE = 'max_size'
 NAME = 'name'
 NEWRELIC = 'newrelic_ini'
 NO_KEEP_ALIVE = 'no_keep_alive'
@@ -28,14 +44,21 @@ NONE = 'none'
 OPTIONAL = 'optional'
 PROCESSES = 'processes'
 PATHS = 'paths'
+PIPELINE = 'pipeline'
+POOL_SIZE = 'pool_size'
 PORT = 'port'
 PORTS = 'ports'
 RABBITMQ = 'rabbitmq'
+RECONNECT_DELAY = 'reconnect_delay'
 REDIS = 'redis'
 REQUIRED = 'required'
+SERIALIZER = 'serializer'
+SLIDING = 'sliding'
+SQLITE = 'sqlite'
 SSL_OPTIONS = 'ssl_options'
 STATIC = 'static'
 TEMPLATES = 'templates'
+TOUCH_INTERVAL = 'touch_interval'
 TRANSFORMS = 'transforms'
 TRANSLATIONS = 'translations'
 UI_MODULES = 'ui_modules'
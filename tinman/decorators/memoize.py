@@ -2,89 +2,495 @@
 Tinman Cache Module
 
 """
+import datetime
 from functools import wraps
-from logging import debug
+from tornado import concurrent
+from tornado import gen
+import hashlib
+from tornado import httputil
+from tornado import ioloop
+import logging
+import time
+import urllib
 
-# Module wide dictionary to hold the cached values in
-local_cache = dict()
+from tinman import cache
 
+LOGGER = logging.getLogger(__name__)
 
-def memoize_write(*args):
+# The default limits of the process wide response cache
+MAX_BYTES = 64 * 1024 * 1024
+MAX_ENTRIES = 1000
 
-    # Append the value if the key exists, otherwise just set it
-    if args[0].tinman_memoize_key in local_cache:
-        debug('memoize append: %s' % args[0].tinman_memoize_key)
-        local_cache[args[0].tinman_memoize_key] += args[1]
-    else:
-        debug('memoize set: %s' % args[0].tinman_memoize_key)
-        local_cache[args[0].tinman_memoize_key] = args[1]
+# The default number of seconds to wait for an in-flight response
+COALESCE_TIMEOUT = 10
 
-    # Call the monkey patched RequestHandler.write
-    args[0]._write(args[1])
+# The response status codes that are cached
+CACHE_STATUSES = frozenset([200, 203, 300, 301])
 
+# The response headers that are cached with the response
+HEADERS = ('Cache-Control', 'Content-Language', 'Content-Type', 'Etag',
+           'Expires', 'Last-Modified', 'Link', 'Location')
 
-def memoize_finish(*args):
+# The process wide cache of memoized responses, bounded by the number of
+# entries and their total size in bytes. Assign new max_entries and max_bytes
+# values to change the limits.
+CACHE = cache.LRUCache(max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES)
 
-    # If they passed in a last chunk, run the write
-    if len(args) > 1:
-        memoize_write(args)
+# The future for the response of each cache key that is being computed
+_in_flight = dict()
 
-    # Un-Monkey-patch
-    args[0].write = args[0]._write
-    args[0].finish = args[0]._finish
+# The number of requests served from an in-flight response, the number that
+# timed out waiting for one, the number of stale responses served and the
+# number, failures and total duration of background refreshes
+_counters = {'coalesced': 0,
+             'coalesce_timeouts': 0,
+             'refresh_failures': 0,
+             'refresh_seconds': 0.0,
+             'refreshes': 0,
+             'stale_served': 0}
 
-    # Remove the monkey patched attributes
-    del args[0]._write
-    del args[0]._finish
 
-    # Call the RequestHandler.finish
-    args[0].finish()
+class Response(object):
+    """A cached response: the status code, the cached headers, the body, its
+    ETag and the time it stops being fresh.
 
+    :param int status: The response status code
+    :param list headers: The cached (name, value) headers
+    :param str body: The response body
+    :param str etag: The ETag of the response body
+    :param float expires_at: The time the response stops being fresh
 
-# Cache Decorator
-def memoize(method):
+    """
+    def __init__(self, status, headers, body, etag, expires_at=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
 
-    @wraps(method)
-    def wrapper(*args, **kwargs):
+    @property
+    def size(self):
+        """Return the approximate size of the response in bytes.
+
+        :rtype: int
+
+        """
+        return (len(self.body) + len(self.etag) +
+                sum([len(name) + len(value) for name, value in self.headers]))
+
+    def send(self, handler):
+        """Finish the request with the cached response, or with a 304 Not
+        Modified response if the request If-None-Match header matches the
+        ETag of the response.
 
-        # Our module wide local_cache
-        global local_cache
+        :param tornado.web.RequestHandler handler: The request handler
 
-        if not hasattr(args[0], 'write'):
-            raise AttributeError("Could not find the ")
+        """
+        handler.set_status(self.status)
+        for name in set([name for name, _value in self.headers]):
+            handler.clear_header(name)
+        for name, value in self.headers:
+            handler.add_header(name, value)
+        handler.set_header('Etag', self.etag)
+        if (handler.request.method in ('GET', 'HEAD') and
+                handler.check_etag_header()):
+            handler.set_status(304)
+            return handler.finish()
+        return handler.finish(self.body)
 
-        # Get the class name for the key
-        key = repr(args[0])
 
-        # Add the arguments to the key
-        for value in args[1:]:
-            key += ':%s' % str(value)
+def memoize(method=None, ttl=None, vary=None, cookies=None, key=None,
+            headers=None, coalesce=True, timeout=None, stale_ttl=None,
+            refresh_ahead=None):
+    """Decorates a RequestHandler method, caching the response it writes by
+    the request, so repeated requests are answered from the cache without
+    invoking the method. The status code, the response headers in HEADERS and
+    headers, and the body of responses with a status in CACHE_STATUSES are
+    cached, along with the ETag of the body. A request with an If-None-Match
+    header matching the ETag of a cached response is answered with a 304 Not
+    Modified response. The decorator may be used with or without arguments::
 
-        debug('memoize: %s' % key)
+        class MyHandler(web.RequestHandler):
 
-        # See if the key is in cache and if so, send it
-        if key in local_cache:
-            debug('memoize hit: %s' % key)
-            return self.finish(local_cache[key])
+            @memoize.memoize
+            def get(self, content_id):
+                self.write('Hello, World')
 
-        # Assign our key
-        args[0].tinman_memoize_key = key
+            @memoize.memoize(ttl=60, vary=['Accept-Language'],
+                             cookies=['locale'])
+            def head(self, content_id):
+                self.write('Hello, World')
 
-        # Monkey-patch the write and finish functions
-        args[0]._write = args[0].write
-        args[0]._finish = args[0].finish
-        args[0].write = memoize_write
-        args[0].finish = memoize_finish
+    The cache key is built by request_key from the HTTP method, host, path
+    and query arguments, and the values of the request headers listed in
+    vary and the cookies listed in cookies. The vary headers are added to the
+    Vary response header. Pass a function that is invoked with the request
+    handler and returns the key as key to build the keys differently.
 
-        # Return the value
-        return method(*args, **kwargs)
+    Responses are kept in the process wide CACHE, which evicts the least
+    recently used entries when it holds more than MAX_ENTRIES responses or
+    MAX_BYTES bytes.
+
+    Unless coalesce is False, concurrent requests that miss the cache for a
+    key that is already being computed wait for that response instead of
+    invoking the method, and are all sent the same response. If the response
+    can not be cached or is not finished within timeout seconds, defaulting
+    to COALESCE_TIMEOUT, the waiting requests invoke the method themselves.
+
+    With a ttl, responses can be served while they are refreshed in the
+    background. A response is kept for stale_ttl seconds after it expires,
+    and is served from the cache during that time while a single background
+    request refreshes it. With refresh_ahead, the background refresh starts
+    refresh_ahead seconds before the response expires, so it is refreshed
+    before it is stale. A background refresh invokes the handler class with a
+    copy of the request that triggered it, running prepare and the method
+    without a client connection::
+
+        @memoize.memoize(ttl=60, stale_ttl=300, refresh_ahead=5)
+        def get(self):
+            self.render('dashboard.html')
+
+    :param method method: The method to decorate
+    :param int|float ttl: The number of seconds to cache responses for
+    :param list vary: The request headers that the response varies by
+    :param list cookies: The cookies that the response varies by
+    :param method key: A function returning the cache key for a handler
+    :param list headers: Additional response headers to cache
+    :param bool coalesce: Coalesce concurrent requests for the same key
+    :param int|float timeout: The number of seconds to wait for a coalesced
+        response
+    :param int|float stale_ttl: The number of seconds to serve an expired
+        response while it is refreshed
+    :param int|float refresh_ahead: The number of seconds before a response
+        expires to refresh it
+    :rtype: method
+
+    """
+    if method is None:
+        return lambda value: memoize(value, ttl, vary, cookies, key, headers,
+                                     coalesce, timeout, stale_ttl,
+                                     refresh_ahead)
+    cached_headers = HEADERS + tuple(headers or ())
+    refresh = ttl and (stale_ttl or refresh_ahead)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not hasattr(self, 'write'):
+            raise AttributeError('memoize requires a RequestHandler method')
+        for header in vary or ():
+            self.add_header('Vary', header)
+        refreshing = getattr(self.request, '_memoize_refresh', None)
+        if refreshing:
+            cache_key, flight = refreshing
+            return _invoke(self, cache_key, ttl, cached_headers, flight,
+                           method, args, kwargs, stale_ttl)
+        cache_key = key(self) if key else request_key(self, vary, cookies)
+        response = CACHE.get(cache_key)
+        if response is not None:
+            LOGGER.debug('memoize hit: %s', cache_key)
+            if refresh:
+                _refresh_if_stale(self, cache_key, response,
+                                  refresh_ahead or 0)
+            return response.send(self)
+        LOGGER.debug('memoize miss: %s', cache_key)
+        if coalesce and cache_key in _in_flight:
+            return _wait(self, cache_key, timeout or COALESCE_TIMEOUT,
+                         lambda: _invoke(self, cache_key, ttl,
+                                         cached_headers, None,
+                                         method, args, kwargs, stale_ttl))
+        flight = None
+        if coalesce:
+            flight = _in_flight[cache_key] = concurrent.Future()
+        return _invoke(self, cache_key, ttl, cached_headers, flight,
+                       method, args, kwargs, stale_ttl)
 
     return wrapper
 
 
 def flush():
+    """Remove all of the responses from the cache."""
+    CACHE.clear()
+
+
+def request_key(handler, vary=None, cookies=None):
+    """Return the cache key for the request: the HTTP method, host, path and
+    query arguments sorted by name, followed by the values of the vary
+    request headers and cookies.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param list vary: The request headers that the response varies by
+    :param list cookies: The cookies that the response varies by
+    :rtype: str
+
+    """
+    request = handler.request
+    arguments = sorted([(name, value) for name, values
+                        in request.query_arguments.items()
+                        for value in values])
+    parts = [request.method, request.host, request.path,
+             urllib.urlencode(arguments)]
+    parts += ['%s=%s' % (header.lower(), request.headers.get(header, ''))
+              for header in vary or ()]
+    parts += ['%s=%s' % (name, handler.get_cookie(name, ''))
+              for name in cookies or ()]
+    return '\n'.join(parts)
+
+
+def stats():
+    """Return the hit, miss, eviction and size counters of the cache, the
+    number of requests served from and that timed out waiting for in-flight
+    responses, the number of responses in flight, the number of stale
+    responses served and the number, failures and average duration of
+    background refreshes.
+
+    :rtype: dict
+
+    """
+    values = CACHE.stats()
+    values.update(_counters)
+    values['in_flight'] = len(_in_flight)
+    values['refresh_latency'] = (values['refresh_seconds'] /
+                                 values['refreshes']
+                                 if values['refreshes'] else 0.0)
+    return values
+
+
+def _capture(handler, key, ttl, headers, flight, stale_ttl=None):
+    """Replace the write and finish methods of the handler instance to
+    capture the response body as write() buffered it, adding the response to
+    the cache when it is finished and resolving the in-flight future with it,
+    or with None if the response can not be cached.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param str key: The cache key
+    :param int|float ttl: The number of seconds to cache the response for
+    :param tuple headers: The names of the response headers to cache
+    :param tornado.concurrent.Future flight: The in-flight response future
+    :param int|float stale_ttl: The number of seconds to keep the response
+        after it expires
+
+    """
+    chunks = list()
+    write, finish = handler.write, handler.finish
+
+    def memoize_write(chunk):
+        offset = len(handler._write_buffer)
+        write(chunk)
+        chunks.extend(handler._write_buffer[offset:])
+
+    def memoize_finish(chunk=None):
+        if chunk is not None:
+            memoize_write(chunk)
+        del handler.write
+        del handler.finish
+        response = None
+        if handler.get_status() in CACHE_STATUSES:
+            response = _response(handler, ''.join(chunks), headers)
+            if ttl:
+                response.expires_at = time.time() + ttl
+            CACHE.set(key, response, response.size,
+                      ttl + (stale_ttl or 0) if ttl else None)
+        if flight is not None:
+            if _in_flight.get(key) is flight:
+                del _in_flight[key]
+            flight.set_result(response)
+        return finish()
+
+    handler.write = memoize_write
+    handler.finish = memoize_finish
+
+
+class _RefreshConnection(object):
+    """Stands in for the HTTP connection of the requests that refresh
+    responses in the background, discarding the response. The in-flight
+    future for the refresh is resolved with None when the request finishes
+    without caching a response.
+
+    :param str key: The cache key
+    :param tornado.concurrent.Future flight: The in-flight response future
+
+    """
+    def __init__(self, key, flight):
+        self.key = key
+        self.flight = flight
+
+    def finish(self):
+        _resolve(self.key, self.flight)
+
+    def set_close_callback(self, callback):
+        pass
+
+    def write(self, chunk, callback=None):
+        return self._done(callback)
+
+    def write_headers(self, start_line, headers, chunk=None, callback=None):
+        return self._done(callback)
+
+    @staticmethod
+    def _done(callback):
+        """Invoke the callback, returning a resolved future.
+
+        :param method callback: The optional write callback
+        :rtype: tornado.concurrent.Future
+
+        """
+        future = concurrent.Future()
+        future.set_result(None)
+        if callback:
+            callback()
+        return future
+
+
+def _refresh(handler, key):
+    """Refresh the response for the key in the background, dispatching a
+    copy of the request through the application so that the handler is
+    created with its URLSpec initialize arguments. The in-flight future for
+    the refresh is resolved with None if the refresh request fails or
+    finishes without caching a response.
+
+    :param tornado.web.RequestHandler handler: The handler that triggered
+        the refresh
+    :param str key: The cache key
+
     """
-    Flush all of the attributes in the cache
+    request = handler.request
+    headers = httputil.HTTPHeaders(request.headers)
+    for name in ('If-Modified-Since', 'If-None-Match'):
+        headers.pop(name, None)
+    flight = concurrent.Future()
+    clone = httputil.HTTPServerRequest(request.method, request.uri,
+                                       request.version, headers,
+                                       request.body, request.host,
+                                       connection=_RefreshConnection(key,
+                                                                     flight))
+    clone.arguments = request.arguments
+    clone.body_arguments = request.body_arguments
+    clone.remote_ip = request.remote_ip
+    clone._memoize_refresh = key, flight
+    started = time.time()
+
+    def on_refreshed(future):
+        _counters['refreshes'] += 1
+        _counters['refresh_seconds'] += time.time() - started
+        if future.result() is None:
+            LOGGER.warning('Background refresh did not cache %s', key)
+            _counters['refresh_failures'] += 1
+
+    def execute():
+        try:
+            handler.application(clone)
+        except Exception as error:
+            LOGGER.exception('Background refresh of %s failed: %s', key,
+                             error)
+            _resolve(key, flight)
+
+    flight.add_done_callback(on_refreshed)
+    _in_flight[key] = flight
+    LOGGER.debug('Refreshing %s in the background', key)
+    ioloop.IOLoop.current().add_callback(execute)
+
+
+def _refresh_if_stale(handler, key, response, refresh_ahead):
+    """Start a background refresh of the cached response if it has expired
+    or expires within refresh_ahead seconds and is not already being
+    refreshed.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param str key: The cache key
+    :param Response response: The cached response
+    :param int|float refresh_ahead: The number of seconds before the
+        response expires to refresh it
+
+    """
+    if response.expires_at is None:
+        return
+    now = time.time()
+    if now >= response.expires_at:
+        _counters['stale_served'] += 1
+    if now >= response.expires_at - refresh_ahead and key not in _in_flight:
+        _refresh(handler, key)
+
+
+def _resolve(key, flight):
+    """Remove the in-flight future for the key and resolve it with None if
+    it has not been resolved with a response.
+
+    :param str key: The cache key
+    :param tornado.concurrent.Future flight: The in-flight response future
+
+    """
+    if _in_flight.get(key) is flight:
+        del _in_flight[key]
+    if not flight.done():
+        flight.set_result(None)
+
+
+def _response(handler, body, headers):
+    """Return the Response for the handler, using the Etag header set by the
+    handler or computing the ETag of the body the same way tornado does.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param str body: The response body
+    :param tuple headers: The names of the response headers to cache
+    :rtype: Response
+
+    """
+    values = [(name, value) for name in headers if name != 'Etag'
+              for value in handler._headers.get_list(name)]
+    etag = (handler._headers.get('Etag') or
+            '"%s"' % hashlib.sha1(body).hexdigest())
+    return Response(handler.get_status(), values, body, etag)
+
+
+def _invoke(handler, key, ttl, headers, flight, method, args, kwargs,
+            stale_ttl=None):
+    """Capture the response of the handler and invoke the decorated method,
+    returning its result.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param str key: The cache key
+    :param int|float ttl: The number of seconds to cache the response for
+    :param tuple headers: The names of the response headers to cache
+    :param tornado.concurrent.Future flight: The in-flight response future
+    :param method method: The decorated method
+    :param tuple args: The method arguments
+    :param dict kwargs: The method keyword arguments
+    :param int|float stale_ttl: The number of seconds to keep the response
+        after it expires
+    :rtype: mixed
+
+    """
+    _capture(handler, key, ttl, headers, flight, stale_ttl)
+    return method(handler, *args, **kwargs)
+
+
+@gen.coroutine
+def _wait(handler, key, timeout, fallback):
+    """Wait for the in-flight response for the key and send it, invoking the
+    fallback to compute the response if it can not be cached or is not
+    finished within the timeout. A timed out in-flight response is removed
+    so that the next request for the key computes it again.
+
+    :param tornado.web.RequestHandler handler: The request handler
+    :param str key: The cache key
+    :param int|float timeout: The number of seconds to wait
+    :param method fallback: Invoked to compute the response
+
     """
-    global local_cache
-    local_cache = dict()
+    flight = _in_flight[key]
+    try:
+        response = yield gen.with_timeout(datetime.timedelta(seconds=timeout),
+                                          flight)
+    except gen.TimeoutError:
+        LOGGER.warning('Timed out waiting %s seconds for %s', timeout, key)
+        _counters['coalesce_timeouts'] += 1
+        if _in_flight.get(key) is flight:
+            del _in_flight[key]
+        response = None
+    if response is not None:
+        _counters['coalesced'] += 1
+        response.send(handler)
+        return
+    result = fallback()
+    if result is not None:
+        yield result
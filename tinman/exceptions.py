@@ -8,6 +8,11 @@ class ConfigurationException(Exception):
         return 'Configuration for %s is missing or invalid' % self.args[0]
 
 
+class ConnectionException(Exception):
+    def __repr__(self):
+        return 'No connection is available for %s' % self.args[0]
+
+
 class NoRoutesException(Exception):
     def __repr__(self):
         return 'No routes could be configured'
\ No newline at end of file
@@ -164,7 +164,7 @@ class RequestHandler(web.RequestHandler):
                                "@asynchronous decorator.")
         if isinstance(chunk, dict):
             options = {'ensure_ascii': False}
-            if 'curl' in self.request.headers.get('user-agent'):
+            if 'curl' in self.request.headers.get('user-agent', ''):
                 options['indent'] = 2
                 options['sort_keys'] = True
             chunk = json.dumps(chunk, **options).replace("</", "<\\/") + '\n'
@@ -177,9 +177,55 @@ class SessionRequestHandler(RequestHandler):
     """A RequestHandler that adds session support. For configuration details
     see the tinman.session module.
 
+    The last_request_at and last_request_uri session attributes are updated
+    on every request, but when they are the only attributes that changed the
+    session is only touched if it was last saved or touched at least
+    touch_interval seconds ago, so a session used by many requests is written
+    at most once per interval. Set touch_interval in the session adapter
+    settings, defaulting to SESSION_TOUCH_INTERVAL::
+
+        Application:
+          session:
+            adapter:
+              name: redis
+              touch_interval: 60
+
+    Handlers that set SESSION_AUTOLOAD to False do not load the session
+    before they run, so requests that do not use it do not wait on the
+    session storage. Those handlers call load_session when they need the
+    session, and the session is only stored if it was loaded::
+
+        class PixelHandler(SessionRequestHandler):
+            SESSION_AUTOLOAD = False
+
+            @gen.coroutine
+            def get(self):
+                if self.get_argument('track', None):
+                    session = yield self.load_session()
+                    session.tracked = True
+
     """
+    SESSION_AUTOLOAD = True
+    SESSION_BOOKKEEPING_KEYS = frozenset(['last_request_at',
+                                          'last_request_uri'])
     SESSION_COOKIE_NAME = 'session'
     SESSION_DURATION = 3600
+    SESSION_TOUCH_INTERVAL = 60
+
+    session = None
+    _session_stored = None
+
+    def finish(self, chunk=None):
+        """Store sessions that are kept in the response, such as cookie
+        sessions, before the response headers are sent.
+
+        :param str chunk: The optional final chunk of the response
+
+        """
+        if (self.session is not None and self.session.SAVE_BEFORE_FINISH and
+                self._session_stored is None):
+            self._session_stored = self.store_session()
+        return super(SessionRequestHandler, self).finish(chunk)
 
     @gen.coroutine
     def on_finish(self):
@@ -188,20 +234,56 @@ class SessionRequestHandler(RequestHandler):
 
         """
         super(SessionRequestHandler, self).on_finish()
+        if self.session is None:
+            return
         LOGGER.debug('Entering SessionRequestHandler.on_finish: %s',
                      self.session.id)
-        self.session.last_request_at = self.current_epoch()
-        self.session.last_request_uri = self.request.uri
-        if self.session.dirty:
-            result = yield self.session.save()
-            LOGGER.debug('on_finish yield save: %r', result)
+        if self._session_stored is None:
+            self._session_stored = self.store_session()
+        yield self._session_stored
         self.session = None
         LOGGER.debug('Exiting SessionRequestHandler.on_finish: %r',
                      self.session)
 
+    @gen.coroutine
+    def store_session(self):
+        """Update the last_request_* session values and save or touch the
+        session, returning the result or None if it was not written.
+
+        :rtype: bool
+
+        """
+        now = self.current_epoch()
+        previous = self.session.touched_at()
+        changed = self.session.dirty_keys - self.SESSION_BOOKKEEPING_KEYS
+        self.session.last_request_at = now
+        self.session.last_request_uri = self.request.uri
+        result = None
+        if changed:
+            result = yield self.session.save()
+            LOGGER.debug('store_session yield save: %r', result)
+        elif now - previous >= self._session_touch_interval:
+            result = yield self.session.touch()
+            LOGGER.debug('store_session yield touch: %r', result)
+        raise gen.Return(result)
+
     def current_epoch(self):
         return int(datetime.datetime.now().strftime('%s'))
 
+    @gen.coroutine
+    def load_session(self):
+        """Start the session if it has not been started yet, returning it.
+        Use in handlers that set SESSION_AUTOLOAD to False::
+
+            session = yield self.load_session()
+
+        :rtype: tinman.session.Session
+
+        """
+        if self.session is None:
+            yield self.start_session()
+        raise gen.Return(self.session)
+
     @gen.coroutine
     def start_session(self):
         """Start the session. Invoke in your @gen.coroutine wrapped prepare
@@ -224,9 +306,12 @@ class SessionRequestHandler(RequestHandler):
     def prepare(self):
         """Prepare the session, setting up the session object and loading in
         the values, assigning the IP address to the session if it's an new one.
+        The session is not loaded if SESSION_AUTOLOAD is False.
 
         """
         super(SessionRequestHandler, self).prepare()
+        if not self.SESSION_AUTOLOAD:
+            return
         result = yield gen.Task(self.start_session)
         LOGGER.debug('Exiting SessionRequestHandler.prepare: %r', result)
 
@@ -257,11 +342,9 @@ class SessionRequestHandler(RequestHandler):
 
     @property
     def _session_class(self):
-        if self._session_settings.get('name') == config.FILE:
-            return session.FileSession
-        elif self._session_settings.get('name') == config.REDIS:
-            return session.RedisSession
-        else:
+        try:
+            return session.ADAPTERS[self._session_settings.get('name')]
+        except KeyError:
             raise ValueError('Unknown adapter type')
 
     @property
@@ -295,12 +378,28 @@ class SessionRequestHandler(RequestHandler):
     def _session_settings(self):
         return self.settings['session'].get('adapter', dict())
 
+    @property
+    def _session_touch_interval(self):
+        """Return the minimum number of seconds between writes of a session
+        when only the last_request_* values have changed.
+
+        :rtype: int
+
+        """
+        return self._session_settings.get(config.TOUCH_INTERVAL,
+                                          self.SESSION_TOUCH_INTERVAL)
+
     def _session_start(self):
         """Return an instance of the proper session object.
 
         :rtype: Session
 
         """
+        if issubclass(self._session_class, session.CookieSession):
+            return self._session_class(self._session_id,
+                                       self._session_duration,
+                                       self._session_settings,
+                                       handler=self)
         return self._session_class(self._session_id,
                                    self._session_duration,
                                    self._session_settings)
@@ -2,6 +2,9 @@
 Mixin handlers adding various different types of functionality
 
 """
+import calendar
+import datetime
+import email.utils
 from tornado import escape
 from tornado import gen
 import logging
@@ -85,10 +88,32 @@ class ModelAPIMixin(base.RequestHandler):
     Set the MODEL attribute to the Model class for the web for basic,
     unauthenticated GET, DELETE, PUT, and POST behavior where PUT is
 
+    GET and HEAD requests with If-None-Match or If-Modified-Since headers are
+    answered with a 304 when the model ETag or last_updated_at value shows the
+    client has the current version. If the model can fetch its stored
+    metadata, the decision is made from the metadata alone without fetching
+    the model, in which case has_read_permission is invoked before the model
+    values have been loaded.
+
+    A GET request without an id returns a page of models from a secondary
+    index of the model, using the index, value, min, max, cursor and limit
+    query arguments. If the index argument is not passed, COLLECTION_INDEX
+    is used. The response contains the models and the cursor for the next
+    page::
+
+        {"items": [...], "cursor": "10.0:d3f1..."}
+
     """
     ACCEPT = [base.GET, base.HEAD, base.DELETE, base.PUT, base.POST]
     MODEL = None
 
+    # The default secondary index for collection requests
+    COLLECTION_INDEX = None
+
+    # The default and maximum number of models in a collection response
+    COLLECTION_LIMIT = 25
+    MAX_COLLECTION_LIMIT = 100
+
     # Data attributes to strip from the model
     STRIP_ATTRIBUTES = []
 
@@ -97,6 +122,7 @@ class ModelAPIMixin(base.RequestHandler):
     def initialize(self):
         super(ModelAPIMixin, self).initialize()
         self.model = None
+        self._model_json = None
 
     @web.asynchronous
     @gen.engine
@@ -122,7 +148,7 @@ class ModelAPIMixin(base.RequestHandler):
             return
 
         # Delete the model from its storage backend
-        self.model.delete()
+        yield self.model.delete()
 
         # Set the status to request processed, no content returned
         self.set_status(204)
@@ -137,8 +163,13 @@ class ModelAPIMixin(base.RequestHandler):
         :param kwargs:
 
         """
-        # Create the model and fetch its data
+        # Create the model and answer conditional requests from metadata
         self.model = self.get_model(kwargs.get('id'))
+        not_modified = yield self.metadata_not_modified()
+        if not_modified:
+            return
+
+        # Fetch the model data
         result = yield self.model.fetch()
 
         # If model is not found, return 404
@@ -151,6 +182,11 @@ class ModelAPIMixin(base.RequestHandler):
             self.permission_denied()
             return
 
+        # Return a 304 if the client has the current version
+        if self.is_not_modified(self.model.sha1(), self.last_modified()):
+            self.send_not_modified()
+            return
+
         # Add the headers (etag, content-length), set the status
         self.add_headers()
         self.set_status(200)
@@ -165,8 +201,18 @@ class ModelAPIMixin(base.RequestHandler):
         :param kwargs:
 
         """
-        # Create the model and fetch its data
+        # Requests without an id are for a page of the collection
+        if not kwargs.get('id'):
+            yield self.get_collection()
+            return
+
+        # Create the model and answer conditional requests from metadata
         self.model = self.get_model(kwargs.get('id'))
+        not_modified = yield self.metadata_not_modified()
+        if not_modified:
+            return
+
+        # Fetch the model data
         result = yield self.model.fetch()
 
         # If model is not found, return 404
@@ -181,6 +227,11 @@ class ModelAPIMixin(base.RequestHandler):
             self.permission_denied()
             return
 
+        # Return a 304 if the client has the current version
+        if self.is_not_modified(self.model.sha1(), self.last_modified()):
+            self.send_not_modified()
+            return
+
         # Add the headers and return the content as JSON
         self.add_headers()
         self.finish(self.model_json())
@@ -207,7 +258,7 @@ class ModelAPIMixin(base.RequestHandler):
         if result:
             self.set_status(201, self.status_message('Created'))
             self.add_headers()
-            self.finish(self.model.as_dict())
+            self.finish(self.model_json())
         else:
             self.set_status(507, self.status_message('Creation Failed'))
             self.finish()
@@ -223,6 +274,12 @@ class ModelAPIMixin(base.RequestHandler):
         """
         self.initialize_put(kwargs.get('id'))
 
+        # Fetch the current model data, returning 404 if it is not found
+        result = yield self.model.fetch()
+        if not result:
+            self.not_found()
+            return
+
         if not self.has_update_permission():
             self.set_status(403, self.status_message('Creation Forbidden'))
             self.finish()
@@ -234,7 +291,7 @@ class ModelAPIMixin(base.RequestHandler):
 
         if not self.model.dirty:
             self.set_status(431, self.status_message('No changes made'))
-            self.finish(self.model.as_dict())
+            self.finish(self.model_json())
             return
 
         result = yield self.model.save()
@@ -243,7 +300,7 @@ class ModelAPIMixin(base.RequestHandler):
         else:
             self.set_status(507, self.status_message('Update Failed'))
         self.add_headers()
-        self.finish(self.model.as_dict())
+        self.finish(self.model_json())
 
     # Methods to Extend
 
@@ -265,6 +322,15 @@ class ModelAPIMixin(base.RequestHandler):
         """
         return True
 
+    def has_list_permission(self):
+        """Extend this method to implement custom permission checking
+        for your data APIs.
+
+        :rtype: bool
+
+        """
+        return True
+
     def has_read_permission(self):
         """Extend this method to implement custom permission checking
         for your data APIs.
@@ -309,16 +375,140 @@ class ModelAPIMixin(base.RequestHandler):
 
     def add_headers(self):
         self.add_etag()
+        self.add_last_modified()
         self.add_content_length()
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+
+    def add_last_modified(self):
+        last_modified = self.last_modified()
+        if last_modified:
+            self.set_header('Last-Modified',
+                            datetime.datetime.utcfromtimestamp(last_modified))
+
+    @gen.coroutine
+    def get_collection(self):
+        """Respond with a page of models from the secondary index passed in
+        the index query argument, or COLLECTION_INDEX if it is not passed.
+
+        """
+        field = self.get_argument('index', self.COLLECTION_INDEX)
+        if not field or not hasattr(self.MODEL, 'query'):
+            self.set_status(405)
+            self.finish()
+            return
+
+        # Stub to check for list permissions
+        if not self.has_list_permission():
+            self.permission_denied()
+            return
+
+        try:
+            kwargs = self.collection_arguments()
+            models, cursor = yield self.query_models(field, **kwargs)
+        except ValueError as error:
+            LOGGER.debug('Invalid collection request: %s', error)
+            self.set_status(400, self.status_message('Invalid Query'))
+            self.finish()
+            return
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.finish(escape.json_encode({'items': [self.strip_attributes(
+                                                      model.as_dict())
+                                                  for model in models],
+                                        'cursor': cursor}))
+
+    def collection_arguments(self):
+        """Return the kwargs for the model query from the collection request
+        query arguments.
+
+        :rtype: dict
+        :raises: ValueError
+
+        """
+        kwargs = {'limit': min(int(self.get_argument('limit',
+                                                     self.COLLECTION_LIMIT)),
+                               self.MAX_COLLECTION_LIMIT),
+                  'cursor': self.get_argument('cursor', None),
+                  'value': self.get_argument('value', None)}
+        if kwargs['limit'] < 1:
+            raise ValueError('limit must be positive')
+        for name, key in [('min', 'minimum'), ('max', 'maximum')]:
+            value = self.get_argument(name, None)
+            if value is not None:
+                float(value[1:] if value.startswith('(') else value)
+                kwargs[key] = value
+        return kwargs
 
     def get_model(self, *args, **kwargs):
         return self.MODEL(*args, **kwargs)
 
+    def is_not_modified(self, etag, last_modified):
+        """Return True if the If-None-Match or If-Modified-Since request
+        headers indicate the client has the version of the model with the
+        ETag and last modified timestamp passed in. If-Modified-Since is only
+        evaluated when If-None-Match is not set.
+
+        :param str etag: The model ETag value without quotes
+        :param int last_modified: The model last modified timestamp
+        :rtype: bool
+
+        """
+        if_none_match = self.request.headers.get('If-None-Match')
+        if if_none_match:
+            values = [value.strip() for value in if_none_match.split(',')]
+            values = [value[2:] if value.startswith('W/') else value
+                      for value in values]
+            return '*' in values or any([value.strip('"') == etag
+                                         for value in values])
+        if_modified_since = self.request.headers.get('If-Modified-Since')
+        if if_modified_since and last_modified:
+            since = email.utils.parsedate(if_modified_since)
+            return (since is not None and
+                    int(last_modified) <= calendar.timegm(since))
+        return False
+
+    def last_modified(self):
+        """Return the timestamp the model was last modified at, using the
+        created_at value if it has not been updated.
+
+        :rtype: int
+
+        """
+        return self.model.last_updated_at or self.model.created_at
+
+    @gen.coroutine
+    def metadata_not_modified(self):
+        """If the request is conditional and the model can fetch its stored
+        metadata, decide if the client has the current version of the model
+        from the metadata, sending a 304 response if it does.
+
+        :rtype: bool
+
+        """
+        if (not hasattr(self.model, 'fetch_metadata') or
+                not (self.request.headers.get('If-None-Match') or
+                     self.request.headers.get('If-Modified-Since'))):
+            raise gen.Return(False)
+        metadata = yield self.model.fetch_metadata()
+        if (not metadata or
+                not self.is_not_modified(metadata['sha1'],
+                                         metadata['last_updated_at']) or
+                not self.has_read_permission()):
+            raise gen.Return(False)
+        self.send_not_modified(metadata['sha1'], metadata['last_updated_at'])
+        raise gen.Return(True)
+
     def model_json(self):
-        output = self.model.as_dict()
-        for key in self.STRIP_ATTRIBUTES:
-            del output[key]
-        return web.utf8(escape.json_encode(output))
+        """Return the model serialized as JSON, serializing it once per
+        request.
+
+        :rtype: bytes
+
+        """
+        if self._model_json is None:
+            output = self.strip_attributes(self.model.as_dict())
+            self._model_json = web.utf8(escape.json_encode(output))
+        return self._model_json
 
     def not_found(self):
         self.set_status(404, self.status_message('Not Found'))
@@ -329,8 +519,46 @@ class ModelAPIMixin(base.RequestHandler):
                                                  'Permission Denied'))
         self.finish()
 
+    def query_models(self, field, **kwargs):
+        """Return a future for the page of models and the next cursor from
+        the model secondary index.
+
+        :param str field: The indexed attribute to query
+        :param dict kwargs: The query arguments
+        :rtype: tornado.concurrent.Future
+
+        """
+        return self.MODEL.query(field=field, **kwargs)
+
+    def send_not_modified(self, etag=None, last_modified=None):
+        """Finish the request with a 304 Not Modified response.
+
+        :param str etag: The model ETag value, defaulting to the model sha1
+        :param int last_modified: The model last modified timestamp
+
+        """
+        self.set_status(304)
+        self.set_header('Etag', '"%s"' % (etag or self.model.sha1()))
+        if last_modified:
+            self.set_header('Last-Modified',
+                            datetime.datetime.utcfromtimestamp(last_modified))
+        self.finish()
+
     def status_message(self, message):
-        return self.model.__class__.__name__ + ' ' + message
+        name = (self.model.__class__.__name__ if self.model
+                else self.MODEL.__name__)
+        return name + ' ' + message
+
+    def strip_attributes(self, output):
+        """Remove the STRIP_ATTRIBUTES from the model dict passed in.
+
+        :param dict output: The model as a dict
+        :rtype: dict
+
+        """
+        for key in self.STRIP_ATTRIBUTES:
+            del output[key]
+        return output
 
 
 class RedisModelAPIMixin(ModelAPIMixin, RedisMixin):
@@ -338,3 +566,7 @@ class RedisModelAPIMixin(ModelAPIMixin, RedisMixin):
     def get_model(self, *args, **kwargs):
         kwargs['redis_client'] = RedisMixin._redis_client
         return self.MODEL(*args, **kwargs)
+
+    def query_models(self, field, **kwargs):
+        kwargs['redis_client'] = RedisMixin._redis_client
+        return self.MODEL.query(field=field, **kwargs)
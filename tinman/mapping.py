@@ -3,19 +3,200 @@ A generic mapping object that allows access to attributes and via getters and
 setters.
 
 """
+import abc
 import collections
 import inspect
 import json
+import types
 
+from tinman import serializers
 
-class Mapping(collections.Mapping):
+# Class level values that are never considered to be mapping fields
+_NOT_FIELDS = (types.FunctionType, classmethod, staticmethod, property)
+
+
+def _is_field_name(name):
+    """Return True if the attribute name can be used as a mapping field.
+
+    :param str name: The attribute name
+    :rtype: bool
+
+    """
+    return name[0:1] != '_' and name != 'keys' and not name.isupper()
+
+
+class MappingMeta(abc.ABCMeta):
+    """Metaclass for Mapping that compiles the field schema for a class once,
+    when the class is defined, instead of inspecting the instance on every
+    call to Mapping.keys(). If a field is added to or removed from a class
+    after it has been defined, the schema is recompiled for the class and all
+    of its subclasses.
+
+    Classes that declare a FIELDS attribute, and their subclasses, are built
+    in compact mode: the fields and the per-instance STATE_ATTRIBUTES are
+    stored in __slots__ and class level values for them become the defaults
+    assigned when an instance is created. The slotted fields of a compact
+    class can not be assigned or deleted on the class itself, as that would
+    replace the slot descriptor.
+
+    """
+    def __new__(mcs, name, bases, namespace):
+        compact = ('FIELDS' in namespace or
+                   any([getattr(base, '_compact', False) for base in bases]))
+        if not compact or '__slots__' in namespace:
+            return super(MappingMeta, mcs).__new__(mcs, name, bases,
+                                                   namespace)
+        fields, state, slotted = set(namespace.get('FIELDS', ())), set(), set()
+        fields.update([key for key, value in namespace.items()
+                       if _is_field_name(key) and
+                       not isinstance(value, _NOT_FIELDS)])
+        for base in bases:
+            fields.update(getattr(base, '_schema', ()))
+            slotted.update(getattr(base, '_slotted', ()))
+            for klass in base.__mro__:
+                state.update(klass.__dict__.get('STATE_ATTRIBUTES', ()))
+        state.update(namespace.get('STATE_ATTRIBUTES', ()))
+        slots = tuple(sorted((fields | state) - slotted))
+        defaults = dict([(key, namespace.pop(key)) for key in slots
+                         if key in namespace])
+        namespace['__slots__'] = slots
+        namespace['_compact'] = True
+        namespace['_slotted'] = tuple(sorted(slotted.union(slots)))
+        cls = super(MappingMeta, mcs).__new__(mcs, name, bases, namespace)
+        cls._compile_slot_defaults(fields, defaults)
+        return cls
+
+    def __init__(cls, name, bases, namespace):
+        super(MappingMeta, cls).__init__(name, bases, namespace)
+        cls._compile_schema()
+
+    def __delattr__(cls, key):
+        cls._check_slotted(key)
+        super(MappingMeta, cls).__delattr__(key)
+        if _is_field_name(key):
+            cls._compile_schema()
+
+    def __setattr__(cls, key, value):
+        cls._check_slotted(key)
+        super(MappingMeta, cls).__setattr__(key, value)
+        if _is_field_name(key):
+            cls._compile_schema()
+
+    def _check_slotted(cls, key):
+        """Raise an AttributeError if the attribute is stored in the
+        __slots__ of a compact class.
+
+        :param str key: The attribute name
+        :raises: AttributeError
+
+        """
+        if getattr(cls, '_compact', False) and \
+                key in getattr(cls, '_slotted', ()):
+            raise AttributeError('%s.%s is stored in __slots__ and can not be '
+                                 'changed on the class' % (cls.__name__, key))
+
+    def _compile_schema(cls):
+        """Build the sorted tuple of field names for the class from the class
+        level attributes, excluding methods and properties, then recompile
+        the schema of any subclasses.
+
+        """
+        fields = list()
+        for key in dir(cls):
+            if not _is_field_name(key):
+                continue
+            for klass in cls.__mro__:
+                if key in klass.__dict__:
+                    if not isinstance(klass.__dict__[key], _NOT_FIELDS):
+                        fields.append(key)
+                    break
+        schema = tuple(sorted(fields))
+        type.__setattr__(cls, '_schema', schema)
+        type.__setattr__(cls, '_schema_set', frozenset(fields))
+        type.__setattr__(cls, '_schema_entry',
+                         (schema, schema, frozenset(fields)))
+        for subclass in type.__subclasses__(cls):
+            subclass._compile_schema()
+
+    def _compile_slot_defaults(cls, fields, defaults):
+        """Build the values assigned to the slots of a new compact instance
+        from the class level values in the class hierarchy, the values that
+        were removed from the class namespace to make room for the slots and
+        None for any field without a class level value.
+
+        :param set fields: The field names for the class
+        :param dict defaults: Class level values removed from the namespace
+
+        """
+        values = dict([(key, None) for key in fields])
+        for klass in reversed(cls.__mro__[1:]):
+            values.update(klass.__dict__.get('_slot_defaults', {}))
+            for key in cls._slotted:
+                value = klass.__dict__.get(key)
+                if key in klass.__dict__ and \
+                        not isinstance(value, types.MemberDescriptorType):
+                    values[key] = value
+        values.update(defaults)
+        type.__setattr__(cls, '_slot_defaults',
+                         dict([(key, values[key]) for key in cls._slotted
+                               if key in values]))
+
+
+class Mapping(object):
     """A generic data object that provides access to attributes via getters
     and setters, built in serialization via JSON, iterator methods
     and other Mapping methods.
 
+    The attribute names for a class are compiled into a schema by the
+    MappingMeta metaclass when the class is defined. Attributes that are
+    added to an instance at runtime are merged into a per-instance key cache
+    that is only rebuilt when a new attribute is added or one is removed.
+
+    To use the compact representation for classes that will have a large
+    number of instances alive at once, declare the fields in FIELDS. The
+    values are then kept in __slots__ instead of an instance __dict__, and
+    assigning an attribute that is not a declared field raises an
+    AttributeError. Instances only go without a __dict__ if none of the base
+    classes between the compact class and Mapping provide one::
+
+        class Point(Mapping):
+            FIELDS = ('x', 'y')
+            x = 0
+
+    Assign a tinman.serializers.Serializer instance to the _codec attribute
+    to serialize the mapping with it in dumps() instead of JSON.
+
     """
-    # Flag indicating the mapping has changed attributes
-    _dirty = False
+    __metaclass__ = MappingMeta
+    __slots__ = ('__weakref__',)
+
+    # Instance attributes that are stored in __slots__ in compact mode
+    STATE_ATTRIBUTES = ('_dirty_keys', '_key_cache')
+
+    # The serializer used by dumps(), JSON if not set
+    _codec = None
+
+    # Set by MappingMeta for classes that are built in compact mode
+    _compact = False
+    _slot_defaults = {}
+
+    # The set of attribute names that have changed, created on first change
+    _dirty_keys = None
+
+    # Per-instance cache of (class schema, keys, key set)
+    _key_cache = None
+
+    def __new__(cls, *args, **kwargs):
+        """Create the instance, assigning the slot defaults when the class is
+        built in compact mode.
+
+        """
+        if cls is Mapping:
+            cls = _Mapping
+        obj = super(Mapping, cls).__new__(cls)
+        for key, value in cls._slot_defaults.iteritems():
+            object.__setattr__(obj, key, value)
+        return obj
 
     def __init__(self, **kwargs):
         """Assign all kwargs passed in as attributes of the object."""
@@ -27,7 +208,7 @@ class Mapping(collections.Mapping):
         :param str item: The attribute name
 
         """
-        return item in self.keys()
+        return item in self._key_set()
 
     def __eq__(self, other):
         """Test another mapping for equality against this one
@@ -39,7 +220,18 @@ class Mapping(collections.Mapping):
         if not isinstance(other, self.__class__):
             return False
         return all([getattr(self, k) == getattr(other, k)
-                    for k in self.keys()])
+                    for k in self._keys()])
+
+    def __delattr__(self, key):
+        """Remove an attribute from the object, invalidating the key cache.
+
+        :param str key: The attribute name
+
+        """
+        super(Mapping, self).__delattr__(key)
+        if _is_field_name(key):
+            self._mark_dirty(key)
+            object.__setattr__(self, '_key_cache', None)
 
     def __delitem__(self, key):
         """Delete the attribute from the mapping.
@@ -48,7 +240,7 @@ class Mapping(collections.Mapping):
         :raises: KeyError
 
         """
-        if key not in self.keys():
+        if key not in self._key_set():
             raise KeyError(key)
         delattr(self, key)
 
@@ -60,7 +252,7 @@ class Mapping(collections.Mapping):
         :raises: KeyError
 
         """
-        if item not in self.keys():
+        if item not in self._key_set():
             raise KeyError(item)
         return getattr(self, item)
 
@@ -70,15 +262,15 @@ class Mapping(collections.Mapping):
         :rtype: int
 
         """
-        return hash(self.items())
+        return hash(tuple(self.items()))
 
     def __iter__(self):
         """Iterate through the keys in the mapping object.
 
-        :rtype: listiterator
+        :rtype: tupleiterator
 
         """
-        return self.iterkeys()
+        return iter(self._keys())
 
     def __len__(self):
         """Return the number of attributes in this mapping object.
@@ -86,7 +278,7 @@ class Mapping(collections.Mapping):
         :rtype: int
 
         """
-        return len(self.keys())
+        return len(self._keys())
 
     def __ne__(self, other):
         """Test two mappings for inequality.
@@ -104,17 +296,23 @@ class Mapping(collections.Mapping):
 
         """
         return '<%s.%s keys="%s">' % (__name__, self.__class__.__name__,
-                                      ','.join(self.keys()))
+                                      ','.join(self._keys()))
 
     def __setattr__(self, key, value):
-        """Set an attribute on the object flipping the indicator
+        """Set an attribute on the object, adding it to the dirty keys
 
         :param str key: The attribute name
         :param mixed value: The value to set
+        :raises: AttributeError
 
         """
-        if key[0] != '_' and not self._dirty:
-            self._dirty = True
+        if _is_field_name(key):
+            if self._compact and key not in self._schema_set:
+                raise AttributeError('%s has no field %s' %
+                                     (self.__class__.__name__, key))
+            self._mark_dirty(key)
+            if self._key_cache and key not in self._key_cache[2]:
+                object.__setattr__(self, '_key_cache', None)
         super(Mapping, self).__setattr__(key, value)
 
     def __setitem__(self, key, value):
@@ -145,11 +343,21 @@ class Mapping(collections.Mapping):
             setattr(self, k, values[k])
 
     def clear(self):
-        """Clear all set attributes in the mapping.
+        """Clear all set attributes in the mapping. Attributes that only have
+        a class level default value are left in place. In compact mode the
+        slots are reset to their defaults, since there is no class level
+        value to fall back to.
 
         """
-        for key in self.keys():
-            delattr(self, key)
+        if self._compact:
+            for key in self._keys():
+                setattr(self, key, self._slot_defaults.get(key))
+            return
+        for key in self._keys():
+            try:
+                delattr(self, key)
+            except AttributeError:
+                pass
 
     @property
     def dirty(self):
@@ -158,23 +366,50 @@ class Mapping(collections.Mapping):
         :rtype: bool
 
         """
-        return self._dirty
+        return bool(self._dirty_keys)
+
+    @property
+    def dirty_keys(self):
+        """Return the names of the attributes that have changed since the
+        mapping was created or last marked clean.
+
+        :rtype: frozenset
+
+        """
+        return frozenset(self._dirty_keys or ())
 
     def dumps(self):
-        """Return a JSON serialized version of the mapping.
+        """Return a serialized version of the mapping, using the _codec
+        serializer if one is set or JSON if not.
 
         :rtype: str|unicode
 
         """
+        if self._codec is not None:
+            return self._codec.serialize(self.as_dict())
         return json.dumps(self.as_dict(), encoding='utf-8', ensure_ascii=False)
 
     def loads(self, value):
-        """Load in a serialized value, overwriting any previous values.
+        """Load in a serialized value, overwriting any previous values. The
+        format of the value is detected, so values serialized as JSON or with
+        another serializer are read whatever the _codec serializer is.
+        Pickled values are only read if _codec is a Pickle serializer, since
+        unpickling a value can run arbitrary code.
 
         :param str|unicode value: The serialized value
+        :raises: ValueError
 
         """
-        self.from_dict(json.loads(value, encoding='utf-8'))
+        value_format = serializers.detect(value)
+        if self._codec is not None and value_format == self._codec.FORMAT:
+            self.from_dict(self._codec.deserialize(value))
+        elif value_format in (None, serializers.JSON.FORMAT):
+            self.from_dict(json.loads(value, encoding='utf-8'))
+        elif value_format == serializers.Pickle.FORMAT:
+            raise ValueError('Not loading a pickled value without the Pickle '
+                             'serializer')
+        else:
+            self.from_dict(serializers.get(value_format).deserialize(value))
 
     def keys(self):
         """Return a list of attribute names for the mapping.
@@ -182,13 +417,7 @@ class Mapping(collections.Mapping):
         :rtype: list
 
         """
-        return sorted([k for k in dir(self) if
-                       k[0:1] != '_' and k != 'keys' and not k.isupper() and
-                       not inspect.ismethod(getattr(self, k)) and
-                       not (hasattr(self.__class__, k) and
-                            isinstance(getattr(self.__class__, k),
-                                       property)) and
-                       not isinstance(getattr(self, k), property)])
+        return list(self._keys())
 
     def get(self, key, default=None):
         """Get the value of key, passing in a default value if it is not set.
@@ -203,10 +432,10 @@ class Mapping(collections.Mapping):
     def iterkeys(self):
         """Iterate through the attribute names for this mapping.
 
-        :rtype: listiterator
+        :rtype: tupleiterator
 
         """
-        return iter(self.keys())
+        return iter(self._keys())
 
     def iteritems(self):
         """Iterate through a list of the attribute names and their values.
@@ -230,7 +459,7 @@ class Mapping(collections.Mapping):
         :rtype: list
 
         """
-        return [(k, getattr(self, k)) for k in self.keys()]
+        return [(k, getattr(self, k)) for k in self._keys()]
 
     def set(self, key, value):
         """Set the value of key.
@@ -248,4 +477,80 @@ class Mapping(collections.Mapping):
         :rtype list
 
         """
-        return [getattr(self, k) for k in self.keys()]
+        return [getattr(self, k) for k in self._keys()]
+
+    def _mark_clean(self, keys=None):
+        """Remove the attribute names passed in from the dirty keys, or all
+        of them if keys is not specified.
+
+        :param list keys: The attribute names to mark as clean
+
+        """
+        if keys is None or not self._dirty_keys:
+            object.__setattr__(self, '_dirty_keys', None)
+        else:
+            self._dirty_keys.difference_update(keys)
+
+    def _mark_dirty(self, key):
+        """Add the attribute name to the dirty keys.
+
+        :param str key: The attribute name
+
+        """
+        if self._dirty_keys is None:
+            object.__setattr__(self, '_dirty_keys', set([key]))
+        else:
+            self._dirty_keys.add(key)
+
+    def _key_cache_entry(self):
+        """Return the cached (schema, keys, key set) tuple for the instance,
+        building it from the class schema and any attributes that were
+        assigned directly to the instance if the cache is empty or the class
+        schema has been recompiled since it was built.
+
+        :rtype: tuple
+
+        """
+        if self._compact:
+            return self._schema_entry
+        cache = self._key_cache
+        schema = self.__class__._schema
+        if cache is None or cache[0] is not schema:
+            schema_set = self.__class__._schema_set
+            keys = set(schema_set)
+            for key, value in getattr(self, '__dict__', {}).items():
+                if (key not in schema_set and _is_field_name(key) and
+                        not inspect.ismethod(value)):
+                    keys.add(key)
+            cache = schema, tuple(sorted(keys)), frozenset(keys)
+            object.__setattr__(self, '_key_cache', cache)
+        return cache
+
+    def _keys(self):
+        """Return the sorted tuple of attribute names for the mapping.
+
+        :rtype: tuple
+
+        """
+        return self._key_cache_entry()[1]
+
+    def _key_set(self):
+        """Return the attribute names for the mapping as a frozenset for
+        constant time membership tests.
+
+        :rtype: frozenset
+
+        """
+        return self._key_cache_entry()[2]
+
+
+class _Mapping(Mapping):
+    """The class of instances created by calling Mapping directly, which
+    keep their attributes in an instance __dict__. Mapping itself does not
+    provide one so that compact subclasses can do without.
+
+    """
+    pass
+
+
+collections.Mapping.register(Mapping)
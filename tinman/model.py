@@ -24,9 +24,10 @@ Example use::
         @web.asynchronous
         @gen.engine
         def get(self, *args, **kwargs):
-            model = ExampleModel(self.get_argument('id'),
-                                 redis_client=self.redis)
-            yield model.fetch()
+            model = yield ExampleModel.load(self.get_argument('id'),
+                                            redis_client=self.redis)
+            if not model:
+                raise web.HTTPError(404)
             self.finish(model.as_dict())
 
         @web.asynchronous
@@ -52,14 +53,135 @@ Example use::
 import base64
 from tornado import gen
 import hashlib
+import json
 import logging
+import os
+import string
 import time
 import uuid
 
+from tinman import cache
 from tinman import mapping
+from tinman import sqlite
+from tinman import utils
 
 LOGGER = logging.getLogger(__name__)
 
+# The characters a base64 encoded value can start with, used to detect values
+# stored before an AsyncRedisModel had a _codec assigned
+_BASE64_CHARACTERS = frozenset(string.ascii_letters + string.digits + '+/')
+
+# The hash field the model metadata is stored in when using hash storage
+META_FIELD = '_meta'
+
+# AsyncRedisModel secondary index types
+INDEX_RANGE = 'range'
+INDEX_VALUE = 'value'
+
+# AsyncRedisModel storage modes
+STORAGE_HASH = 'hash'
+STORAGE_STRING = 'string'
+
+
+class ModelCache(cache.LRUCache):
+    """The per-process read-through cache for the stored values of
+    AsyncRedisModel classes that have a _cache_ttl. Invalidations are
+    published to CHANNEL and the cache subscribes to the channel on a
+    dedicated connection when it is first used, removing keys that were
+    saved or deleted by other processes. If the subscription is lost, the
+    cache is cleared since invalidations may have been missed.
+
+    :param int max_entries: The maximum number of entries to keep
+    :param int max_bytes: The maximum total size of the entries in bytes
+
+    """
+    CHANNEL = 'tinman:model:invalidate'
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        super(ModelCache, self).__init__(max_entries, max_bytes)
+        self.remote_invalidations = 0
+        self._subscriber = None
+
+    def invalidation_message(self, key):
+        """Return the message to publish to invalidate the key, identifying
+        the process that published it.
+
+        :param str key: The cache key
+        :rtype: str
+
+        """
+        return '%s:%s' % (self._origin(), key)
+
+    def stats(self):
+        """Return the cache counters and current usage.
+
+        :rtype: dict
+
+        """
+        stats = super(ModelCache, self).stats()
+        stats['remote_invalidations'] = self.remote_invalidations
+        return stats
+
+    def subscribe(self, redis_client):
+        """Subscribe to invalidation messages using a new connection to the
+        server the redis client passed in is connected to, if the cache is
+        not already subscribed.
+
+        :param tornadoredis.Client redis_client: The model redis client
+
+        """
+        if self._subscriber is not None:
+            return
+        if 'tornadoredis' not in globals():
+            import tornadoredis
+        connection = redis_client.connection
+        LOGGER.info('Subscribing to %s on %s:%s', self.CHANNEL,
+                    connection.host, connection.port)
+        self._subscriber = tornadoredis.Client(host=connection.host,
+                                               port=connection.port)
+        self._subscriber.connect()
+        self._subscriber.subscribe(self.CHANNEL, callback=self._on_subscribed)
+
+    def _on_message(self, message):
+        """Invoked for each message on the subscription, removing the keys
+        that were invalidated by other processes.
+
+        :param tornadoredis.client.Message message: The message
+
+        """
+        if message.kind == 'message':
+            hostname, pid, key = message.body.split(':', 2)
+            if '%s:%s' % (hostname, pid) != self._origin():
+                self.remote_invalidations += 1
+                self.delete(key)
+        elif message.kind == 'disconnect':
+            LOGGER.warning('Lost the %s subscription, clearing the cache',
+                           self.CHANNEL)
+            self._subscriber = None
+            self.clear()
+
+    def _on_subscribed(self, result):
+        """Start listening for messages once subscribed.
+
+        :param mixed result: The subscribe command result
+
+        """
+        if self._subscriber is not None:
+            self._subscriber.listen(self._on_message)
+
+    @staticmethod
+    def _origin():
+        """Return the hostname and pid identifying this process.
+
+        :rtype: str
+
+        """
+        return '%s:%i' % (utils.hostname(), os.getpid())
+
+
+# The per-process cache used by AsyncRedisModel classes with a _cache_ttl
+MODEL_CACHE = ModelCache(max_entries=10000, max_bytes=64 * 1024 * 1024)
+
 
 class Model(mapping.Mapping):
     """A data object that provides attribute level assignment and retrieval of
@@ -72,14 +194,23 @@ class Model(mapping.Mapping):
     If model attributes are passed into the constructor, they will be assigned
     to the model upon creation.
 
+    The sha1 digest of the model is cached until an attribute is assigned.
+    Values that are changed in place, such as appending to a list attribute,
+    must be assigned back to the attribute to reset the cached digest.
+
     :param str item_id: An id for the model, defaulting to a random UUID
     :param dict kwargs: Additional kwargs passed in
 
     """
+    STATE_ATTRIBUTES = ('_sha1',)
+
     id = None
     created_at = None
     last_updated_at = None
 
+    # The cached sha1 digest of the model items
+    _sha1 = None
+
     def __init__(self, item_id=None, **kwargs):
         """Create a new instance of the model, passing in a id value."""
         self.id = item_id or str(uuid.uuid4())
@@ -87,7 +218,7 @@ class Model(mapping.Mapping):
         self.last_updated_at = None
 
         # If values are in the kwargs that match the model keys, assign them
-        for k in [k for k in kwargs.keys() if k in self.keys()]:
+        for k in [k for k in kwargs.keys() if k in self]:
             setattr(self, k, kwargs[k])
 
     def from_dict(self, value):
@@ -106,30 +237,58 @@ class Model(mapping.Mapping):
         :rtype: str
 
         """
-        sha1 = hashlib.sha1(''.join(['%s:%s' % (k,v) for k,v in self.items()]))
-        return str(sha1.hexdigest())
+        if self._sha1 is None:
+            sha1 = hashlib.sha1(''.join(['%s:%s' % (k,v)
+                                         for k,v in self.items()]))
+            object.__setattr__(self, '_sha1', str(sha1.hexdigest()))
+        return self._sha1
+
+    def _mark_dirty(self, key):
+        """Add the attribute name to the dirty keys, resetting the cached
+        sha1 digest.
+
+        :param str key: The attribute name
+
+        """
+        super(Model, self)._mark_dirty(key)
+        object.__setattr__(self, '_sha1', None)
 
 
 class StorageModel(Model):
     """A base model that defines the behavior for models with storage backends.
 
+    Creating an instance does not access storage. To create an instance and
+    fetch its values in one step, use the load class method, which returns
+    None if the model was not found::
+
+        model = yield ExampleModel.load(item_id, redis_client=client)
+
     :param str item_id: An id for the model, defaulting to a random UUID
     :param dict kwargs: Additional kwargs passed in
 
     """
+    STATE_ATTRIBUTES = ('_new',)
+
     _new = True
 
     def __init__(self, item_id=None, **kwargs):
         super(StorageModel, self).__init__(item_id, **kwargs)
-        if self.id:
-            # It's no longer a new model, since it's a load
-            self._new = False
+        self._new = item_id is None
+
+    @classmethod
+    @gen.coroutine
+    def load(cls, item_id, **kwargs):
+        """Create an instance of the model for the item id and fetch its
+        values from storage, returning None if it was not found.
 
-            # Fetch the model values from storage
-            self.fetch()
+        :param str item_id: The id of the model to load
+        :param dict kwargs: Additional kwargs passed to the constructor
+        :rtype: StorageModel|None
 
-            # Toggle the changed back to false since it's an initial load
-            self._dirty = False
+        """
+        model = cls(item_id, **kwargs)
+        result = yield gen.maybe_future(model.fetch())
+        raise gen.Return(model if result else None)
 
     def delete(self):
         """Delete the data for the model from storage and assign the values.
@@ -175,12 +334,66 @@ class AsyncRedisModel(StorageModel):
     the binary data, it is then base64 encoded. This is a win on large objects
     but a slight amount of overhead on smaller ones.
 
+    To store the serialized value without base64 encoding it, assign a
+    tinman.serializers.Serializer instance to the _codec attribute. Values
+    written in the base64 encoded format are still read transparently, so an
+    existing data set is migrated as models are saved::
+
+        class ExampleModel(AsyncRedisModel):
+            _codec = serializers.MsgPack()
+
+    Set the _storage attribute to STORAGE_HASH to store the model as a Redis
+    hash with one JSON encoded hash field per model attribute. In hash
+    storage, save() only writes the attributes that have changed since the
+    model was fetched or last saved, and fetch() can be passed a list of the
+    attributes to fetch.
+
+    When a model that has been changed is saved, last_updated_at is set to
+    the current time. The sha1 digest of the model and last_updated_at are
+    stored alongside it when the model is saved, in a separate key for string
+    storage or in the _meta hash field for hash storage. It is assigned as
+    the cached digest when the model is fetched, and fetch_metadata() returns
+    it without fetching the model, so ETags can be produced without
+    serializing and hashing the model again.
+
+    To load or store many models in a single round trip to Redis, use the
+    fetch_many and save_many class methods::
+
+        models = yield ExampleModel.fetch_many(ids, redis_client)
+
+    Assign the number of seconds to keep fetched values in the per-process
+    MODEL_CACHE to the _cache_ttl attribute to read models through it. Saving
+    or deleting a model removes it from the cache in the local process and
+    publishes the key so that other processes remove it as well.
+
+    Secondary indexes are declared in the _indexes attribute as a dict of
+    attribute name to index type, and are updated in the same pipeline as
+    save() and delete(). An INDEX_RANGE index keeps the ids of the models in
+    a sorted set scored by the numeric attribute value. An INDEX_VALUE index
+    keeps a sorted set per attribute value, scored by created_at. The query
+    class method returns a page of models and the cursor for the next page::
+
+        class ExampleModel(AsyncRedisModel):
+            _indexes = {'age': INDEX_RANGE, 'location': INDEX_VALUE}
+
+        models, cursor = yield ExampleModel.query(redis_client, 'age',
+                                                  minimum=18, limit=25)
+
     :param str item_id: The id for the data item
     :param tornadoredis.Client: The already created tornadoredis client
 
     """
+    STATE_ATTRIBUTES = ('_indexed', '_partial', '_redis_client', '_saved',
+                        '_serializer')
+
+    _cache_ttl = None
+    _codec = None
+    _indexed = None
+    _indexes = {}
+    _partial = False
     _redis_client = None
     _saved = False
+    _storage = STORAGE_STRING
     _ttl = None
 
     def __init__(self, item_id=None, *args, **kwargs):
@@ -192,8 +405,6 @@ class AsyncRedisModel(StorageModel):
         LOGGER.info('%r -- %r', args, kwargs)
         LOGGER.info(repr(kwargs.get('redis_client')))
         self._redis_client = kwargs['redis_client']
-
-        # The parent will attempt to fetch the value if item_id is set
         super(AsyncRedisModel, self).__init__(item_id, **kwargs)
 
     @property
@@ -206,6 +417,16 @@ class AsyncRedisModel(StorageModel):
         """
         return '%s:%s' % (self.__class__.__name__, self.id)
 
+    @property
+    def _meta_key(self):
+        """Return the storage key for the model metadata when using string
+        storage.
+
+        :rtype: str
+
+        """
+        return '%s:meta' % self._key
+
     @gen.coroutine
     def delete(self):
         """Delete the item from storage
@@ -213,21 +434,186 @@ class AsyncRedisModel(StorageModel):
         :rtype: bool
 
         """
-        result = gen.Task(self._redis_client.delete, self._key)
-        raise gen.Return(bool(result))
+        pipeline = self._redis_client.pipeline()
+        pipeline.delete(self._key, self._meta_key)
+        for field in self._indexes:
+            pipeline.zrem(self._index_key(field, self._indexed_value(field)),
+                          self.id)
+        if self._cache_ttl:
+            pipeline.publish(MODEL_CACHE.CHANNEL,
+                             MODEL_CACHE.invalidation_message(self._key))
+        result = yield gen.Task(pipeline.execute)
+        MODEL_CACHE.delete(self._key)
+        raise gen.Return(bool(result[0]))
 
     @gen.coroutine
-    def fetch(self):
-        """Fetch the data for the model from Redis and assign the values.
+    def fetch(self, fields=None):
+        """Fetch the data for the model from Redis and assign the values. When
+        using hash storage, a list of fields may be passed in to only fetch
+        and assign the values for those attributes.
+
+        If the class has a _cache_ttl, the stored value is read through the
+        process wide MODEL_CACHE. Fetching a subset of fields bypasses it.
+        The indexed attributes are always fetched so the secondary indexes
+        can be updated when the model is saved.
 
+        :param list fields: The optional list of attributes to fetch
         :rtype: bool
 
         """
-        raw = yield gen.Task(self._redis_client.get, self._key)
-        if raw:
-            self.loads(base64.b64decode(raw))
-            raise gen.Return(True)
-        raise gen.Return(False)
+        if self._storage == STORAGE_HASH and fields:
+            fields = set(fields) | set(self._indexes.keys())
+            raw = yield gen.Task(self._redis_client.hmget, self._key,
+                                 list(fields) + [META_FIELD])
+            raise gen.Return(self._load(raw, partial=True))
+        if self._cache_ttl:
+            MODEL_CACHE.subscribe(self._redis_client)
+            cached = MODEL_CACHE.get(self._key)
+            if cached is not None:
+                raise gen.Return(self._load(*cached))
+        if self._storage == STORAGE_HASH:
+            raw = yield gen.Task(self._redis_client.hgetall, self._key)
+            value = raw, None
+        else:
+            value = yield gen.Task(self._redis_client.mget,
+                                   [self._key, self._meta_key])
+        self._cache_value(*value)
+        raise gen.Return(self._load(*value))
+
+    @classmethod
+    @gen.coroutine
+    def fetch_many(cls, item_ids, redis_client):
+        """Fetch multiple models from Redis with a single MGET, or a single
+        pipeline of HGETALL commands when using hash storage, returning a
+        list with the model for each id in the order the ids were passed in
+        and None in place of any that were not found. If the class has a
+        _cache_ttl, only the models that are not cached are fetched.
+
+        :param list item_ids: The ids of the models to fetch
+        :param tornadoredis.Client redis_client: The redis client to use
+        :rtype: list
+
+        """
+        if not item_ids:
+            raise gen.Return([])
+        models = [cls(item_id, redis_client=redis_client)
+                  for item_id in item_ids]
+        values = dict()
+        if cls._cache_ttl:
+            MODEL_CACHE.subscribe(redis_client)
+            for model in models:
+                cached = MODEL_CACHE.get(model._key)
+                if cached is not None:
+                    values[model._key] = cached
+        pending = [model for model in models if model._key not in values]
+        if pending and cls._storage == STORAGE_HASH:
+            pipeline = redis_client.pipeline()
+            for model in pending:
+                pipeline.hgetall(model._key)
+            result = yield gen.Task(pipeline.execute)
+            for model, raw in zip(pending, result):
+                values[model._key] = raw, None
+        elif pending:
+            keys = list()
+            for model in pending:
+                keys += [model._key, model._meta_key]
+            result = yield gen.Task(redis_client.mget, keys)
+            for offset, model in enumerate(pending):
+                values[model._key] = (result[offset * 2],
+                                      result[offset * 2 + 1])
+        for model in pending:
+            model._cache_value(*values[model._key])
+        raise gen.Return([model if model._load(*values[model._key]) else None
+                          for model in models])
+
+    @gen.coroutine
+    def fetch_metadata(self):
+        """Fetch the metadata stored alongside the model without fetching the
+        model itself, returning None if there is no stored metadata. The
+        metadata is a dict with the sha1 digest of the model and the value of
+        last_updated_at when it was saved.
+
+        :rtype: dict
+
+        """
+        if self._storage == STORAGE_HASH:
+            raw = yield gen.Task(self._redis_client.hmget, self._key,
+                                 [META_FIELD])
+            raw = raw.get(META_FIELD)
+        else:
+            raw = yield gen.Task(self._redis_client.get, self._meta_key)
+        raise gen.Return(self._decode_metadata(raw))
+
+    @classmethod
+    @gen.coroutine
+    def query(cls, redis_client, field, value=None, minimum='-inf',
+              maximum='+inf', cursor=None, limit=25):
+        """Return a page of the models in the secondary index for the field
+        and the cursor to pass in to fetch the next page, which is None when
+        there are no more models. For INDEX_RANGE indexes, minimum and maximum
+        bound the attribute value. For INDEX_VALUE indexes, the value must be
+        passed in and minimum and maximum bound created_at. The bounds use the
+        Redis ZRANGEBYSCORE syntax, so a ( prefix makes them exclusive.
+
+        Models are returned in score order, and models with the same score in
+        id order. The cursor holds the score and id of the last model on the
+        page, so pages stay consistent as models are added and removed.
+
+        The ids of models that are no longer stored, such as models that
+        expired through _ttl, are removed from the index when a page would
+        include them, and the page is read again.
+
+        :param tornadoredis.Client redis_client: The redis client to use
+        :param str field: The indexed attribute to query
+        :param mixed value: The attribute value for INDEX_VALUE indexes
+        :param int|float|str minimum: The minimum score
+        :param int|float|str maximum: The maximum score
+        :param str cursor: The cursor returned with the previous page
+        :param int limit: The maximum number of models to return
+        :rtype: tuple(list, str)
+        :raises: ValueError
+
+        """
+        if field not in cls._indexes:
+            raise ValueError('%s is not indexed' % field)
+        if cls._indexes[field] == INDEX_VALUE and value is None:
+            raise ValueError('A value is required to query %s' % field)
+        key = cls._index_key(field, value)
+        after = None
+        if cursor:
+            score, _sep, item_id = cursor.partition(':')
+            after, minimum = (float(score), item_id), score
+
+        while True:
+            # Skip the members with the cursor score that were already
+            # returned
+            members, offset = list(), 0
+            while len(members) <= limit:
+                batch = yield gen.Task(redis_client.zrangebyscore, key,
+                                       minimum, maximum, offset, limit + 1,
+                                       True)
+                batch = batch or []
+                members += [(item_id, score) for item_id, score in batch
+                            if not after or (float(score), item_id) > after]
+                if len(batch) <= limit:
+                    break
+                offset += len(batch)
+
+            page = members[:limit]
+            models = yield cls.fetch_many([item_id for item_id, score in page],
+                                          redis_client)
+            missing = [item_id for (item_id, _score), model
+                       in zip(page, models) if model is None]
+            if not missing:
+                break
+            LOGGER.debug('Removing %i missing models from %s',
+                         len(missing), key)
+            yield gen.Task(redis_client.zrem, key, *missing)
+
+        cursor = None
+        if len(members) > limit:
+            cursor = '%r:%s' % (float(page[-1][1]), page[-1][0])
+        raise gen.Return((models, cursor))
 
     @gen.coroutine
     def save(self):
@@ -237,9 +623,362 @@ class AsyncRedisModel(StorageModel):
 
         """
         pipeline = self._redis_client.pipeline()
-        pipeline.set(self._key, base64.b64encode(self.dumps()))
+        count, keys, unchecked = self._pipeline_save(pipeline)
+        result = yield gen.Task(pipeline.execute)
+        raise gen.Return(self._on_saved(result, keys, unchecked))
+
+    @classmethod
+    @gen.coroutine
+    def save_many(cls, models, redis_client=None):
+        """Store multiple models in Redis using a single pipeline, returning a
+        list with the save result for each model in the order they were
+        passed in. If redis_client is not passed in, the client assigned to
+        the first model is used.
+
+        :param list models: The models to save
+        :param tornadoredis.Client redis_client: The redis client to use
+        :rtype: list
+
+        """
+        if not models:
+            raise gen.Return([])
+        client = redis_client or models[0]._redis_client
+        pipeline = client.pipeline()
+        commands = [model._pipeline_save(pipeline) for model in models]
+        result = yield gen.Task(pipeline.execute)
+        offset, results = 0, list()
+        for model, (count, keys, unchecked) in zip(models, commands):
+            results.append(model._on_saved(result[offset:offset + count],
+                                           keys, unchecked))
+            offset += count
+        raise gen.Return(results)
+
+    def _cache_value(self, raw, meta):
+        """Add the raw stored value and metadata to the MODEL_CACHE if the
+        class has a _cache_ttl.
+
+        :param str|dict raw: The value returned by Redis
+        :param str meta: The stored metadata value
+
+        """
+        if not self._cache_ttl or not raw:
+            return
+        if self._storage == STORAGE_HASH:
+            size = sum([len(key) + len(value or '')
+                        for key, value in raw.items()])
+        else:
+            size = len(raw) + len(meta or '')
+        MODEL_CACHE.set(self._key, (raw, meta), size, self._cache_ttl)
+
+    def _changed_indexes(self):
+        """Return the indexed attributes that need to be written to their
+        secondary indexes when the model is saved.
+
+        :rtype: list
+
+        """
+        if self._new or self._indexed is None:
+            return list(self._indexes.keys())
+        return [field for field in self._indexes
+                if field in self.dirty_keys]
+
+    @staticmethod
+    def _decode_metadata(raw):
+        """Return the metadata dict for the stored metadata value.
+
+        :param str raw: The stored metadata value
+        :rtype: dict
+
+        """
+        if not raw:
+            return None
+        sha1, _sep, last_updated_at = raw.partition(':')
+        return {'sha1': sha1,
+                'last_updated_at': (int(last_updated_at)
+                                    if last_updated_at else None)}
+
+    def _encode(self):
+        """Return the value to store in Redis, serialized with the _codec
+        serializer if one is set or as base64 encoded JSON if not.
+
+        :rtype: str
+
+        """
+        if self._codec is None:
+            return base64.b64encode(self.dumps())
+        return self.dumps()
+
+    @classmethod
+    def _index_key(cls, field, value=None):
+        """Return the key of the sorted set for the secondary index of the
+        attribute. INDEX_VALUE indexes have a sorted set per value.
+
+        :param str field: The indexed attribute
+        :param mixed value: The attribute value for INDEX_VALUE indexes
+        :rtype: str
+
+        """
+        key = '%s:index:%s' % (cls.__name__, field)
+        if cls._indexes[field] == INDEX_VALUE:
+            return '%s:%s' % (key, value)
+        return key
+
+    def _indexed_value(self, field):
+        """Return the value of the attribute when the model was last loaded or
+        saved, which is the value its secondary index holds.
+
+        :param str field: The indexed attribute
+        :rtype: mixed
+
+        """
+        if self._indexed is not None and field in self._indexed:
+            return self._indexed[field]
+        return self.get(field)
+
+    def _indexed_values(self):
+        """Return the values of the indexed attributes.
+
+        :rtype: dict
+
+        """
+        return dict([(field, self.get(field)) for field in self._indexes])
+
+    def _encode_metadata(self):
+        """Return the metadata value to store alongside the model.
+
+        :rtype: str
+
+        """
+        return '%s:%s' % (self.sha1(), self.last_updated_at or '')
+
+    def _load(self, raw, meta=None, partial=False):
+        """Assign the values from the raw value stored in Redis, returning
+        False if there was no stored value. If the stored metadata is passed
+        in or is included in the stored hash, the stored sha1 digest is
+        assigned as the cached digest for the model.
+
+        :param str|dict raw: The value returned by Redis
+        :param str meta: The stored metadata value
+        :param bool partial: Only a subset of the fields were fetched
+        :rtype: bool
+
+        """
+        if self._storage == STORAGE_HASH:
+            raw = dict(raw or {})
+            meta = raw.pop(META_FIELD, None)
+            values = dict([(key, json.loads(value))
+                           for key, value in raw.items()
+                           if value is not None])
+            if not values:
+                return False
+            for key, value in values.items():
+                setattr(self, key, value)
+        elif not raw:
+            return False
+        elif raw[0] in _BASE64_CHARACTERS:
+            self.loads(base64.b64decode(raw))
+        else:
+            self.loads(raw)
+        self._mark_clean()
+        self._new, self._partial = False, partial
+        self._indexed = self._indexed_values()
+        metadata = self._decode_metadata(meta)
+        if metadata:
+            object.__setattr__(self, '_sha1', metadata['sha1'])
+        return True
+
+    def _on_saved(self, result, keys, unchecked=()):
+        """Update the model state with the pipeline results for the commands
+        added by _pipeline_save, returning True if they all succeeded. The
+        results at the unchecked offsets only fail the save if they are
+        errors.
+
+        :param list result: The pipeline results for the model
+        :param set keys: The attributes that were written
+        :param set unchecked: The offsets of the results that are not checked
+        :rtype: bool
+
+        """
+        MODEL_CACHE.delete(self._key)
+        self._saved = all([not isinstance(value, Exception) and
+                           (offset in unchecked or
+                            (value is not None and value is not False))
+                           for offset, value in enumerate(result)])
+        if self._saved:
+            self._mark_clean(keys)
+            self._new = False
+            self._indexed = self._indexed_values()
+        return self._saved
+
+    def _pipeline_save(self, pipeline):
+        """Add the commands to store the model and its metadata to the
+        pipeline, returning the number of commands that were added, the
+        attributes being written and the offsets of the commands whose
+        replies do not indicate success. HDEL replies False when none of the
+        fields were stored, which is not a failure.
+
+        When only some of the fields of a hash stored model were fetched, the
+        digest of the model in memory does not match the stored model, so the
+        stored metadata is removed instead of being rewritten.
+
+        :param tornadoredis.client.Pipeline pipeline: The pipeline to add to
+        :rtype: tuple(int, set, set)
+
+        """
+        count, unchecked = 0, set()
+        if self.dirty and not self._new:
+            self.last_updated_at = int(time.time())
+        if self._storage == STORAGE_HASH:
+            keys = set(self.keys()) if self._new else set(self.dirty_keys)
+            values = dict([(key, json.dumps(self.get(key)))
+                           for key in keys if key in self])
+            removed = [key for key in keys if key not in self]
+            if self._partial:
+                removed.append(META_FIELD)
+            elif values or removed:
+                values[META_FIELD] = self._encode_metadata()
+            if values:
+                pipeline.hmset(self._key, values)
+                count += 1
+            if removed:
+                pipeline.hdel(self._key, *removed)
+                unchecked.add(count)
+                count += 1
+        else:
+            keys = set(self.dirty_keys)
+            pipeline.set(self._key, self._encode())
+            pipeline.set(self._meta_key, self._encode_metadata())
+            count += 2
+            if self._ttl:
+                pipeline.expire(self._meta_key, self._ttl)
+                count += 1
         if self._ttl:
             pipeline.expire(self._key, self._ttl)
-        result = yield gen.Task(pipeline.execute)
-        self._dirty, self._saved = not all(result), all(result)
-        raise gen.Return(all(result))
+            count += 1
+        count += self._pipeline_index(pipeline)
+        if self._cache_ttl:
+            pipeline.publish(MODEL_CACHE.CHANNEL,
+                             MODEL_CACHE.invalidation_message(self._key))
+            count += 1
+        return count, keys, unchecked
+
+    def _pipeline_index(self, pipeline):
+        """Add the commands to update the secondary indexes of the changed
+        indexed attributes to the pipeline, returning the number of commands
+        that were added. Models are removed from an index when the attribute
+        value is None.
+
+        :param tornadoredis.client.Pipeline pipeline: The pipeline to add to
+        :rtype: int
+        :raises: ValueError
+
+        """
+        count = 0
+        for field in self._changed_indexes():
+            value = self.get(field)
+            if self._indexes[field] == INDEX_RANGE:
+                if value is None:
+                    pipeline.zrem(self._index_key(field), self.id)
+                else:
+                    pipeline.zadd(self._index_key(field), float(value),
+                                  self.id)
+                count += 1
+                continue
+            previous = self._indexed_value(field)
+            if previous is not None and previous != value:
+                pipeline.zrem(self._index_key(field, previous), self.id)
+                count += 1
+            if value is not None:
+                pipeline.zadd(self._index_key(field, value),
+                              self.created_at or 0, self.id)
+                count += 1
+        return count
+
+
+class SQLiteModel(StorageModel):
+    """A model base class that uses a SQLite database for the storage
+    backend, for single node deployments that need durable models without
+    running Redis. Models are stored as serialized values in a models table
+    keyed by the class name and id. Assign a tinman.serializers.Serializer
+    instance to the _codec attribute to store them in a format other than
+    JSON.
+
+    The database filename is passed in as the database kwarg or assigned to
+    the _database attribute, which can be set in the models section of the
+    application configuration::
+
+        models:
+          myapp.models.Widget:
+            database: /var/lib/myapp/models.db
+
+    The database is shared by the models using it in a process, with reads
+    running in a thread pool and writes batched into transactions by a
+    writer thread. See tinman.sqlite.Database.
+
+    :param str item_id: The id for the data item
+    :param str database: The database filename
+
+    """
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS models ('
+              'class TEXT NOT NULL, id TEXT NOT NULL, value BLOB NOT NULL, '
+              'PRIMARY KEY (class, id))',)
+    STATE_ATTRIBUTES = ('_store',)
+
+    # The database filename
+    _database = None
+
+    def __init__(self, item_id=None, **kwargs):
+        filename = kwargs.pop('database', None) or self._database
+        if not filename:
+            raise ValueError('database must be passed in or assigned to '
+                             '_database')
+        self._store = sqlite.get(filename)
+        self._store.schema(self.SCHEMA)
+        super(SQLiteModel, self).__init__(item_id, **kwargs)
+
+    @gen.coroutine
+    def delete(self):
+        """Delete the item from storage
+
+        :rtype: bool
+
+        """
+        result = yield self._store.write(
+            'DELETE FROM models WHERE class = ? AND id = ?',
+            (self.__class__.__name__, self.id))
+        raise gen.Return(bool(result))
+
+    @gen.coroutine
+    def fetch(self):
+        """Fetch the data for the model from the database and assign the
+        values, returning False if it is not stored.
+
+        :rtype: bool
+
+        """
+        rows = yield self._store.read(
+            'SELECT value FROM models WHERE class = ? AND id = ?',
+            (self.__class__.__name__, self.id))
+        if not rows:
+            raise gen.Return(False)
+        self.loads(str(rows[0][0]))
+        self._mark_clean()
+        self._new = False
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def save(self):
+        """Store the model in the database.
+
+        :rtype: bool
+
+        """
+        if self.dirty and not self._new:
+            self.last_updated_at = int(time.time())
+        yield self._store.write(
+            'INSERT OR REPLACE INTO models (class, id, value) '
+            'VALUES (?, ?, ?)',
+            (self.__class__.__name__, self.id, sqlite.blob(self.dumps())))
+        self._mark_clean()
+        self._new = False
+        raise gen.Return(True)
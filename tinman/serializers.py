@@ -1,6 +1,11 @@
 """
 Tinman data serializers for use with sessions and other data objects.
 
+Serializers are configured by name in the session adapter and model settings,
+using the names in SERIALIZERS. The detect function returns the format of a
+serialized value so that values written in another format can still be read
+after the serializer for a store is changed.
+
 """
 import datetime
 import json
@@ -17,6 +22,8 @@ class Serializer(object):
     implement the serialize and deserialize methods.
 
     """
+    FORMAT = None
+
     def deserialize(self, data):
         """Return the deserialized data.
 
@@ -57,6 +64,8 @@ class Serializer(object):
 
 class Pickle(Serializer):
     """Serializes the data in Pickle format"""
+    FORMAT = 'pickle'
+
     def deserialize(self, data):
         """Return the deserialized data.
 
@@ -80,6 +89,8 @@ class Pickle(Serializer):
 
 class JSON(Serializer):
     """Serializes the data in JSON format"""
+    FORMAT = 'json'
+
     def deserialize(self, data):
         """Return the deserialized data.
 
@@ -101,6 +112,7 @@ class JSON(Serializer):
 
 class MsgPack(Serializer):
     """Serializes the data in msgpack format"""
+    FORMAT = 'msgpack'
 
     def deserialize(self, data):
         """Return the deserialized data.
@@ -119,3 +131,53 @@ class MsgPack(Serializer):
 
         """
         return msgpack.dumps(self._serialize_datetime(data))
+
+
+# The serializer classes by the name used to configure them
+SERIALIZERS = {JSON.FORMAT: JSON,
+               MsgPack.FORMAT: MsgPack,
+               Pickle.FORMAT: Pickle}
+
+# The leading bytes of pickled values: protocol 0 and 1 dicts, and the
+# protocol 2+ header
+_PICKLE_PREFIXES = ('(', '}', '\x80\x02', '\x80\x03', '\x80\x04',
+                    '\x80\x05')
+
+_instances = dict()
+
+
+def detect(data):
+    """Return the format of the serialized mapping, or None if it is not
+    recognized. Only serialized dicts are detected.
+
+    :param str data: The serialized data
+    :rtype: str
+
+    """
+    if not data:
+        return None
+    if data.lstrip()[:1] == '{':
+        return JSON.FORMAT
+    if data.startswith(_PICKLE_PREFIXES):
+        return Pickle.FORMAT
+    first = ord(data[0])
+    if 0x80 <= first <= 0x8f or first in (0xde, 0xdf):
+        return MsgPack.FORMAT
+    return None
+
+
+def get(name):
+    """Return the shared serializer instance for the serializer name.
+
+    :param str name: The serializer name
+    :rtype: Serializer
+    :raises: ValueError
+
+    """
+    if name not in SERIALIZERS:
+        raise ValueError('Unknown serializer: %s' % name)
+    if name == MsgPack.FORMAT and msgpack is None:
+        raise ValueError('The msgpack serializer requires msgpack')
+    if name not in _instances:
+        _instances[name] = SERIALIZERS[name]()
+    return _instances[name]
@@ -2,17 +2,32 @@
 Tinman session classes for the management of session data
 
 """
+import collections
+from tornado import concurrent
+import datetime
+import errno
+from tornado import escape
+import fcntl
 from tornado import gen
+import heapq
+from tornado import ioloop
 import logging
+import mmap
 import os
 from os import path
+import stat
+import struct
+import sys
 import tempfile
 import time
 import uuid
+import zlib
 
 from tinman import config
 from tinman import exceptions
 from tinman import mapping
+from tinman import serializers
+from tinman import sqlite
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,7 +36,17 @@ class Session(mapping.Mapping):
     """Session provides a base interface for session management and should be
     extended by storage objects that are used by the SessionHandlerMixin.
 
+    Every adapter accepts a serializer setting naming the tinman.serializers
+    serializer used to store the session data (json, msgpack or pickle),
+    defaulting to JSON. Stored sessions are read in whatever format they were
+    written in, so the serializer may be changed without losing sessions.
+
     """
+    # Set when the session is stored in the response and must be saved
+    # before the request handler sends it
+    SAVE_BEFORE_FINISH = False
+    STATE_ATTRIBUTES = ('_codec', '_duration', '_settings')
+
     id = None
     ip_address = None
     last_request_at = None
@@ -38,6 +63,14 @@ class Session(mapping.Mapping):
         super(Session, self).__init__()
         self._duration = duration
         self._settings = settings or dict()
+        if self._settings.get(config.SERIALIZER):
+            try:
+                self._codec = serializers.get(
+                    self._settings[config.SERIALIZER])
+            except ValueError as error:
+                LOGGER.error('Invalid session serializer: %s', error)
+                raise exceptions.ConfigurationException(
+                    self.__class__.__name__, config.SERIALIZER)
         self.id = session_id or str(uuid.uuid4())
 
     def fetch(self):
@@ -64,6 +97,245 @@ class Session(mapping.Mapping):
         """
         raise NotImplementedError
 
+    def touch(self):
+        """Store the last_request_* values and refresh the expiration of the
+        session when no other values have changed. Saves the session unless
+        extended with a cheaper operation for the storage backend.
+
+        :rtype: tornado.concurrent.Future
+
+        """
+        return self.save()
+
+    def touched_at(self):
+        """Return the time the stored session was last saved or touched, as
+        far as it is known from the fetched session values.
+
+        :rtype: int|float
+
+        """
+        return self.last_request_at or 0
+
+
+class SessionSweeper(object):
+    """Removes expired session files from a session storage directory in a
+    periodic IOLoop callback, so that the cost of expiring sessions does not
+    fall on the requests that use them.
+
+    The sweeper keeps a heap of session files ordered by the time they
+    expire. Sessions saved in this process are added as they are saved, and
+    the storage directory and its shard directories are listed once per
+    session duration to add the sessions saved by other processes. The
+    listing is spread over the sweeps: each callback lists at most
+    batch_size directories, stats at most batch_size of the listed paths and
+    removes at most batch_size expired files, re-checking the modification
+    time of each before removing it.
+
+    When an executor is passed in, the directory listings, stats and
+    removals run in it instead of blocking the IOLoop.
+
+    :param str storage_dir: The session storage directory
+    :param int duration: The number of seconds a session lasts
+    :param int interval: The number of seconds between sweeps
+    :param int batch_size: The maximum number of directories to list, paths
+        to stat and files to remove per sweep
+    :param concurrent.futures.Executor executor: The executor for file I/O
+
+    """
+    BATCH_SIZE = 1000
+    INTERVAL = 60
+
+    def __init__(self, storage_dir, duration, interval=None, batch_size=None,
+                 executor=None):
+        self.storage_dir = storage_dir
+        self.duration = duration
+        self.interval = interval or self.INTERVAL
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.removed = 0
+        self._directories = collections.deque()
+        self._expires = dict()
+        self._heap = list()
+        self._listed_at = None
+        self._executor = executor
+        self._pending = collections.deque()
+        self._periodic = None
+        self._sweeping = False
+
+    def add(self, file_path, expires_at):
+        """Add or update the expiration time of the session file.
+
+        :param str file_path: The session file path
+        :param float expires_at: The time the session expires at
+
+        """
+        self._expires[file_path] = expires_at
+        heapq.heappush(self._heap, (expires_at, file_path))
+
+    def start(self):
+        """Start sweeping the storage directory in the current IOLoop."""
+        if self._periodic:
+            return
+        LOGGER.debug('Sweeping %s every %i seconds',
+                     self.storage_dir, self.interval)
+        self._periodic = ioloop.PeriodicCallback(self.sweep,
+                                                 self.interval * 1000)
+        self._periodic.start()
+
+    def stop(self):
+        """Stop sweeping the storage directory."""
+        if self._periodic:
+            self._periodic.stop()
+            self._periodic = None
+
+    @gen.coroutine
+    def sweep(self):
+        """Continue listing the storage directory, add a batch of the listed
+        session files to the heap and remove a batch of the expired session
+        files. A new listing is started once the previous one has finished,
+        if it was not started in the last session duration. A sweep is
+        skipped if the previous one is still waiting for the executor.
+
+        """
+        if self._sweeping:
+            return
+        self._sweeping = True
+        try:
+            now = time.time()
+            if (not self._directories and not self._pending and
+                    (self._listed_at is None or
+                     self._listed_at + self.duration <= now)):
+                self._directories.append(self.storage_dir)
+                self._listed_at = now
+            if self._directories:
+                yield self._run(self._list)
+            batch = [file_path for file_path in
+                     [self._pending.popleft()
+                      for _offset in range(min(len(self._pending),
+                                               self.batch_size))]
+                     if file_path not in self._expires]
+            if batch:
+                self._add_listed((yield self._run(self._stat, batch)))
+            expired = self._expired(now)
+            if expired:
+                removed, resaved = yield self._run(self._remove, expired,
+                                                   now)
+                for file_path, expires_at in resaved:
+                    if file_path not in self._expires:
+                        self.add(file_path, expires_at)
+                self.removed += removed
+        finally:
+            self._sweeping = False
+
+    def _add_listed(self, entries):
+        """Add the listed session files to the heap and the listed shard
+        directories to the directories to list.
+
+        :param list entries: The (path, expires_at, is_dir) tuples
+
+        """
+        for file_path, expires_at, is_dir in entries:
+            if is_dir:
+                self._directories.append(file_path)
+            elif file_path not in self._expires:
+                self.add(file_path, expires_at)
+
+    def _expired(self, now):
+        """Pop at most batch_size expired session files from the heap,
+        skipping the entries that were replaced when a file was added again.
+
+        :param float now: The current time
+        :rtype: list
+
+        """
+        expired = list()
+        while (self._heap and self._heap[0][0] <= now and
+               len(expired) < self.batch_size):
+            expires_at, file_path = heapq.heappop(self._heap)
+            if self._expires.get(file_path) != expires_at:
+                continue
+            del self._expires[file_path]
+            expired.append(file_path)
+        return expired
+
+    def _list(self):
+        """List the directories waiting to be listed, adding their entries to
+        the paths waiting to be checked, until batch_size paths are waiting
+        or batch_size directories have been listed. Invoked in the executor,
+        while the sweep that owns the queues waits for it.
+
+        """
+        listed = 0
+        while (self._directories and listed < self.batch_size and
+               len(self._pending) < self.batch_size):
+            dir_path = self._directories.popleft()
+            listed += 1
+            try:
+                names = os.listdir(dir_path)
+            except OSError as error:
+                LOGGER.debug('Could not list %s: %s', dir_path, error)
+                continue
+            self._pending.extend([path.join(dir_path, name)
+                                  for name in names])
+
+    def _remove(self, file_paths, now):
+        """Remove the session files that have expired, returning the number
+        of files removed and the (path, expires_at) tuples of the files that
+        were saved again since they were added. Invoked in the executor.
+
+        :param list file_paths: The expired session file paths
+        :param float now: The current time
+        :rtype: tuple(int, list)
+
+        """
+        removed, resaved = 0, list()
+        for file_path in file_paths:
+            try:
+                expires_at = os.stat(file_path).st_mtime + self.duration
+            except OSError:
+                continue
+            if expires_at > now:
+                resaved.append((file_path, expires_at))
+                continue
+            LOGGER.debug('Removing stale file: %s', file_path)
+            try:
+                os.unlink(file_path)
+            except OSError as error:
+                LOGGER.debug('Could not remove %s: %s', file_path, error)
+                continue
+            removed += 1
+        return removed, resaved
+
+    def _run(self, method, *args):
+        """Run the method in the executor, or directly if the sweeper has no
+        executor, returning a future for its result.
+
+        :param method method: The method to run
+        :rtype: concurrent.futures.Future|tornado.concurrent.Future
+
+        """
+        if self._executor:
+            return self._executor.submit(method, *args)
+        return gen.maybe_future(method(*args))
+
+    def _stat(self, paths):
+        """Return a (path, expires_at, is_dir) tuple for each of the listed
+        paths that still exists, based upon the time it was last written.
+        Invoked in the executor.
+
+        :param list paths: The listed paths
+        :rtype: list
+
+        """
+        entries = list()
+        for file_path in paths:
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((file_path, file_stat.st_mtime + self.duration,
+                            stat.S_ISDIR(file_stat.st_mode)))
+        return entries
+
 
 class FileSession(Session):
     """Session data is stored on disk using the FileSession object.
@@ -75,13 +347,38 @@ class FileSession(Session):
             adapter:
               name: file
               cleanup: false
+              cleanup_interval: 60
               directory: /tmp/sessions
             cookie:
               name: session
               duration: 3600
 
+    Unless cleanup is false, expired session files are removed by a
+    SessionSweeper running in the IOLoop, checking every cleanup_interval
+    seconds.
+
+    Session files are stored in shard directories named by the leading
+    characters of the session id, so /tmp/sessions/3f/a2/3fa2... for the
+    default SHARD_DEPTH and SHARD_WIDTH. Files are written to a temporary
+    file and renamed into place, so a session is never read partially
+    written. The file I/O, including the listings, stats and removals of the
+    SessionSweeper, runs in a thread pool shared by all FileSession instances
+    in the process, sized by the io_threads adapter setting, so that a slow
+    disk does not block the IOLoop. The thread pool requires the futures
+    package under Python 2.
+
     """
     DEFAULT_SUBDIR = 'tinman'
+    IO_THREADS = 4
+    SHARD_DEPTH = 2
+    SHARD_WIDTH = 2
+    STATE_ATTRIBUTES = ('_storage_dir',)
+
+    # The thread pool used for session file I/O
+    _executor = None
+
+    # The SessionSweeper for each storage directory
+    _sweepers = dict()
 
     def __init__(self, session_id=None, duration=None, settings=None):
         """Create a new session instance. If no id is passed in, a new ID is
@@ -93,49 +390,56 @@ class FileSession(Session):
         """
         super(FileSession, self).__init__(session_id, duration, settings)
         self._storage_dir = self._setup_storage_dir()
-        if settings.get('cleanup', True):
-            self._cleanup()
+        if (self._settings.get(config.CLEANUP, True) and
+                self._storage_dir not in self._sweepers):
+            self._start_sweeper()
 
+    @gen.coroutine
     def fetch(self):
-        """Fetch the contents of the session from storage.
+        """Fetch the contents of the session from storage, returning False
+        if there is no stored session. Sessions stored by earlier versions
+        directly in the storage directory are read if there is no session
+        file in the shard directory.
 
-        :raises: NotImplementedError
+        :rtype: bool
+        :raises: IOError
 
         """
-        raise NotImplementedError
+        value = yield self._run(self._read)
+        if value is None:
+            raise gen.Return(False)
+        self.loads(value)
+        self._mark_clean()
+        raise gen.Return(True)
 
+    @gen.coroutine
     def delete(self):
-        """Extend to the delete the session from storage
+        """Delete the session from storage
+
+        :rtype: bool
 
         """
+        result = yield self._run(self._unlink)
         self.clear()
-        if os.path.isfile(self._filename):
-            os.unlink(self._filename)
-        else:
-            LOGGER.debug('Session file did not exist: %s', self._filename)
+        raise gen.Return(result)
 
+    @gen.coroutine
     def save(self):
         """Save the session for later retrieval
 
+        :rtype: bool
         :raises: IOError
 
         """
         try:
-            with open(self._filename, 'wb') as session_file:
-                session_file.write(self.dumps())
-        except IOError as error:
+            yield self._run(self._write, self.dumps())
+        except (IOError, OSError) as error:
             LOGGER.error('Session file error: %s', error)
             raise error
-
-    def _cleanup(self):
-        """Remove any stale files from the session storage directory"""
-        for filename in os.listdir(self._storage_dir):
-            file_path = path.join(self._storage_dir, filename)
-            file_stat = os.stat(file_path)
-            evaluate = max(file_stat.st_ctime, file_stat.st_mtime)
-            if evaluate + self._duration < time.time():
-                LOGGER.debug('Removing stale file: %s', file_path)
-                os.unlink(file_path)
+        sweeper = self._sweepers.get(self._storage_dir)
+        if sweeper:
+            sweeper.add(self._filename, time.time() + self._duration)
+        raise gen.Return(True)
 
     @property
     def _default_path(self):
@@ -152,9 +456,123 @@ class FileSession(Session):
 
         :rtype: str
 
+        """
+        return path.join(self._shard_dir, self.id)
+
+    @property
+    def _legacy_filename(self):
+        """Returns the filename for the session file in the storage directory,
+        where sessions were stored before shard directories were used.
+
+        :rtype: str
+
         """
         return path.join(self._storage_dir, self.id)
 
+    def _io_executor(self):
+        """Return the session file I/O thread pool, creating it if it has
+        not been created in this process.
+
+        :rtype: concurrent.futures.ThreadPoolExecutor
+
+        """
+        if FileSession._executor is None:
+            if 'futures' not in globals():
+                from concurrent import futures
+            FileSession._executor = futures.ThreadPoolExecutor(
+                self._settings.get(config.IO_THREADS, self.IO_THREADS))
+        return FileSession._executor
+
+    def _read(self):
+        """Return the stored session value or None if there is no session
+        file. Invoked in the thread pool.
+
+        :rtype: str
+        :raises: IOError
+
+        """
+        for filename in [self._filename, self._legacy_filename]:
+            try:
+                with open(filename, 'rb') as session_file:
+                    return session_file.read()
+            except IOError as error:
+                if error.errno != errno.ENOENT:
+                    raise
+        return None
+
+    def _run(self, method, *args):
+        """Run the method in the session file I/O thread pool, returning a
+        future for its result.
+
+        :param method method: The method to run
+        :rtype: concurrent.futures.Future
+
+        """
+        return self._io_executor().submit(method, *args)
+
+    @property
+    def _shard_dir(self):
+        """Return the shard directory for the session id.
+
+        :rtype: str
+
+        """
+        shards = [self.id[offset:offset + self.SHARD_WIDTH]
+                  for offset in range(0, self.SHARD_DEPTH * self.SHARD_WIDTH,
+                                      self.SHARD_WIDTH)]
+        return path.join(self._storage_dir, *[shard for shard in shards
+                                              if shard])
+
+    def _unlink(self):
+        """Remove the session file, returning False if it did not exist.
+        Invoked in the thread pool.
+
+        :rtype: bool
+
+        """
+        removed = False
+        for filename in [self._filename, self._legacy_filename]:
+            try:
+                os.unlink(filename)
+                removed = True
+            except OSError as error:
+                if error.errno != errno.ENOENT:
+                    raise
+        if not removed:
+            LOGGER.debug('Session file did not exist: %s', self._filename)
+        return removed
+
+    def _write(self, value):
+        """Write the session value to a temporary file in the shard directory
+        and rename it to the session filename. Invoked in the thread pool.
+
+        :param str value: The serialized session
+        :raises: IOError, OSError
+
+        """
+        shard_dir = self._shard_dir
+        try:
+            os.makedirs(shard_dir, 0o755)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        handle, temp_path = tempfile.mkstemp(dir=shard_dir, prefix='.')
+        try:
+            with os.fdopen(handle, 'wb') as session_file:
+                session_file.write(value)
+            os.rename(temp_path, self._filename)
+        except (IOError, OSError):
+            os.unlink(temp_path)
+            raise
+
+    def _start_sweeper(self):
+        """Create and start the SessionSweeper for the storage directory."""
+        sweeper = SessionSweeper(self._storage_dir, self._duration,
+                                 self._settings.get(config.CLEANUP_INTERVAL),
+                                 executor=self._io_executor())
+        self._sweepers[self._storage_dir] = sweeper
+        sweeper.start()
+
     @staticmethod
     def _make_path(dir_path):
         """Create the full path specified.
@@ -184,6 +602,825 @@ class FileSession(Session):
         return dir_path.rstrip('/')
 
 
+class SessionLog(object):
+    """An append-only session log file with an in-memory index of the offset
+    of the current value of each session. The file is memory mapped, so
+    reading a session is a dictionary lookup and a slice of the map.
+
+    Each record is a header with the CRC32 of the rest of the record, the
+    length of the session id, the length of the value and the time the
+    session expires at, followed by the session id and the value. A record
+    with an empty value removes the session. When the log is opened, the
+    records are replayed to build the index and any partially written record
+    left by a crash is truncated.
+
+    Several processes can share the log file. Records are appended with
+    O_APPEND while holding an exclusive lock, after truncating any partially
+    written record left at the end of the log by a failed write, and each
+    process replays the records appended by the others before reading. compact() rewrites the
+    log with only the current, unexpired sessions while holding an exclusive
+    lock and renames it into place, and the other processes reopen the log
+    when they see the file has been replaced.
+
+    :param str filename: The path to the log file
+
+    """
+    COMPACT_MIN_BYTES = 1048576
+    HEADER = struct.Struct('!IHId')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._fd = None
+        self._periodic = None
+        self._open()
+
+    def __len__(self):
+        """Return the number of sessions in the index.
+
+        :rtype: int
+
+        """
+        return len(self._index)
+
+    def close(self):
+        """Stop compacting and close the log file."""
+        if self._periodic:
+            self._periodic.stop()
+            self._periodic = None
+        self._close()
+
+    def compact(self):
+        """Rewrite the log with only the current unexpired sessions."""
+        self._lock(fcntl.LOCK_EX)
+        try:
+            self._replay()
+            now = time.time()
+            handle, temp_path = tempfile.mkstemp(
+                dir=path.dirname(self.filename) or '.',
+                prefix='.%s' % path.basename(self.filename))
+            with os.fdopen(handle, 'wb') as log_file:
+                for session_id, entry in self._index.items():
+                    if entry[2] > now:
+                        log_file.write(self._record(
+                            session_id,
+                            self._map[entry[0]:entry[0] + entry[1]],
+                            entry[2]))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            os.rename(temp_path, self.filename)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        LOGGER.debug('Compacted %s', self.filename)
+        self._close()
+        self._open()
+
+    def compact_if_needed(self):
+        """Compact the log if the space used by replaced, removed and expired
+        sessions is larger than COMPACT_MIN_BYTES and the space used by the
+        current sessions.
+
+        :rtype: bool
+
+        """
+        self._sync()
+        now = time.time()
+        expired = sum([entry[3] for entry in self._index.values()
+                       if entry[2] <= now])
+        garbage = self._garbage + expired
+        if (garbage < self.COMPACT_MIN_BYTES or
+                garbage < self._end - garbage):
+            return False
+        self.compact()
+        return True
+
+    def delete(self, session_id):
+        """Remove the session from the log.
+
+        :param str session_id: The session id
+
+        """
+        self._append(self._record(session_id, '', 0))
+
+    def get(self, session_id):
+        """Return the stored value for the session, or None if it is not in
+        the log or has expired.
+
+        :param str session_id: The session id
+        :rtype: str
+
+        """
+        self._sync()
+        entry = self._index.get(escape.utf8(session_id))
+        if entry is None or entry[2] <= time.time():
+            return None
+        return self._map[entry[0]:entry[0] + entry[1]]
+
+    def set(self, session_id, value, expires_at):
+        """Append the session value to the log.
+
+        :param str session_id: The session id
+        :param str value: The serialized session
+        :param float expires_at: The time the session expires at
+
+        """
+        self._append(self._record(session_id, value, expires_at))
+
+    def start(self, interval):
+        """Check if the log needs to be compacted every interval seconds in
+        the current IOLoop.
+
+        :param int interval: The number of seconds between checks
+
+        """
+        if not self._periodic:
+            self._periodic = ioloop.PeriodicCallback(self.compact_if_needed,
+                                                     interval * 1000)
+            self._periodic.start()
+
+    def _append(self, record):
+        """Append the record to the log, holding an exclusive lock on a log
+        file that has not been replaced by compaction, and add it to the
+        index. A partially written record at the end of the log would hide
+        the records appended after it, so it is truncated first, and the
+        record is removed again if it can not be written completely.
+
+        :param str record: The record to append
+        :raises: OSError
+
+        """
+        self._lock(fcntl.LOCK_EX)
+        try:
+            self._replay()
+            self._truncate()
+            try:
+                while record:
+                    record = record[os.write(self._fd, record):]
+            except OSError:
+                self._truncate()
+                raise
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._replay()
+
+    def _close(self):
+        """Close the memory map and log file."""
+        if self._map:
+            self._map.close()
+        os.close(self._fd)
+        self._fd = None
+
+    def _lock(self, operation):
+        """Lock the log file, reopening it first if it has been replaced by
+        compaction.
+
+        :param int operation: The fcntl.flock lock operation
+
+        """
+        while True:
+            fcntl.flock(self._fd, operation)
+            if not self._replaced():
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._close()
+            self._open()
+
+    def _open(self):
+        """Open the log file, replaying it to build the index and truncating
+        any partially written record at the end of it.
+
+        """
+        self._fd = os.open(self.filename,
+                           os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        self._inode = os.fstat(self._fd).st_ino
+        self._index = dict()
+        self._end = 0
+        self._garbage = 0
+        self._map = None
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._replay()
+            self._truncate()
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        LOGGER.debug('Opened %s with %i sessions', self.filename,
+                     len(self._index))
+
+    def _record(self, session_id, value, expires_at):
+        """Return the log record for the session value.
+
+        :param str session_id: The session id
+        :param str value: The serialized session
+        :param float expires_at: The time the session expires at
+        :rtype: str
+
+        """
+        session_id, value = escape.utf8(session_id), escape.utf8(value)
+        body = (self.HEADER.pack(0, len(session_id), len(value),
+                                 expires_at)[4:] + session_id + value)
+        return struct.pack('!I', zlib.crc32(body) & 0xffffffff) + body
+
+    def _replaced(self):
+        """Return True if the log file has been replaced by compaction.
+
+        :rtype: bool
+
+        """
+        try:
+            return os.stat(self.filename).st_ino != self._inode
+        except OSError:
+            return True
+
+    def _replay(self):
+        """Add the records appended since the log was last replayed to the
+        index, stopping at the first incomplete or corrupt record.
+
+        """
+        size = os.fstat(self._fd).st_size
+        if size <= self._end:
+            return
+        if self._map is None or len(self._map) < size:
+            if self._map:
+                self._map.close()
+            self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        offset = self._end
+        while offset + self.HEADER.size <= size:
+            crc, id_length, length, expires_at = self.HEADER.unpack_from(
+                self._map, offset)
+            start = offset + self.HEADER.size
+            end = start + id_length + length
+            if end > size or (zlib.crc32(self._map[offset + 4:end]) &
+                              0xffffffff) != crc:
+                break
+            session_id = self._map[start:start + id_length]
+            previous = self._index.pop(session_id, None)
+            if previous:
+                self._garbage += previous[3]
+            if length:
+                self._index[session_id] = (start + id_length, length,
+                                           expires_at, end - offset)
+            else:
+                self._garbage += end - offset
+            offset = end
+        self._end = offset
+
+    def _truncate(self):
+        """Truncate any incomplete or corrupt records after the last record
+        that was replayed. Invoked while holding an exclusive lock.
+
+        """
+        size = os.fstat(self._fd).st_size
+        if size > self._end:
+            LOGGER.warning('Truncating %i bytes of incomplete records from '
+                           '%s', size - self._end, self.filename)
+            os.ftruncate(self._fd, self._end)
+
+    def _sync(self):
+        """Reopen the log if it has been compacted by another process and add
+        the records appended by other processes to the index.
+
+        """
+        if self._replaced():
+            self._close()
+            self._open()
+        else:
+            self._replay()
+
+
+class LogSession(Session):
+    """Session data is stored in a single append-only log file that is
+    memory mapped and indexed in memory, using the SessionLog object. This
+    avoids the per-session files of FileSession and reads do not touch the
+    disk. The log is compacted when more than half of it is made up of
+    replaced, removed or expired sessions, checking every compact_interval
+    seconds.
+
+    Configuration in the application settings is as follows::
+
+        Application:
+          session:
+            adapter:
+              name: log
+              filename: /tmp/tinman-sessions.log
+              compact_interval: 300
+            cookie:
+              name: session
+              duration: 3600
+
+    """
+    COMPACT_INTERVAL = 300
+    DEFAULT_FILENAME = 'tinman-sessions.log'
+    STATE_ATTRIBUTES = ('_log',)
+
+    # The SessionLog for each log filename
+    _logs = dict()
+
+    def __init__(self, session_id=None, duration=None, settings=None):
+        """Create a new session instance. If no id is passed in, a new ID is
+        created.
+
+        :param str session_id: The session ID
+        :param int duration: The number of seconds the session lasts
+        :param dict settings: Session object configuration
+
+        """
+        super(LogSession, self).__init__(session_id, duration, settings)
+        filename = path.abspath(self._settings.get(
+            config.FILENAME,
+            path.join(tempfile.gettempdir(), self.DEFAULT_FILENAME)))
+        if filename not in self._logs:
+            self._logs[filename] = SessionLog(filename)
+            self._logs[filename].start(
+                self._settings.get(config.COMPACT_INTERVAL,
+                                   self.COMPACT_INTERVAL))
+        self._log = self._logs[filename]
+
+    @gen.coroutine
+    def delete(self):
+        """Delete the session from storage
+
+        :rtype: bool
+
+        """
+        self._log.delete(self.id)
+        self.clear()
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def fetch(self):
+        """Fetch the contents of the session from storage, returning False
+        if there is no stored session.
+
+        :rtype: bool
+
+        """
+        value = self._log.get(self.id)
+        if value is None:
+            raise gen.Return(False)
+        self.loads(value)
+        self._mark_clean()
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def save(self):
+        """Save the session for later retrieval
+
+        :rtype: bool
+
+        """
+        self._log.set(self.id, self.dumps(), time.time() + self._duration)
+        raise gen.Return(True)
+
+
+class SQLiteSession(Session):
+    """Session data is stored in a SQLite database in WAL mode, for single
+    node deployments that need durable sessions without running Redis. The
+    database is shared by the SQLiteSession instances in a process, with
+    reads running in a pool of io_threads threads and writes batched into
+    transactions by a writer thread, so the IOLoop is not blocked.
+
+    Configuration in the application settings is as follows::
+
+        Application:
+          session:
+            adapter:
+              name: sqlite
+              filename: /tmp/tinman-sessions.db
+              batch_size: 100
+              cleanup: true
+              cleanup_interval: 60
+              io_threads: 4
+              sliding: true
+            cookie:
+              name: session
+              duration: 3600
+
+    Each session is stored with the time it expires at, which is indexed so
+    that expired sessions are removed in a single statement every
+    cleanup_interval seconds unless cleanup is false. As with RedisSession,
+    touching a session with sliding expiry updates its expiry time without
+    rewriting it.
+
+    """
+    CLEANUP_INTERVAL = 60
+    DEFAULT_FILENAME = 'tinman-sessions.db'
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS sessions ('
+              'id TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)',
+              'CREATE INDEX IF NOT EXISTS sessions_expires_at '
+              'ON sessions (expires_at)')
+    STATE_ATTRIBUTES = ('_database', '_expires_at')
+
+    _expires_at = None
+
+    # The cleanup PeriodicCallback for each database filename
+    _cleanups = dict()
+
+    def __init__(self, session_id=None, duration=None, settings=None):
+        """Create a new session instance. If no id is passed in, a new ID is
+        created.
+
+        :param str session_id: The session ID
+        :param int duration: The number of seconds the session lasts
+        :param dict settings: Session object configuration
+
+        """
+        super(SQLiteSession, self).__init__(session_id, duration, settings)
+        filename = path.abspath(self._settings.get(
+            config.FILENAME,
+            path.join(tempfile.gettempdir(), self.DEFAULT_FILENAME)))
+        self._database = sqlite.get(filename,
+                                    self._settings.get(config.IO_THREADS),
+                                    self._settings.get(config.BATCH_SIZE))
+        self._database.schema(self.SCHEMA)
+        if (self._settings.get(config.CLEANUP, True) and
+                filename not in self._cleanups):
+            self._start_cleanup(filename)
+
+    @gen.coroutine
+    def delete(self):
+        """Delete the session from storage
+
+        :rtype: bool
+
+        """
+        result = yield self._database.write('DELETE FROM sessions '
+                                            'WHERE id = ?', (self.id,))
+        self.clear()
+        raise gen.Return(bool(result))
+
+    @gen.coroutine
+    def fetch(self):
+        """Fetch the contents of the session from storage, returning False
+        if there is no unexpired stored session.
+
+        :rtype: bool
+
+        """
+        rows = yield self._database.read(
+            'SELECT value, expires_at FROM sessions WHERE id = ? AND '
+            '(expires_at IS NULL OR expires_at > ?)', (self.id, time.time()))
+        if not rows:
+            raise gen.Return(False)
+        self.loads(str(rows[0][0]))
+        self._expires_at = rows[0][1]
+        self._mark_clean()
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def save(self):
+        """Save the session for later retrieval
+
+        :rtype: bool
+
+        """
+        self._expires_at = self._expiration()
+        yield self._database.write(
+            'INSERT OR REPLACE INTO sessions (id, value, expires_at) '
+            'VALUES (?, ?, ?)',
+            (self.id, sqlite.blob(self.dumps()), self._expires_at))
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def touch(self):
+        """Update the expiry time of the stored session when using sliding
+        expiry, without rewriting it.
+
+        :rtype: bool
+
+        """
+        if not self._duration or not self._settings.get(config.SLIDING,
+                                                        True):
+            raise gen.Return(True)
+        self._expires_at = self._expiration()
+        result = yield self._database.write(
+            'UPDATE sessions SET expires_at = ? WHERE id = ?',
+            (self._expires_at, self.id))
+        raise gen.Return(bool(result))
+
+    def touched_at(self):
+        """Return the time the stored session was last saved or touched,
+        calculated from the time it expires at.
+
+        :rtype: int|float
+
+        """
+        if self._expires_at and self._duration:
+            return max(self._expires_at - self._duration,
+                       super(SQLiteSession, self).touched_at())
+        return super(SQLiteSession, self).touched_at()
+
+    def _expiration(self):
+        """Return the time the session expires at if it is saved or touched
+        now, or None if it does not expire.
+
+        :rtype: float
+
+        """
+        return time.time() + self._duration if self._duration else None
+
+    def _start_cleanup(self, filename):
+        """Remove the expired sessions from the database every
+        cleanup_interval seconds.
+
+        :param str filename: The database filename
+
+        """
+        database = self._database
+
+        def cleanup():
+            database.write('DELETE FROM sessions WHERE expires_at <= ?',
+                           (time.time(),))
+
+        interval = self._settings.get(config.CLEANUP_INTERVAL,
+                                      self.CLEANUP_INTERVAL)
+        self._cleanups[filename] = ioloop.PeriodicCallback(cleanup,
+                                                           interval * 1000)
+        self._cleanups[filename].start()
+
+
+class RedisPool(object):
+    """A pool of tornadoredis clients shared by the RedisSession instances in
+    a process, so that concurrent session reads and writes are spread over
+    pool_size connections instead of waiting on a single one.
+
+    Commands are sent with the client that has the fewest commands in
+    flight. A client that fails a command or a periodic PING health check is
+    taken out of the pool and reconnected with an exponential backoff, and
+    the command is retried once with another client. Commands and health
+    checks that get no reply within command_timeout seconds fail the client
+    the same way, so a half-open connection is dropped. When pipelining is
+    enabled, the commands issued in the same IOLoop iteration are sent to
+    Redis together in a single pipeline.
+
+    :param dict settings: The redis session configuration
+
+    """
+    COMMAND_TIMEOUT = 5
+    HEALTH_CHECK_INTERVAL = 30
+    MAX_RECONNECT_DELAY = 30
+    POOL_SIZE = 4
+    RECONNECT_DELAY = 0.5
+
+    def __init__(self, settings=None):
+        self.settings = settings or dict()
+        self.size = self.settings.get(config.POOL_SIZE, self.POOL_SIZE)
+        self.pipelining = self.settings.get(config.PIPELINE, False)
+        self.timeout = datetime.timedelta(
+            seconds=self.settings.get(config.COMMAND_TIMEOUT,
+                                      self.COMMAND_TIMEOUT))
+        self.health_check_interval = self.settings.get(
+            config.HEALTH_CHECK_INTERVAL, self.HEALTH_CHECK_INTERVAL)
+        self.reconnect_delay = self.settings.get(config.RECONNECT_DELAY,
+                                                 self.RECONNECT_DELAY)
+        self.reconnects = 0
+        self._attempts = [0] * self.size
+        self._clients = [None] * self.size
+        self._healthy = [False] * self.size
+        self._in_flight = [0] * self.size
+        self._pending = list()
+        self._periodic = None
+        for offset in range(self.size):
+            self._connect(offset)
+
+    def execute(self, command, *args, **kwargs):
+        """Execute the redis command, returning a future for its result.
+
+        :param str command: The tornadoredis client method name
+        :rtype: tornado.concurrent.Future
+        :raises: tinman.exceptions.ConnectionException
+
+        """
+        if not self.pipelining:
+            return self._execute(command, args, kwargs)
+        future = concurrent.Future()
+        if not self._pending:
+            ioloop.IOLoop.current().add_callback(self._flush)
+        self._pending.append((command, args, kwargs, future))
+        return future
+
+    @gen.coroutine
+    def pipeline(self, commands):
+        """Execute the commands in a single pipeline, returning a list of
+        their results, or raising the error returned for the first command
+        that failed.
+
+        :param list commands: A list of (command, arg, ...) tuples
+        :rtype: list
+        :raises: tinman.exceptions.ConnectionException
+
+        """
+        results = yield self._run([(command[0], command[1:], {})
+                                   for command in commands])
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        raise gen.Return(results)
+
+    def start(self):
+        """Start the periodic health checks in the current IOLoop."""
+        if self._periodic or not self.health_check_interval:
+            return
+        self._periodic = ioloop.PeriodicCallback(
+            self.check_health, self.health_check_interval * 1000)
+        self._periodic.start()
+
+    def stop(self):
+        """Stop the periodic health checks."""
+        if self._periodic:
+            self._periodic.stop()
+            self._periodic = None
+
+    @gen.coroutine
+    def check_health(self):
+        """PING each of the connected clients that is idle, reconnecting
+        the clients that do not respond within the command timeout.
+
+        """
+        for offset, client in enumerate(self._clients):
+            if not self._healthy[offset] or self._in_flight[offset]:
+                continue
+            try:
+                yield gen.with_timeout(self.timeout, gen.Task(client.ping))
+            except Exception as error:
+                LOGGER.warning('Redis session client %i failed its health '
+                               'check: %s', offset, error)
+                self._disconnected(offset)
+
+    def stats(self):
+        """Return the pool size, the number of connected clients, the
+        number of commands in flight and the number of reconnections.
+
+        :rtype: dict
+
+        """
+        return {'connected': self._healthy.count(True),
+                'in_flight': sum(self._in_flight),
+                'pending': len(self._pending),
+                'reconnects': self.reconnects,
+                'size': self.size}
+
+    def _connect(self, offset):
+        """Create and connect the client at the pool offset, scheduling a
+        reconnection if it can not connect.
+
+        :param int offset: The client offset in the pool
+        :rtype: bool
+
+        """
+        kwargs = {'host': self.settings.get(config.HOST,
+                                            RedisSession.REDIS_HOST),
+                  'port': self.settings.get(config.PORT,
+                                            RedisSession.REDIS_PORT),
+                  'selected_db': self.settings.get(config.DB,
+                                                   RedisSession.REDIS_DB)}
+        LOGGER.info('Connecting to %(host)s:%(port)s DB %(selected_db)s',
+                    kwargs)
+        try:
+            client = self._new_client(**kwargs)
+            client.connect()
+        except Exception as error:
+            LOGGER.warning('Could not connect redis session client %i: %s',
+                           offset, error)
+            self._schedule_reconnect(offset)
+            return False
+        if self._attempts[offset]:
+            self.reconnects += 1
+        self._attempts[offset] = 0
+        self._clients[offset] = client
+        self._healthy[offset] = True
+        return True
+
+    def _disconnected(self, offset):
+        """Take the client at the pool offset out of the pool after a
+        failure, closing its connection, and schedule its reconnection.
+
+        :param int offset: The client offset in the pool
+
+        """
+        if self._healthy[offset]:
+            self._healthy[offset] = False
+            client, self._clients[offset] = self._clients[offset], None
+            try:
+                client.disconnect()
+            except Exception as error:
+                LOGGER.debug('Error disconnecting redis session client %i: '
+                             '%s', offset, error)
+            self._schedule_reconnect(offset)
+
+    @gen.coroutine
+    def _execute(self, command, args, kwargs):
+        """Execute a single redis command, returning its result.
+
+        :param str command: The tornadoredis client method name
+        :param tuple args: The command arguments
+        :param dict kwargs: The command keyword arguments
+        :rtype: mixed
+
+        """
+        results = yield self._run([(command, args, kwargs)])
+        if isinstance(results[0], Exception):
+            raise results[0]
+        raise gen.Return(results[0])
+
+    @gen.coroutine
+    def _flush(self):
+        """Send the commands issued since the last flush in a single
+        pipeline, resolving the future of each with its result.
+
+        """
+        pending, self._pending = self._pending, list()
+        try:
+            results = yield self._run([(command, args, kwargs)
+                                       for command, args, kwargs, _future
+                                       in pending])
+        except Exception:
+            for _command, _args, _kwargs, future in pending:
+                future.set_exc_info(sys.exc_info())
+            return
+        for (_command, _args, _kwargs, future), result in zip(pending,
+                                                              results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _new_client(**kwargs):
+        """Return a new tornadoredis client for the pool.
+
+        :rtype: tornadoredis.Client
+
+        """
+        if 'tornadoredis' not in globals():
+            import tornadoredis
+        return tornadoredis.Client(**kwargs)
+
+    @gen.coroutine
+    def _run(self, commands):
+        """Execute the commands with the least busy client, pipelining them
+        if there is more than one, and retry them once with another client
+        if the client fails or does not reply within the command timeout.
+
+        :param list commands: A list of (command, args, kwargs) tuples
+        :rtype: list
+        :raises: tinman.exceptions.ConnectionException
+
+        """
+        for attempt in range(2):
+            offset = self._select()
+            client = self._clients[offset]
+            self._in_flight[offset] += 1
+            try:
+                if len(commands) == 1:
+                    command, args, kwargs = commands[0]
+                    results = [(yield gen.with_timeout(
+                        self.timeout, gen.Task(getattr(client, command),
+                                               *args, **kwargs)))]
+                else:
+                    pipeline = client.pipeline()
+                    for command, args, kwargs in commands:
+                        getattr(pipeline, command)(*args, **kwargs)
+                    results = yield gen.with_timeout(
+                        self.timeout, gen.Task(pipeline.execute))
+            except Exception as error:
+                LOGGER.warning('Redis session client %i failed: %s',
+                               offset, error)
+                self._disconnected(offset)
+                if attempt or not any(self._healthy):
+                    raise
+            else:
+                raise gen.Return(results)
+            finally:
+                self._in_flight[offset] -= 1
+
+    def _schedule_reconnect(self, offset):
+        """Schedule the reconnection of the client at the pool offset,
+        doubling the delay for each failed attempt.
+
+        :param int offset: The client offset in the pool
+
+        """
+        delay = min(self.reconnect_delay * 2 ** self._attempts[offset],
+                    self.MAX_RECONNECT_DELAY)
+        self._attempts[offset] += 1
+        LOGGER.info('Reconnecting redis session client %i in %.2f seconds',
+                    offset, delay)
+        ioloop.IOLoop.current().call_later(delay, self._connect, offset)
+
+    def _select(self):
+        """Return the offset of the connected client with the fewest
+        commands in flight.
+
+        :rtype: int
+        :raises: tinman.exceptions.ConnectionException
+
+        """
+        connected = [offset for offset in range(self.size)
+                     if self._healthy[offset]]
+        if not connected:
+            raise exceptions.ConnectionException('redis session')
+        return min(connected, key=lambda offset: self._in_flight[offset])
+
+
 class RedisSession(Session):
     """Using the RedisSession object, session data is stored in a Redis database
     using the tornadoredis client library.
@@ -197,12 +1434,38 @@ class RedisSession(Session):
               host: localhost
               port: 6379
               db: 2
+              pool_size: 4
+              pipeline: false
+              command_timeout: 5
+              sliding: true
             cookie:
               name: session
               duration: 3600
 
+    Sessions are stored with a TTL of the cookie duration, so abandoned
+    sessions are expired by Redis. Saving a session resets the TTL. With
+    sliding expiry, which is the default, touching a session also resets
+    the TTL with an EXPIRE instead of rewriting it, so the session expires
+    after duration seconds without requests. The stored last_request_*
+    values are then only updated when the session is saved. Set sliding to
+    false to only reset the TTL when the session is changed.
+
+    The sessions in a process share a RedisPool of pool_size connections,
+    which health checks the connections every health_check_interval seconds
+    and reconnects them with a backoff starting at reconnect_delay seconds.
+    A connection that does not reply within command_timeout seconds is
+    reconnected.
+    Set pipeline to true to send the commands of concurrent requests to
+    Redis in a single pipeline.
+
+    Use the tinman-session-report utility to report the number of stored
+    sessions and the distribution of their TTLs.
+
     """
-    _redis_client = None
+    KEY_PREFIX = 's:'
+    STATE_ATTRIBUTES = ('_ttl',)
+    _redis_pool = None
+    _ttl = None
     REDIS_DB = 2
     REDIS_HOST = 'localhost'
     REDIS_PORT = 6379
@@ -216,31 +1479,24 @@ class RedisSession(Session):
         :param dict config: Session object configuration
 
         """
-        if not RedisSession._redis_client:
+        if not RedisSession._redis_pool:
             RedisSession._redis_connect(settings)
         super(RedisSession, self).__init__(session_id, duration, settings)
 
     @property
     def _key(self):
-        return 's:%s' % self.id
+        return '%s%s' % (self.KEY_PREFIX, self.id)
 
     @classmethod
     def _redis_connect(cls, settings):
-        """Connect to redis and assign the client to the RedisSession class
+        """Create the connection pool and assign it to the RedisSession class
         so that it is globally available in this process.
 
         :param dict settings: The redis session configuration
 
         """
-        if 'tornadoredis' not in globals():
-            import tornadoredis
-        kwargs = {'host': settings.get('host', cls.REDIS_HOST),
-                  'port': settings.get('port', cls.REDIS_PORT),
-                  'selected_db': settings.get('db', cls.REDIS_DB)}
-        LOGGER.info('Connecting to %(host)s:%(port)s DB %(selected_db)s',
-                    kwargs)
-        cls._redis_client = tornadoredis.Client(**kwargs)
-        cls._redis_client.connect()
+        RedisSession._redis_pool = RedisPool(settings)
+        RedisSession._redis_pool.start()
 
     @gen.coroutine
     def delete(self):
@@ -249,7 +1505,7 @@ class RedisSession(Session):
         :param method callback: The callback method to invoke when done
 
         """
-        result = yield gen.Task(RedisSession._redis_client.delete, self._key)
+        result = yield RedisSession._redis_pool.execute('delete', self._key)
         LOGGER.debug('Deleted session %s (%r)', self.id, result)
         self.clear()
         raise gen.Return(result)
@@ -262,9 +1518,14 @@ class RedisSession(Session):
 
         """
         LOGGER.debug('Fetching session data: %s', self.id)
-        result = yield gen.Task(RedisSession._redis_client.get, self._key)
+        if self._duration:
+            result, self._ttl = yield RedisSession._redis_pool.pipeline(
+                [('get', self._key), ('ttl', self._key)])
+        else:
+            result = yield RedisSession._redis_pool.execute('get', self._key)
         if result:
             self.loads(result)
+            self._mark_clean()
             raise gen.Return(True)
         else:
             raise gen.Return(False)
@@ -276,7 +1537,251 @@ class RedisSession(Session):
         :param method callback: The callback method to invoke when done
 
         """
-        result = yield gen.Task(RedisSession._redis_client.set,
-                                self._key, self.dumps())
+        result = yield RedisSession._redis_pool.execute(
+            'set', self._key, self.dumps(), expire=self._duration or None)
         LOGGER.debug('Saved session %s (%r)', self.id, result)
         raise gen.Return(result)
+
+    @gen.coroutine
+    def touch(self):
+        """Reset the TTL of the stored session when using sliding expiry,
+        without rewriting it.
+
+        :rtype: bool
+
+        """
+        if not self._duration or not self._settings.get(config.SLIDING,
+                                                        True):
+            raise gen.Return(True)
+        result = yield RedisSession._redis_pool.execute(
+            'expire', self._key, self._duration)
+        LOGGER.debug('Touched session %s (%r)', self.id, result)
+        raise gen.Return(result)
+
+    def touched_at(self):
+        """Return the time the stored session was last saved or touched,
+        calculated from its TTL when it was fetched.
+
+        :rtype: int|float
+
+        """
+        if self._ttl and self._ttl > 0 and self._duration:
+            return max(time.time() - (self._duration - self._ttl),
+                       super(RedisSession, self).touched_at())
+        return super(RedisSession, self).touched_at()
+
+
+class CookieSession(Session):
+    """Session data is kept in a signed cookie using the application
+    cookie_secret, so no storage backend is used for most requests. The
+    serialized session is zlib compressed when compression makes it smaller.
+    If the signed cookie would be larger than max_size bytes, the session is
+    saved with the fallback adapter and the cookie only marks that the
+    session is stored server side.
+
+    Configuration in the application settings is as follows::
+
+        Application:
+          cookie_secret: secret
+          session:
+            adapter:
+              name: cookie
+              cookie_name: session_data
+              compress: true
+              max_size: 4000
+              fallback:
+                name: redis
+                host: localhost
+            cookie:
+              name: session
+              duration: 3600
+
+    The session cookie is set when the handler finishes the request, so it
+    is not updated for responses that are flushed before they finish.
+
+    """
+    COMPRESS_MIN_SIZE = 256
+    COOKIE_NAME = 'session_data'
+    MAX_SIZE = 4000
+    SAVE_BEFORE_FINISH = True
+    STATE_ATTRIBUTES = ('_backend', '_handler', '_server_side')
+
+    # The first byte of the cookie value identifies the payload format
+    COMPRESSED = 'z'
+    PLAIN = 'j'
+    SERVER_SIDE = 's'
+
+    def __init__(self, session_id=None, duration=None, settings=None,
+                 handler=None):
+        """Create a new session instance. If no id is passed in, a new ID is
+        created.
+
+        :param str session_id: The session ID
+        :param int duration: The number of seconds the session lasts
+        :param dict settings: Session object configuration
+        :param tornado.web.RequestHandler handler: The request handler
+
+        """
+        super(CookieSession, self).__init__(session_id, duration, settings)
+        self._backend = None
+        self._handler = handler
+        self._server_side = False
+
+    @gen.coroutine
+    def delete(self):
+        """Clear the session cookie and delete the session from the fallback
+        adapter if it is stored server side.
+
+        :rtype: bool
+
+        """
+        self._handler.clear_cookie(self._cookie_name)
+        if self._server_side:
+            yield self._fallback().delete()
+        self.clear()
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def fetch(self):
+        """Load the session from the session cookie, or from the fallback
+        adapter if it is stored server side, returning False if there is no
+        valid session cookie.
+
+        :rtype: bool
+
+        """
+        value = self._handler.get_secure_cookie(
+            self._cookie_name, max_age_days=self._max_age_days)
+        if not value:
+            raise gen.Return(False)
+        if value[:1] == self.SERVER_SIDE:
+            self._server_side = True
+            backend = self._fallback()
+            result = yield gen.maybe_future(backend.fetch())
+            if not result:
+                raise gen.Return(False)
+            self.from_dict(backend.as_dict())
+        else:
+            try:
+                payload = value[1:]
+                if value[:1] == self.COMPRESSED:
+                    payload = zlib.decompress(payload)
+                self.loads(payload)
+            except (ValueError, zlib.error) as error:
+                LOGGER.warning('Invalid session cookie for %s: %s',
+                               self.id, error)
+                raise gen.Return(False)
+        self._mark_clean()
+        raise gen.Return(True)
+
+    @gen.coroutine
+    def save(self):
+        """Set the session cookie, saving the session with the fallback
+        adapter instead if the cookie would be larger than max_size.
+
+        :rtype: bool
+
+        """
+        payload = self._payload()
+        value = self._handler.create_signed_value(self._cookie_name, payload)
+        if len(self._cookie_name) + len(value) <= self._settings.get(
+                config.MAX_SIZE, self.MAX_SIZE):
+            self._set_cookie(value)
+            if self._server_side:
+                self._server_side = False
+                yield gen.maybe_future(self._fallback().delete())
+            raise gen.Return(True)
+        LOGGER.debug('Session %s is %i bytes, storing it server side',
+                     self.id, len(payload))
+        self._set_cookie(self._handler.create_signed_value(self._cookie_name,
+                                                           self.SERVER_SIDE))
+        self._server_side = True
+        backend = self._fallback()
+        backend.from_dict(self.as_dict())
+        result = yield gen.maybe_future(backend.save())
+        raise gen.Return(result)
+
+    @gen.coroutine
+    def touch(self):
+        """Set the session cookie again to refresh its expiration, touching
+        the session with the fallback adapter if it is stored server side.
+
+        :rtype: bool
+
+        """
+        if not self._server_side:
+            result = yield self.save()
+            raise gen.Return(result)
+        self._set_cookie(self._handler.create_signed_value(self._cookie_name,
+                                                           self.SERVER_SIDE))
+        backend = self._fallback()
+        backend.from_dict(self.as_dict())
+        result = yield gen.maybe_future(backend.touch())
+        raise gen.Return(result)
+
+    @property
+    def _cookie_name(self):
+        """Return the name of the cookie the session is kept in.
+
+        :rtype: str
+
+        """
+        return self._settings.get(config.COOKIE_NAME, self.COOKIE_NAME)
+
+    def _fallback(self):
+        """Return the session instance of the fallback adapter used for
+        sessions that are too large for the cookie.
+
+        :rtype: Session
+        :raises: tinman.exceptions.ConfigurationException
+
+        """
+        if self._backend is None:
+            settings = self._settings.get(config.FALLBACK)
+            if not settings or settings.get(config.NAME) not in ADAPTERS:
+                raise exceptions.ConfigurationException(
+                    self.__class__.__name__, config.FALLBACK)
+            self._backend = ADAPTERS[settings[config.NAME]](
+                self.id, self._duration, settings)
+        return self._backend
+
+    @property
+    def _max_age_days(self):
+        """Return the session duration in days for validating the cookie.
+
+        :rtype: float
+
+        """
+        return (self._duration or 86400) / 86400.0
+
+    def _payload(self):
+        """Return the serialized session for the cookie, prefixed with the
+        payload format.
+
+        :rtype: str
+
+        """
+        value = escape.utf8(self.dumps())
+        if (self._settings.get(config.COMPRESS, True) and
+                len(value) >= self.COMPRESS_MIN_SIZE):
+            compressed = zlib.compress(value)
+            if len(compressed) < len(value):
+                return self.COMPRESSED + compressed
+        return self.PLAIN + value
+
+    def _set_cookie(self, value):
+        """Set the session cookie to the signed value.
+
+        :param str value: The signed cookie value
+
+        """
+        self._handler.set_cookie(self._cookie_name, value,
+                                 expires_days=self._max_age_days)
+
+
+# The session classes for each session adapter name
+ADAPTERS = {config.COOKIE: CookieSession,
+            config.FILE: FileSession,
+            config.LOG: LogSession,
+            config.REDIS: RedisSession,
+            config.SQLITE: SQLiteSession}
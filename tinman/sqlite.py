@@ -0,0 +1,282 @@
+"""
+A SQLite database shared by the SQLite session and model storage adapters.
+The blocking sqlite3 calls run in thread pools so that they do not block the
+IOLoop.
+
+"""
+import collections
+from tornado import concurrent
+from tornado import escape
+from tornado import ioloop
+import logging
+import sqlite3
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Database(object):
+    """A SQLite database in WAL mode, so that reads are not blocked by
+    writes. Reads run in a pool of io_threads threads. Writes run in a single
+    writer thread and the writes that are queued while it is committing are
+    committed together in the next transaction, up to batch_size writes per
+    commit. The future for a write is resolved once it has been committed.
+
+    Each thread keeps its own connection, which keeps its statements
+    prepared in the sqlite3 statement cache, so statements should be passed
+    as constant SQL with parameters.
+
+    Use the get function to share a database between the adapters in a
+    process::
+
+        database = sqlite.get('/var/lib/tinman/sessions.db')
+        database.schema(['CREATE TABLE IF NOT EXISTS ...'])
+        yield database.write('INSERT INTO ...', (value,))
+        rows = yield database.read('SELECT ... WHERE id = ?', (item_id,))
+
+    The thread pools require the futures package under Python 2.
+
+    :param str filename: The database filename
+    :param int io_threads: The number of threads used for reads
+    :param int batch_size: The maximum number of writes per commit
+
+    """
+    BATCH_SIZE = 100
+    BUSY_TIMEOUT = 5
+    CACHED_STATEMENTS = 100
+    IO_THREADS = 4
+
+    def __init__(self, filename, io_threads=None, batch_size=None):
+        if 'futures' not in globals():
+            from concurrent import futures
+        self.filename = filename
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.commits = 0
+        self.writes = 0
+        self._connections = list()
+        self._flushing = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._readers = futures.ThreadPoolExecutor(io_threads or
+                                                   self.IO_THREADS)
+        self._schemas = set()
+        self._writer = futures.ThreadPoolExecutor(1)
+        connection = self._connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.close()
+
+    def close(self):
+        """Wait for the queued reads and writes, stop the threads and close
+        their connections, removing the database from the shared databases.
+
+        """
+        self._writer.shutdown(True)
+        self._readers.shutdown(True)
+        with self._lock:
+            connections, self._connections = self._connections, list()
+        for connection in connections:
+            connection.close()
+        if _databases.get(self.filename) is self:
+            del _databases[self.filename]
+
+    def read(self, sql, parameters=()):
+        """Run the query in the read thread pool, returning a future for the
+        list of rows.
+
+        :param str sql: The query
+        :param tuple parameters: The query parameters
+        :rtype: concurrent.futures.Future
+
+        """
+        return self._readers.submit(self._fetchall, sql, parameters)
+
+    def schema(self, statements):
+        """Execute the schema statements if they have not been executed for
+        the database in this process. Invoked when an adapter is created, so
+        it blocks until the statements are committed.
+
+        :param tuple statements: The schema statements
+
+        """
+        statements = tuple(statements)
+        if statements in self._schemas:
+            return
+        connection = self._connect()
+        try:
+            with connection:
+                for statement in statements:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+        self._schemas.add(statements)
+
+    def stats(self):
+        """Return the number of writes and commits and the number of writes
+        waiting to be committed.
+
+        :rtype: dict
+
+        """
+        return {'commits': self.commits,
+                'queued': len(self._queue),
+                'writes': self.writes}
+
+    def write(self, sql, parameters=()):
+        """Queue the statement to be committed by the writer thread,
+        returning a future for the number of rows it changed.
+
+        :param str sql: The statement
+        :param tuple parameters: The statement parameters
+        :rtype: tornado.concurrent.Future
+
+        """
+        future = concurrent.Future()
+        with self._lock:
+            self._queue.append((sql, parameters, future,
+                                ioloop.IOLoop.current()))
+            if self._flushing:
+                return future
+            self._flushing = True
+        self._writer.submit(self._flush)
+        return future
+
+    def _commit(self, batch):
+        """Execute the batch of writes in a single transaction, retrying
+        them in a transaction each if the batch fails so that the failure
+        is only returned for the write that caused it. Invoked in the writer
+        thread.
+
+        :param list batch: The (sql, parameters, future, io_loop) writes
+
+        """
+        connection = self._connection()
+        try:
+            with connection:
+                results = [connection.execute(sql, parameters).rowcount
+                           for sql, parameters, _future, _io_loop in batch]
+            self.commits += 1
+        except sqlite3.Error as error:
+            LOGGER.warning('Batch of %i writes failed, retrying them '
+                           'individually: %s', len(batch), error)
+            results = list()
+            for sql, parameters, _future, _io_loop in batch:
+                try:
+                    with connection:
+                        results.append(
+                            connection.execute(sql, parameters).rowcount)
+                    self.commits += 1
+                except sqlite3.Error as error:
+                    results.append(error)
+        self.writes += len(batch)
+        for (_sql, _parameters, future, io_loop), result in zip(batch,
+                                                                results):
+            if isinstance(result, Exception):
+                io_loop.add_callback(future.set_exception, result)
+            else:
+                io_loop.add_callback(future.set_result, result)
+
+    def _connect(self):
+        """Return a new connection to the database. Connections are only used
+        by the thread that created them, but are closed by close() once the
+        threads have stopped, so the sqlite3 thread check is disabled.
+
+        :rtype: sqlite3.Connection
+
+        """
+        connection = sqlite3.connect(self.filename,
+                                     timeout=self.BUSY_TIMEOUT,
+                                     cached_statements=self.CACHED_STATEMENTS,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.text_factory = str
+        return connection
+
+    def _connection(self):
+        """Return the connection for the current thread.
+
+        :rtype: sqlite3.Connection
+
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _fetchall(self, sql, parameters):
+        """Return the rows for the query. Invoked in the read thread pool.
+
+        :param str sql: The query
+        :param tuple parameters: The query parameters
+        :rtype: list
+
+        """
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _flush(self):
+        """Commit the queued writes in batches until the queue is empty,
+        failing the writes in a batch that raises an unexpected error.
+        Invoked in the writer thread.
+
+        """
+        try:
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        self._flushing = False
+                        return
+                    batch = [self._queue.popleft()
+                             for _offset in range(min(len(self._queue),
+                                                      self.batch_size))]
+                try:
+                    self._commit(batch)
+                except Exception as error:
+                    LOGGER.exception('Batch of %i writes failed: %s',
+                                     len(batch), error)
+                    for _sql, _parameters, future, io_loop in batch:
+                        io_loop.add_callback(_fail, future, error)
+        finally:
+            with self._lock:
+                self._flushing = False
+
+
+# The shared Database for each filename
+_databases = dict()
+
+
+def _fail(future, error):
+    """Set the exception of the write future if it has not been resolved.
+
+    :param tornado.concurrent.Future future: The write future
+    :param Exception error: The exception to set
+
+    """
+    if not future.done():
+        future.set_exception(error)
+
+
+def blob(value):
+    """Return the serialized value as a SQLite BLOB parameter.
+
+    :param str|unicode value: The serialized value
+    :rtype: buffer
+
+    """
+    return sqlite3.Binary(escape.utf8(value))
+
+
+def get(filename, io_threads=None, batch_size=None):
+    """Return the shared Database for the filename, creating it if it is not
+    open in this process.
+
+    :param str filename: The database filename
+    :param int io_threads: The number of threads used for reads
+    :param int batch_size: The maximum number of writes per commit
+    :rtype: Database
+
+    """
+    if filename not in _databases:
+        _databases[filename] = Database(filename, io_threads, batch_size)
+    return _databases[filename]
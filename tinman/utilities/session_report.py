@@ -0,0 +1,124 @@
+"""Report the number of sessions stored in Redis by the RedisSession adapter,
+their size and the distribution of their TTLs.
+
+Usage: tinman-session-report [--host HOST] [--port PORT] [--db DB]
+                             [--prefix PREFIX] [--count COUNT]
+
+"""
+import argparse
+from tornado import gen
+from tornado import ioloop
+import logging
+
+from tinman import session
+
+DESCRIPTION = ('Report the number of sessions stored in Redis, their size '
+               'and the distribution of their TTLs')
+LOGGER = logging.getLogger(__name__)
+
+# The upper bound in seconds and label of each TTL bucket in the report
+TTL_BUCKETS = [(60, '< 1 minute'),
+               (300, '< 5 minutes'),
+               (900, '< 15 minutes'),
+               (3600, '< 1 hour'),
+               (21600, '< 6 hours'),
+               (86400, '< 1 day'),
+               (None, '>= 1 day')]
+
+
+def bucket(ttl):
+    """Return the offset of the TTL bucket for the TTL value.
+
+    :param int ttl: The TTL in seconds
+    :rtype: int
+
+    """
+    for offset, (limit, _label) in enumerate(TTL_BUCKETS):
+        if limit is None or ttl < limit:
+            return offset
+
+
+@gen.coroutine
+def collect(client, match, count=1000):
+    """Scan the keyspace for the keys matching the pattern, returning the
+    number of keys, their total size in bytes, the number of keys without a
+    TTL and the number of keys in each TTL bucket.
+
+    :param tornadoredis.Client client: The redis client to use
+    :param str match: The SCAN MATCH pattern for session keys
+    :param int count: The SCAN COUNT hint
+    :rtype: dict
+
+    """
+    stats = {'keys': 0,
+             'bytes': 0,
+             'persistent': 0,
+             'buckets': [0 for _bucket in TTL_BUCKETS]}
+    cursor = 0
+    while True:
+        cursor, keys = yield gen.Task(client.scan, cursor, count, match)
+        if keys:
+            pipeline = client.pipeline()
+            for key in keys:
+                pipeline.ttl(key)
+                pipeline.strlen(key)
+            result = yield gen.Task(pipeline.execute)
+            for ttl, size in zip(result[::2], result[1::2]):
+                if ttl == -2:
+                    continue
+                stats['keys'] += 1
+                stats['bytes'] += size or 0
+                if ttl is None or ttl < 0:
+                    stats['persistent'] += 1
+                else:
+                    stats['buckets'][bucket(ttl)] += 1
+        if not int(cursor):
+            break
+    raise gen.Return(stats)
+
+
+def report(stats):
+    """Return the report text for the collected stats.
+
+    :param dict stats: The stats returned by collect
+    :rtype: str
+
+    """
+    lines = ['%-16s %12i' % ('Sessions', stats['keys']),
+             '%-16s %12i' % ('Bytes', stats['bytes']),
+             '%-16s %12i' % ('Without a TTL', stats['persistent']),
+             '',
+             '%-16s %12s %8s' % ('TTL', 'Sessions', 'Percent')]
+    for (_limit, label), value in zip(TTL_BUCKETS, stats['buckets']):
+        percent = (value * 100.0 / stats['keys']) if stats['keys'] else 0
+        lines.append('%-16s %12i %7.1f%%' % (label, value, percent))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--host', default=session.RedisSession.REDIS_HOST,
+                        help='The Redis host')
+    parser.add_argument('--port', type=int,
+                        default=session.RedisSession.REDIS_PORT,
+                        help='The Redis port')
+    parser.add_argument('--db', type=int,
+                        default=session.RedisSession.REDIS_DB,
+                        help='The Redis database number')
+    parser.add_argument('--prefix', default=session.RedisSession.KEY_PREFIX,
+                        help='The session key prefix')
+    parser.add_argument('--count', type=int, default=1000,
+                        help='The number of keys to scan per request')
+    args = parser.parse_args()
+
+    import tornadoredis
+    client = tornadoredis.Client(host=args.host, port=args.port,
+                                 selected_db=args.db)
+    client.connect()
+    stats = ioloop.IOLoop.current().run_sync(
+        lambda: collect(client, args.prefix + '*', args.count))
+    print(report(stats))
+
+
+if __name__ == '__main__':
+    main()